@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+# Окно не создаётся: SDL работает через фиктивный видеодрайвер, кадры рисуются на Surface в памяти
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+from shapes import get_shape, get_shape_names
+from scene import get_scene_names, make_scene
+from math_utils import rotation_matrix
+from graphics import render_scene
+from obj_loader import parse_obj_file
+from parallel import set_parallel_workers, get_parallel_workers
+from profiler import enable_profiling, reset_profiling, begin_frame, end_frame, get_stage_stats, export_chrome_trace
+from parameters import *
+
+# Приращения углов (x, y, z) за кадр для каждого режима вращения, как в main.py
+ROTATION_STEPS = {
+    "x": (0.01, 0.0, 0.0),
+    "y": (0.0, 0.01, 0.0),
+    "z": (0.0, 0.0, 0.01),
+    "xy": (0.01, 0.008, 0.0),
+    "stop": (0.0, 0.0, 0.0),
+}
+
+BENCHMARK_PERCENTILES = (50, 90, 95, 99)
+
+# Функция для получения модели по имени встроенной фигуры, сцены или пути к .obj файлу
+# Сцена объединяется в одну модель с уровнями детализации для расстояния camera_distance и поля зрения fov
+def load_benchmark_model(shape, camera_distance=5.0, fov=FOV_DEFAULT):
+    if shape.lower().endswith(".obj"):
+        mesh = parse_obj_file(shape)
+        return ("loaded_model", mesh) if mesh is not None else (None, None)
+
+    if shape in get_scene_names():
+        return shape, make_scene(shape).batch(camera_distance, fov)
+    if shape not in get_shape_names():
+        print(f"Ошибка: неизвестная фигура '{shape}', доступны: {', '.join(get_shape_names() + get_scene_names())}")
+        return None, None
+    return shape, get_shape(shape)
+
+# Функция для разбора строки разрешения вида 1200x800
+def parse_resolution(value):
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"неверное разрешение '{value}', ожидается ШИРИНАxВЫСОТА")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"неверное разрешение '{value}'")
+    return width, height
+
+# Функция для прогона серии кадров без окна и сбора статистики
+def run_benchmark(shape, rotation_mode="xy", frames=300, resolution=(WIDTH, HEIGHT), render_mode=RENDER_MODES[0],
+                  warmup=10, camera_distance=5.0, fov=FOV_DEFAULT, ambient_intensity=AMBIENT_DEFAULT,
+                  back_face_culling=True, profile=False, trace_path=None, workers=PARALLEL_WORKERS):
+    # Сообщения загрузчика уходят в stderr, чтобы в stdout остался только JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        shape_name, mesh = load_benchmark_model(shape, camera_distance, fov)
+    if mesh is None:
+        return None
+
+    pygame.init()
+    set_parallel_workers(workers)
+    screen = pygame.Surface(resolution)
+    step = np.array(ROTATION_STEPS[rotation_mode])
+    angles = np.zeros(3)
+
+    # Время этапов кадра собирается профилировщиком только по запросу (замеры немного замедляют кадр)
+    profile = profile or trace_path is not None
+    enable_profiling(profile)
+    reset_profiling()
+
+    frame_times = np.empty(frames, dtype=np.float64)
+    visible_faces = np.empty(frames, dtype=np.int64)
+    for frame in range(-warmup, frames):
+        if frame == 0:
+            reset_profiling()
+        begin_frame()
+        start = time.perf_counter()
+        screen.fill(BLACK)
+        visible_face_count = render_scene(screen, mesh, rotation_matrix(*angles), camera_distance, fov,
+                                          ambient_intensity, LIGHT_DIRECTION, back_face_culling, render_mode)
+        elapsed = time.perf_counter() - start
+        end_frame()
+        angles += step
+
+        # Кадры прогрева (заполнение кэшей модели и буферов) в статистику не попадают
+        if frame >= 0:
+            frame_times[frame] = elapsed
+            visible_faces[frame] = visible_face_count
+    pygame.quit()
+
+    stages = get_stage_stats() if profile else None
+    if trace_path is not None:
+        export_chrome_trace(trace_path)
+    enable_profiling(False)
+
+    frame_ms = frame_times * 1000.0
+    total_time = frame_times.sum()
+    return {
+        "shape": shape,
+        "faces": mesh.face_count,
+        "vertices": mesh.vertex_count,
+        "rotation": rotation_mode,
+        "render_mode": render_mode,
+        "back_face_culling": back_face_culling,
+        "workers": get_parallel_workers(),
+        "resolution": list(resolution),
+        "frames": frames,
+        "warmup_frames": warmup,
+        "frame_ms": {
+            "mean": float(frame_ms.mean()),
+            "min": float(frame_ms.min()),
+            "max": float(frame_ms.max()),
+            **{f"p{q}": float(np.percentile(frame_ms, q)) for q in BENCHMARK_PERCENTILES},
+        },
+        "fps": frames / total_time if total_time > 0 else None,
+        "faces_per_sec": mesh.face_count * frames / total_time if total_time > 0 else None,
+        "visible_faces": {
+            "mean": float(visible_faces.mean()),
+            "min": int(visible_faces.min()),
+            "max": int(visible_faces.max()),
+        },
+        "stages_ms": stages,
+        "versions": {
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "pygame": pygame.version.ver,
+        },
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер скорости отрисовки без окна (результат в формате JSON)")
+    parser.add_argument("shape", help="имя встроенной фигуры (cube, sphere, ...), сцены (parts) или путь к .obj файлу")
+    parser.add_argument("--rotation", choices=list(ROTATION_STEPS), default="xy", help="режим вращения")
+    parser.add_argument("--frames", type=int, default=300, help="число замеряемых кадров")
+    parser.add_argument("--warmup", type=int, default=10, help="число кадров прогрева")
+    parser.add_argument("--resolution", type=parse_resolution, default=(WIDTH, HEIGHT), help="разрешение, например 1200x800")
+    parser.add_argument("--render-mode", choices=RENDER_MODES, default=RENDER_MODES[0], help="способ отрисовки")
+    parser.add_argument("--distance", type=float, default=5.0, help="расстояние до камеры")
+    parser.add_argument("--fov", type=float, default=FOV_DEFAULT, help="поле зрения")
+    parser.add_argument("--no-culling", action="store_true", help="отключить Back Face Culling")
+    parser.add_argument("--workers", type=int, default=PARALLEL_WORKERS,
+                        help="число процессов отрисовки больших моделей (0 - по числу ядер, 1 - без параллельной отрисовки)")
+    parser.add_argument("--profile", action="store_true", help="добавить в результат время отдельных этапов кадра")
+    parser.add_argument("--trace", help="файл для сохранения этапов кадров в формате Chrome Trace")
+    parser.add_argument("--output", help="файл для сохранения результата (по умолчанию - вывод в консоль)")
+    args = parser.parse_args(argv)
+    if args.frames <= 0 or args.warmup < 0:
+        parser.error("число кадров должно быть положительным")
+    if args.workers < 0:
+        parser.error("число процессов не может быть отрицательным")
+
+    result = run_benchmark(args.shape, args.rotation, args.frames, args.resolution, args.render_mode, args.warmup,
+                           args.distance, args.fov, AMBIENT_DEFAULT, not args.no_culling, args.profile, args.trace,
+                           args.workers)
+    if result is None:
+        return 1
+
+    report = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(report + "\n")
+    print(report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+import numpy as np
+from parameters import BSP_CANDIDATES, BSP_SPLIT_COST, BSP_SAMPLE_SIZE
+
+# Дерево разбиения пространства (BSP) над гранями модели для алгоритма художника
+# Каждый узел - плоскость одной из граней: грани по одну сторону от неё уходят в одно поддерево, по другую - в другое,
+# пересекающие плоскость грани разрезаются на части. При любом положении камеры обход дерева (сначала дальняя
+# от камеры сторона узла, затем грани узла, затем ближняя) даёт правильный порядок отрисовки от дальних граней
+# к ближним, поэтому порядок не зависит от особенностей фигуры (тор, лента Мёбиуса) и не требует сортировки
+
+# Класс дерева: узлы хранятся массивами, части граней - отдельной моделью, в которой части одного узла идут подряд
+class FaceBsp:
+    def __init__(self, mesh, source_faces, normals, offsets, back, front, parents, counts, sizes):
+        # Модель из частей граней (номера исходных граней частей - source_faces)
+        self.mesh = mesh
+        self.source_faces = source_faces
+        # Плоскости узлов: точка p перед плоскостью, если normals @ p + offsets > 0
+        self.normals = normals
+        self.offsets = offsets
+        # Дочерние узлы (число узлов - нет узла), родители (у корня - он сам), число частей в узле
+        # и число частей в поддереве (с нулём для отсутствующего узла в конце)
+        self.back = back
+        self.front = front
+        self.parents = parents
+        self.counts = counts
+        self.sizes = sizes
+
+        # Узел каждой части и её номер внутри узла
+        node_count = len(counts)
+        firsts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        self.fragment_nodes = np.repeat(np.arange(node_count), counts)
+        self.fragment_ranks = np.arange(mesh.face_count) - firsts[self.fragment_nodes]
+
+        # Предки узлов на расстоянии 1, 2, 4, ... (для суммирования смещений вдоль пути к корню удвоением шага)
+        self.jumps = [parents]
+        depth = _tree_depth(parents)
+        while 2 ** len(self.jumps) <= depth:
+            self.jumps.append(self.jumps[-1][self.jumps[-1]])
+
+    @classmethod
+    def from_mesh(cls, mesh, candidates=BSP_CANDIDATES, split_cost=BSP_SPLIT_COST, sample_size=BSP_SAMPLE_SIZE):
+        if not mesh.face_count:
+            return None
+        return _BspBuilder(mesh, candidates, split_cost, sample_size).build()
+
+    # Порядок отрисовки частей граней от дальних к ближним для камеры в точке eye (в системе координат модели)
+    # face_ids - номера отобранных частей по возрастанию (None - все части); возвращает номера в этом наборе
+    def order(self, eye, face_ids=None):
+        in_front = self.normals @ np.asarray(eye, dtype=np.float64) + self.offsets > 0
+        # Первым рисуется поддерево по другую сторону плоскости от камеры
+        first = np.where(in_front, self.back, self.front)
+        first_sizes = self.sizes[first]
+
+        # Смещение начала поддерева узла относительно начала поддерева родителя
+        parent_first = first[self.parents]
+        offsets = np.where(parent_first == np.arange(len(first)), 0,
+                           first_sizes[self.parents] + self.counts[self.parents])
+        offsets[0] = 0
+        for jump in self.jumps:
+            offsets = offsets + offsets[jump]
+
+        positions = (offsets + first_sizes)[self.fragment_nodes] + self.fragment_ranks
+        order = np.empty(len(positions), dtype=np.int64)
+        order[positions] = np.arange(len(positions))
+        if face_ids is None:
+            return order
+        set_positions = np.full(len(positions), -1, dtype=np.int64)
+        set_positions[face_ids] = np.arange(len(face_ids))
+        order = set_positions[order]
+        return order[order >= 0]
+
+# Функция для глубины дерева по массиву родителей (у корня родитель - он сам, родители идут раньше детей)
+def _tree_depth(parents):
+    depths = [1] * len(parents)
+    for node in range(1, len(parents)):
+        depths[node] = depths[parents[node]] + 1
+    return max(depths, default=1)
+
+# Функция для выбора не более count равномерно расположенных элементов массива
+def _evenly_spaced(values, count):
+    if len(values) <= count:
+        return values
+    return values[np.linspace(0, len(values) - 1, count).astype(np.int64)]
+
+# Построение дерева: части граней хранятся в таблице, растущей по мере разрезания
+class _BspBuilder:
+    def __init__(self, mesh, candidates, split_cost, sample_size):
+        self.mesh = mesh
+        self.candidates = candidates
+        self.sample_size = sample_size
+        self.split_cost = split_cost
+        # Плоскость грани проходит через её центр; для неплоских граней это усреднённая плоскость
+        self.face_normals = mesh.face_normals.astype(np.float64)
+        self.face_offsets = -np.einsum("ij,ij->i", self.face_normals, mesh.face_centers.astype(np.float64))
+        low, high = mesh.bounds
+        self.epsilon = 1e-5 * max(float(np.linalg.norm(high - low)), 1e-12)
+        # Отклонение вершин неплоских граней от их плоскости: на такую величину части граней могут заходить
+        # за секущую плоскость без разрезания (иначе соседние неплоские грани дробятся на множество полосок)
+        face_distances = np.einsum("fkj,fj->fk", mesh.vertices[mesh.faces].astype(np.float64), self.face_normals)
+        face_distances += self.face_offsets[:, None]
+        self.flatness = np.abs(face_distances).max(axis=1) + self.epsilon
+
+        self.points = mesh.vertices.astype(np.float64)
+        self.point_count = mesh.vertex_count
+        self.table = mesh.faces.copy()
+        self.sizes = mesh.face_sizes.copy()
+        self.hidden = np.zeros(mesh.faces.shape, dtype=bool)
+        self.sources = np.arange(mesh.face_count)
+        self.fragment_count = mesh.face_count
+
+    def build(self):
+        normals, offsets, back, front, parents, node_fragments = [], [], [], [], [], []
+        # Узлы создаются в порядке обхода в глубину: (части граней, родитель, сторона у родителя)
+        stack = [(np.arange(self.fragment_count), 0, None)]
+        while stack:
+            fragments, parent, side = stack.pop()
+            node = len(normals)
+            if side is not None:
+                (front if side else back)[parent] = node
+            splitter = self._choose_splitter(fragments)
+            source = self.sources[splitter]
+            coplanar, behind, ahead = self._partition(fragments, splitter)
+            normals.append(self.face_normals[source])
+            offsets.append(self.face_offsets[source])
+            back.append(-1)
+            front.append(-1)
+            parents.append(parent if side is not None else node)
+            node_fragments.append(coplanar)
+            if len(ahead):
+                stack.append((ahead, node, True))
+            if len(behind):
+                stack.append((behind, node, False))
+
+        node_count = len(normals)
+        back = np.array(back, dtype=np.int64)
+        front = np.array(front, dtype=np.int64)
+        back[back < 0] = node_count
+        front[front < 0] = node_count
+        parents = np.array(parents, dtype=np.int64)
+        counts = np.array([len(fragments) for fragments in node_fragments], dtype=np.int64)
+
+        # Число частей в поддеревьях: дочерние узлы создаются позже родителей, поэтому суммируем с конца
+        sizes = np.zeros(node_count + 1, dtype=np.int64)
+        sizes[:node_count] = counts
+        for node in range(node_count - 1, 0, -1):
+            sizes[parents[node]] += sizes[node]
+
+        fragments = np.concatenate(node_fragments)
+        sources = self.sources[fragments]
+        table = self.table[fragments]
+        # Части граней одной модели: вершины разрезов добавлены после вершин исходной модели
+        fragment_mesh = type(self.mesh)(self.points[:self.point_count], table, self.sizes[fragments],
+                                        self.mesh.colors[sources], self.mesh.face_double_sided(sources),
+                                        self.hidden[fragments])
+        # Освещение и отсечение нелицевых граней - по нормалям исходных граней, как без дерева
+        fragment_mesh._face_normals = self.mesh.face_normals[sources]
+        return FaceBsp(fragment_mesh, sources, np.array(normals), np.array(offsets), back, front, parents, counts, sizes)
+
+    # Расстояния от вершин частей (M, K) до плоскости секущей части splitter (дополняющие позиции повторяют
+    # последнюю вершину части), допуски (M,) и признаки частей целиком впереди и целиком позади плоскости
+    def _classify(self, fragments, splitter):
+        source = self.sources[splitter]
+        distances = self.points[self.table[fragments]] @ self.face_normals[source] + self.face_offsets[source]
+        tolerances = self.flatness[self.sources[fragments]] + self.flatness[source]
+        ahead = distances.min(axis=1) >= -tolerances
+        behind = distances.max(axis=1) <= tolerances
+        return distances, tolerances, ahead, behind
+
+    # Выбор секущей части: из нескольких равномерно взятых кандидатов - с наименьшей стоимостью
+    # (число разрезаемых частей с весом split_cost плюс разница числа частей по сторонам плоскости)
+    # Стоимость оценивается по равномерной выборке не более чем из sample_size частей
+    def _choose_splitter(self, fragments):
+        choices = _evenly_spaced(fragments, self.candidates)
+        sample = _evenly_spaced(fragments, self.sample_size)
+        best, best_cost = choices[0], None
+        for choice in choices:
+            _, _, ahead, behind = self._classify(sample, choice)
+            spanning = ~ahead & ~behind
+            cost = self.split_cost * int(spanning.sum()) + abs(int((ahead & ~behind).sum()) - int((behind & ~ahead).sum()))
+            if best_cost is None or cost < best_cost:
+                best, best_cost = choice, cost
+        return best
+
+    # Разделение частей плоскостью секущей части: (лежащие в плоскости, позади, впереди)
+    # Сама секущая часть всегда остаётся в узле, даже если она неплоская
+    def _partition(self, fragments, splitter):
+        distances, tolerances, ahead, behind = self._classify(fragments, splitter)
+        coplanar = (ahead & behind) | (fragments == splitter)
+        ahead &= ~coplanar
+        behind &= ~coplanar
+        spanning = np.flatnonzero(~ahead & ~behind & ~coplanar)
+
+        behind_parts, ahead_parts = [fragments[behind]], [fragments[ahead]]
+        # Точки разреза на общих рёбрах соседних частей создаются один раз
+        cut_points = {}
+        for index in spanning:
+            fragment = fragments[index]
+            size = self.sizes[fragment]
+            back_part, front_part = self._split(fragment, distances[index, :size], tolerances[index], cut_points)
+            if back_part is not None:
+                behind_parts.append([back_part])
+            if front_part is not None:
+                ahead_parts.append([front_part])
+        return (fragments[coplanar], np.concatenate(behind_parts).astype(np.int64),
+                np.concatenate(ahead_parts).astype(np.int64))
+
+    # Разрезание части плоскостью: новые части (позади, впереди) или None, если часть вырождается
+    # Стороны по линии разреза помечаются скрытыми, чтобы их контур не рисовался
+    def _split(self, fragment, distances, epsilon, cut_points):
+        size = len(distances)
+        corners = self.table[fragment, :size].tolist()
+        hidden = self.hidden[fragment, :size].tolist()
+        parts = {False: [], True: []}
+        for i in range(size):
+            a, b = corners[i], corners[(i + 1) % size]
+            da, db = distances[i], distances[(i + 1) % size]
+            crosses = (da > epsilon and db < -epsilon) or (da < -epsilon and db > epsilon)
+            cut = self._cut_point(a, b, da, db, cut_points) if crosses else None
+            for ahead, sign in ((False, -1.0), (True, 1.0)):
+                sa, sb = sign * da, sign * db
+                part = parts[ahead]
+                if sa >= -epsilon:
+                    # Сторона из вершины в плоскости, уходящая на другую сторону, идёт по линии разреза
+                    part.append((a, hidden[i] if sb >= -epsilon or sa > epsilon else True))
+                if crosses:
+                    # Выход на другую сторону - дальше сторона идёт по линии разреза, вход - по остатку ребра
+                    part.append((cut, True if sa > epsilon else hidden[i]))
+        return (self._add_fragment(parts[False], self.sources[fragment]),
+                self._add_fragment(parts[True], self.sources[fragment]))
+
+    def _cut_point(self, a, b, da, db, cut_points):
+        key = (min(a, b), max(a, b))
+        if key not in cut_points:
+            if self.point_count == len(self.points):
+                self.points = np.concatenate([self.points, np.empty_like(self.points)])
+            t = da / (da - db)
+            self.points[self.point_count] = self.points[a] + t * (self.points[b] - self.points[a])
+            cut_points[key] = self.point_count
+            self.point_count += 1
+        return cut_points[key]
+
+    def _add_fragment(self, corners, source):
+        if len(corners) < 3:
+            return None
+        if self.fragment_count == len(self.table) or len(corners) > self.table.shape[1]:
+            self._grow_table(len(corners))
+        fragment = self.fragment_count
+        self.table[fragment, :len(corners)] = [corner for corner, _ in corners]
+        self.table[fragment, len(corners):] = corners[-1][0]
+        self.hidden[fragment, :len(corners)] = [side for _, side in corners]
+        self.hidden[fragment, len(corners):] = False
+        self.sizes[fragment] = len(corners)
+        self.sources[fragment] = source
+        self.fragment_count += 1
+        return fragment
+
+    # Расширение таблицы частей (по числу строк - вдвое, по ширине - до corner_count вершин)
+    def _grow_table(self, corner_count):
+        rows = len(self.table) * (2 if self.fragment_count == len(self.table) else 1)
+        width = max(self.table.shape[1], corner_count)
+        corners = np.minimum(np.arange(width), self.sizes[:, None] - 1)
+        table = np.zeros((rows, width), dtype=self.table.dtype)
+        table[:len(self.table)] = np.take_along_axis(self.table, np.minimum(corners, self.table.shape[1] - 1), axis=1)
+        hidden = np.zeros((rows, width), dtype=bool)
+        hidden[:len(self.hidden), :self.hidden.shape[1]] = self.hidden
+        self.table, self.hidden = table, hidden
+        self.sizes = np.concatenate([self.sizes, np.zeros(rows - len(self.sizes), dtype=self.sizes.dtype)])
+        self.sources = np.concatenate([self.sources, np.zeros(rows - len(self.sources), dtype=self.sources.dtype)])
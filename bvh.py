@@ -0,0 +1,103 @@
+import numpy as np
+from parameters import BVH_LEAF_SIZE, FRUSTUM_MARGIN
+
+# Иерархия ограничивающих сфер над гранями модели для отбрасывания целых групп граней вне кадра
+# Грани упорядочены по коду Мортона их центров, лист - BVH_LEAF_SIZE подряд идущих граней,
+# узел i уровня l объединяет узлы 2i и 2i + 1 уровня l + 1 (уровень 0 - корень, последний уровень - листья)
+class FaceBvh:
+    def __init__(self, order, leaf_size, centers, radii):
+        # Номера граней в порядке листьев
+        self.order = order
+        self.leaf_size = leaf_size
+        # Центры (N, 3) и радиусы (N,) сфер узлов по уровням, в системе координат модели
+        self.centers = centers
+        self.radii = radii
+
+    @classmethod
+    def from_mesh(cls, mesh, leaf_size=BVH_LEAF_SIZE):
+        # Ограничивающий параллелепипед каждой грани (дополняющие позиции повторяют вершину грани)
+        face_vertices = mesh.vertices[mesh.faces]
+        low = face_vertices.min(axis=1)
+        high = face_vertices.max(axis=1)
+        order = np.argsort(morton_codes((low + high) / 2, *mesh.bounds), kind="stable")
+
+        starts = np.arange(0, len(order), leaf_size)
+        lows = [np.minimum.reduceat(low[order], starts)] if len(order) else [np.zeros((1, 3), dtype=np.float32)]
+        highs = [np.maximum.reduceat(high[order], starts)] if len(order) else [np.zeros((1, 3), dtype=np.float32)]
+        while len(lows[-1]) > 1:
+            pairs = np.arange(0, len(lows[-1]), 2)
+            lows.append(np.minimum.reduceat(lows[-1], pairs))
+            highs.append(np.maximum.reduceat(highs[-1], pairs))
+
+        # Сфера узла описана вокруг его параллелепипеда
+        centers = [((l + h) / 2).astype(np.float64) for l, h in zip(reversed(lows), reversed(highs))]
+        radii = [np.linalg.norm((h - l).astype(np.float64), axis=1) / 2 for l, h in zip(reversed(lows), reversed(highs))]
+        return cls(order, leaf_size, centers, radii)
+
+    # Отбор граней, которые могут попасть в кадр, для камеры на расстоянии camera_distance (см. project_vertices)
+    # Возвращает номера граней по возрастанию (None - в кадр может попасть вся модель)
+    # и признак того, что часть отобранных граней может пересекать ближнюю плоскость near
+    def query(self, rotation, camera_distance, fov, width, height, near):
+        # Боковые плоскости пирамиды видимости x = ±a * w, y = ±b * w (w - расстояние до камеры вдоль оси взгляда)
+        # с запасом FRUSTUM_MARGIN пикселей, чтобы не потерять грани, задевающие край экрана
+        a = (width - width // 2 + FRUSTUM_MARGIN) / fov
+        b = (height - height // 2 + FRUSTUM_MARGIN) / fov
+
+        accepted = []
+        nodes = np.zeros(1, dtype=np.int64)
+        leaf_level = len(self.centers) - 1
+        crosses_near = False
+        for level in range(leaf_level + 1):
+            centers = self.centers[level][nodes] @ rotation.T
+            radii = self.radii[level][nodes]
+            w = centers[:, 2] + camera_distance
+
+            # Расстояния от центра до плоскостей (положительные - снаружи пирамиды)
+            distances = np.empty((len(nodes), 5))
+            distances[:, 0] = centers[:, 0] - a * w
+            distances[:, 1] = -centers[:, 0] - a * w
+            distances[:, 2] = centers[:, 1] - b * w
+            distances[:, 3] = -centers[:, 1] - b * w
+            distances[:, :2] /= np.sqrt(1 + a * a)
+            distances[:, 2:4] /= np.sqrt(1 + b * b)
+            distances[:, 4] = near - w
+            outside = (distances > radii[:, None]).any(axis=1)
+            inside = (distances < -radii[:, None]).all(axis=1)
+
+            if level == 0 and inside[0]:
+                return None, False
+            partial = ~outside & ~inside
+            accepted.append((level, nodes[inside]))
+            if level == leaf_level:
+                accepted.append((level, nodes[partial]))
+                crosses_near = bool((distances[partial, 4] >= -radii[partial]).any())
+                break
+            nodes = np.stack([2 * nodes[partial], 2 * nodes[partial] + 1], axis=1).reshape(-1)
+            nodes = nodes[nodes < len(self.centers[level + 1])]
+
+        # Узел уровня l покрывает 2^(leaf_level - l) листьев, отмечаем покрытые отрезки порядка граней
+        face_count = len(self.order)
+        marks = np.zeros(face_count + 1, dtype=np.int64)
+        for level, level_nodes in accepted:
+            span = self.leaf_size << (leaf_level - level)
+            np.add.at(marks, np.minimum(level_nodes * span, face_count), 1)
+            np.add.at(marks, np.minimum((level_nodes + 1) * span, face_count), -1)
+        selected = np.cumsum(marks[:-1]) > 0
+        return np.sort(self.order[selected]), crosses_near
+
+# Функция для расчёта 30-битных кодов Мортона точек внутри параллелепипеда (low, high)
+def morton_codes(points, low, high):
+    scale = 1023 / np.maximum((high - low).astype(np.float64), 1e-12)
+    cells = np.clip(((points - low) * scale).astype(np.int64), 0, 1023)
+    codes = np.zeros(len(points), dtype=np.int64)
+    for axis in range(3):
+        codes |= _spread_bits(cells[:, axis]) << (2 - axis)
+    return codes
+
+# Функция для вставки двух нулевых битов между битами 10-битных чисел
+def _spread_bits(values):
+    values = (values | (values << 16)) & 0x030000FF
+    values = (values | (values << 8)) & 0x0300F00F
+    values = (values | (values << 4)) & 0x030C30C3
+    values = (values | (values << 2)) & 0x09249249
+    return values
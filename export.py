@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+import contextlib
+
+# Окно не создаётся: SDL работает через фиктивный видеодрайвер, кадры рисуются на Surface в памяти
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+from math_utils import rotation_matrix
+from graphics import render_scene
+from benchmark import load_benchmark_model, parse_resolution
+from parameters import *
+
+# Оси поворота модели за оборот: приращения углов (x, y, z) на один радиан поворота
+TURNTABLE_AXES = {
+    "x": (1.0, 0.0, 0.0),
+    "y": (0.0, 1.0, 0.0),
+    "z": (0.0, 0.0, 1.0),
+}
+
+# Запись последовательности кадров в PNG-файлы по шаблону имени вида frames/frame_%05d.png
+class PngSequenceWriter:
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.frame_number = 0
+        directory = os.path.dirname(pattern)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # frame - (width, height, 3) uint8 в раскладке pygame.surfarray
+    def write(self, frame):
+        pygame.image.save(pygame.surfarray.make_surface(frame), self.pattern % self.frame_number)
+        self.frame_number += 1
+
+    def close(self):
+        pass
+
+# Запись несжатого видео в формате YUV4MPEG2 (.y4m, цвет 4:4:4 по BT.601), его читают ffmpeg, mpv и другие
+class Y4mWriter:
+    def __init__(self, path, width, height, fps):
+        self.file = open(path, "wb")
+        self.file.write(f"YUV4MPEG2 W{width} H{height} F{fps}:1 Ip A1:1 C444\n".encode("ascii"))
+
+    def write(self, frame):
+        rgb = frame.swapaxes(0, 1).astype(np.int32)
+        r, g, b = rgb[:, :, 0], rgb[:, :, 1], rgb[:, :, 2]
+        # Целочисленное преобразование RGB -> YCbCr в ограниченном диапазоне (Y 16..235, Cb и Cr 16..240)
+        planes = np.empty((3,) + r.shape, dtype=np.uint8)
+        planes[0] = ((66 * r + 129 * g + 25 * b + 128) >> 8) + 16
+        planes[1] = ((-38 * r - 74 * g + 112 * b + 128) >> 8) + 128
+        planes[2] = ((112 * r - 94 * g - 18 * b + 128) >> 8) + 128
+        self.file.write(b"FRAME\n")
+        self.file.write(planes.tobytes())
+
+    def close(self):
+        self.file.close()
+
+# Запись кадров подряд без заголовков (rgb24), например для ffmpeg -f rawvideo -pix_fmt rgb24
+class RawVideoWriter:
+    def __init__(self, path):
+        self.file = open(path, "wb")
+
+    def write(self, frame):
+        self.file.write(np.ascontiguousarray(frame.swapaxes(0, 1)).tobytes())
+
+    def close(self):
+        self.file.close()
+
+# Функция для выбора способа записи по имени выходного файла
+# .y4m - видео YUV4MPEG2, .rgb и .raw - несжатые кадры подряд, иначе - последовательность PNG
+# (шаблон с %d, файл .png, к имени которого добавляется номер кадра, или каталог)
+def open_frame_writer(output, width, height, fps):
+    extension = os.path.splitext(output)[1].lower()
+    if extension == ".y4m":
+        return Y4mWriter(output, width, height, fps)
+    if extension in (".rgb", ".raw"):
+        return RawVideoWriter(output)
+    if "%" in output:
+        return PngSequenceWriter(output)
+    if extension == ".png":
+        return PngSequenceWriter(output[:-len(extension)] + "_%05d" + extension)
+    return PngSequenceWriter(os.path.join(output, "frame_%05d.png"))
+
+# Фоновая запись кадров: отрисовка и кодирование идут одновременно
+# Очередь ограничена queue_size кадрами, поэтому расход памяти не зависит от числа кадров:
+# если запись отстаёт, отрисовка ждёт освобождения места в очереди
+class FrameWriterThread:
+    def __init__(self, writer, queue_size=EXPORT_QUEUE_SIZE):
+        self.writer = writer
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            # После ошибки кадры только вынимаются из очереди, чтобы отрисовка не зависла на put
+            if self.error is None:
+                try:
+                    self.writer.write(frame)
+                except (OSError, pygame.error) as error:
+                    self.error = error
+        try:
+            self.writer.close()
+        except OSError as error:
+            self.error = self.error or error
+
+    def put(self, frame):
+        self.frames.put(frame)
+
+    # Завершение записи: ждёт, пока будут записаны все кадры из очереди
+    def close(self):
+        self.frames.put(None)
+        self.thread.join()
+
+# Функция для углов поворота модели в кадре frame из frames (равномерный поворот на turns оборотов вокруг axis)
+# tilt - постоянный наклон модели к камере вокруг оси X (в радианах)
+def turntable_angles(frame, frames, axis="y", turns=1.0, tilt=0.0):
+    angle = 2 * np.pi * turns * frame / frames
+    angles = np.array(TURNTABLE_AXES[axis]) * angle
+    angles[0] += tilt
+    return angles
+
+# Функция для отрисовки облёта модели без окна и записи кадров в файл(ы)
+# Возвращает число записанных кадров или None при ошибке
+def run_export(shape, output, frames=120, resolution=(WIDTH, HEIGHT), render_mode=RENDER_MODES[0], axis="y", turns=1.0,
+               tilt=0.0, camera_distance=5.0, fov=FOV_DEFAULT, ambient_intensity=AMBIENT_DEFAULT, back_face_culling=True,
+               fps=30, queue_size=EXPORT_QUEUE_SIZE):
+    with contextlib.redirect_stdout(sys.stderr):
+        shape_name, mesh = load_benchmark_model(shape, camera_distance, fov)
+    if mesh is None:
+        return None
+
+    pygame.init()
+    screen = pygame.Surface(resolution)
+    try:
+        writer = open_frame_writer(output, *resolution, fps)
+    except OSError as error:
+        print(f"Ошибка: не удалось открыть '{output}' для записи ({error})", file=sys.stderr)
+        return None
+
+    writer_thread = FrameWriterThread(writer, queue_size)
+    written = 0
+    start = time.perf_counter()
+    for frame in range(frames):
+        if writer_thread.error is not None:
+            break
+        screen.fill(BLACK)
+        render_scene(screen, mesh, rotation_matrix(*turntable_angles(frame, frames, axis, turns, tilt)),
+                     camera_distance, fov, ambient_intensity, LIGHT_DIRECTION, back_face_culling, render_mode)
+        # В очередь попадает копия кадра: поверхность сразу используется для следующего
+        writer_thread.put(pygame.surfarray.array3d(screen))
+        written += 1
+    writer_thread.close()
+    pygame.quit()
+
+    if writer_thread.error is not None:
+        print(f"Ошибка: не удалось записать кадры в '{output}' ({writer_thread.error})", file=sys.stderr)
+        return None
+    elapsed = time.perf_counter() - start
+    print(f"Записано кадров: {written} в '{output}' ({written / elapsed:.1f} кадров/с)", file=sys.stderr)
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Отрисовка облёта модели без окна в PNG-кадры или видеофайл")
+    parser.add_argument("shape", help="имя встроенной фигуры (cube, sphere, ...), сцены (parts) или путь к .obj файлу")
+    parser.add_argument("output", help="файл .y4m, файл .rgb/.raw (кадры rgb24 подряд), шаблон PNG вида frame_%%05d.png "
+                                       "или каталог для PNG-кадров")
+    parser.add_argument("--frames", type=int, default=120, help="число кадров")
+    parser.add_argument("--fps", type=int, default=30, help="частота кадров в заголовке .y4m")
+    parser.add_argument("--resolution", type=parse_resolution, default=(WIDTH, HEIGHT), help="разрешение, например 1920x1080")
+    parser.add_argument("--render-mode", choices=RENDER_MODES, default=RENDER_MODES[0], help="способ отрисовки")
+    parser.add_argument("--axis", choices=list(TURNTABLE_AXES), default="y", help="ось поворота модели")
+    parser.add_argument("--turns", type=float, default=1.0, help="число оборотов за всё видео")
+    parser.add_argument("--tilt", type=float, default=0.0, help="наклон модели к камере вокруг оси X (в градусах)")
+    parser.add_argument("--distance", type=float, default=5.0, help="расстояние до камеры")
+    parser.add_argument("--fov", type=float, default=FOV_DEFAULT, help="поле зрения")
+    parser.add_argument("--no-culling", action="store_true", help="отключить Back Face Culling")
+    parser.add_argument("--queue-size", type=int, default=EXPORT_QUEUE_SIZE, help="число кадров в очереди на запись")
+    args = parser.parse_args(argv)
+    if args.frames <= 0 or args.fps <= 0 or args.queue_size <= 0:
+        parser.error("число кадров, частота и размер очереди должны быть положительными")
+
+    written = run_export(args.shape, args.output, args.frames, args.resolution, args.render_mode, args.axis, args.turns,
+                         np.radians(args.tilt), args.distance, args.fov, AMBIENT_DEFAULT, not args.no_culling, args.fps,
+                         args.queue_size)
+    return 0 if written is not None else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,151 +1,439 @@
 import pygame
 import numpy as np
-from math_utils import bresenham_algorithm, calculate_face_normal, apply_lambert_lighting, is_face_visible
-from parameters import WIDTH, HEIGHT, WHITE
-
-def render_scene(screen, current_shape, rotated_vertices, faces, face_colors, camera_distance, fov, ambient_intensity, light_direction, back_face_culling):
-    # Шаг 1: Проецирование 3D точек в 2D
-    projected_points = []
-    for i in range(len(rotated_vertices)):
-        x, y, z = rotated_vertices[i]
-        factor = fov / (camera_distance + z)
-        x_proj = x * factor + WIDTH // 2
-        y_proj = y * factor + HEIGHT // 2
-        projected_points.append([x_proj, y_proj])
-
-    # Шаг 2: Расчёт средней Z-координаты (z_avg) для каждой грани
-    needs_sorting = current_shape != "mobius_strip"
-    needs_bfc = back_face_culling and current_shape != "mobius_strip"
-
-    if needs_sorting:
-        faces_with_depth = []
-        for i, face in enumerate(faces):
-            face_vertices_3d = [rotated_vertices[idx] for idx in face]
-            # Вычисляем среднюю Z-координату вершин грани
-            z_cords = [vertex[2] for vertex in face_vertices_3d]
-            z_avg = sum(z_cords) / len(z_cords)
-
-            faces_with_depth.append((face, z_avg, face_colors[i]))
-
-        # Шаг 3: Сортировка всех граней по z_avg
-        if current_shape == "thor":
-            faces_with_depth.sort(key=lambda x: x[1], reverse=True)
+from math_utils import (bresenham_lines, project_vertices, clip_faces_near, calculate_face_depths, painter_order,
+                        coherent_painter_order,
+                        are_faces_visible, triangulate_faces)
+from rasterizer import get_frame_buffers, get_index_surface, fill_faces, rasterize_triangles, present_frame_buffer
+from lighting import get_lighting_table
+from parallel import is_parallel_enabled, fill_faces_parallel, rasterize_triangles_parallel
+from ui import Hud, render_text
+from profiler import profile_stage, get_stage_stats, get_stage_times
+from parameters import (BLACK, WHITE, GREEN, YELLOW, RED, RENDER_MODE_NAMES, NEAR_PLANE, PROFILE_GRAPH_SIZE,
+                        PROFILE_GRAPH_MAX_MS, RESORT_MAX_ANGLE)
+
+# Подписи режимов вращения для интерфейса
+ROTATION_MODE_NAMES = {
+    "x": "Вращение: X Ось",
+    "y": "Вращение: Y Ось",
+    "z": "Вращение: Z Ось",
+    "xy": "Вращение: X + Y Оси",
+    "stop": "Вращение: Остановлено",
+}
+
+# Слой интерфейса сохраняется между кадрами
+_hud = None
+# Область экрана, занятая сценой в последнем кадре
+_scene_rect = pygame.Rect(0, 0, 0, 0)
+# Порядок отрисовки граней последнего кадра алгоритма художника: модель, поворот и номера граней модели
+_previous_sort = None
+# Предупреждение о гранях, которые не удалось залить, выводится один раз
+_skipped_faces_reported = False
+
+# light_direction - направление на источник света (3,) или направления нескольких источников (L, 3)
+def render_scene(screen, mesh, rotation, camera_distance, fov, ambient_intensity, light_direction, back_face_culling,
+                 render_mode="painter"):
+    width, height = screen.get_size()
+    # Таблица освещённости по направлению нормали (строится заново, только если изменился свет)
+    lighting = get_lighting_table(light_direction, ambient_intensity)
+    # Алгоритм художника рисует части граней модели в порядке обхода её дерева BSP (если оно есть)
+    bsp = mesh.bsp if render_mode == "painter" else None
+    if bsp is not None:
+        mesh = bsp.mesh
+
+    # Шаг 1: Отбор граней, которые могут попасть в кадр, и отсечение их ближней плоскостью камеры
+    # Дальше все массивы граней относятся только к отобранным граням (face_ids - их номера в модели)
+    with profile_stage("projection"):
+        rotated_vertices = mesh.vertices @ rotation.T
+
+    # При плавном затенении освещённость вершин - дополнительный столбец повернутых вершин,
+    # чтобы в точках отсечения ближней плоскостью она интерполировалась вместе с координатами
+    if render_mode == "smooth":
+        with profile_stage("lighting"):
+            vertex_intensities = lighting.intensities(mesh.vertex_normals @ rotation.T)
+            rotated_vertices = np.column_stack([rotated_vertices, vertex_intensities])
+    with profile_stage("frustum"):
+        face_ids, face_indices, face_sizes, rotated_vertices, near_sides = select_view_faces(
+            mesh, rotation, rotated_vertices, camera_distance, fov, width, height)
+
+    # Шаг 2: Поворот кэшированных нормалей и центров граней, проецирование 3D точек в 2D
+    with profile_stage("projection"):
+        face_normals = (mesh.face_normals if face_ids is None else mesh.face_normals[face_ids]) @ rotation.T
+        face_centers = (mesh.face_centers if face_ids is None else mesh.face_centers[face_ids]) @ rotation.T
+        projected_np = project_vertices(rotated_vertices, camera_distance, fov, width, height)
+
+    if render_mode in ("zbuffer", "smooth"):
+        return render_scene_zbuffer(screen, mesh, face_ids, face_indices, face_sizes, near_sides,
+                                    rotated_vertices, projected_np, face_normals, face_centers, camera_distance,
+                                    lighting, back_face_culling, rotated_vertices[:, 3] if render_mode == "smooth" else None)
+
+    # Шаги 3-4: Порядок граней от дальних к ближним - обход дерева BSP или сортировка по средней Z-координате граней
+    with profile_stage("depth_sort"):
+        if bsp is not None:
+            draw_order = bsp.order(np.array([0.0, 0.0, -camera_distance]) @ rotation, face_ids)
         else:
-            faces_with_depth.sort(key=lambda x: x[1])
-    else:
-        faces_with_depth = [(faces[i], 0, face_colors[i]) for i in range(len(faces))]
-
-    # Шаг 4: Проверка видимости после сортировки
-    visible_face_count = 0
-    for face, z_avg, color in faces_with_depth:
-        face_vertices_3d = [rotated_vertices[idx] for idx in face]
-        face_normal = calculate_face_normal(face_vertices_3d)
-        face_center = np.mean(face_vertices_3d, axis=0)
-
-        # Проверяем видимость грани с помощью Back Face Culling
-        if needs_bfc and not is_face_visible(face_normal, face_center, camera_position=np.array([0, 0, -camera_distance])):
-            continue  # Пропускаем невидимую грань
-
-        # Применяем модель освещения Ламберта
-        lighted_color = apply_lambert_lighting(color, face_normal, light_direction, ambient_intensity)
-
-        # Шаг 5: Отрисовка текущей грани
-        face_points = [projected_points[idx] for idx in face]
-        # Проверка на валидность полигона (не все точки лежат на одной прямой)
-        if len(face_points) >= 3 and not are_points_collinear(face_points):
-            try:
-                pygame.draw.polygon(screen, lighted_color, face_points)
-            except TypeError:
-                print(f"Предупреждение: Пропущена грань в точках: {face_points}")
-
-        # Рисуем контур через алгоритм Брезенхэма
-        for i in range(len(face_points)):
-            x0, y0 = face_points[i]
-            x1, y1 = face_points[(i + 1) % len(face_points)]
-            x0, y0, x1, y1 = map(int, [x0, y0, x1, y1])
-            line_points = bresenham_algorithm(x0, y0, x1, y1)
-            for px, py in line_points:
-                if 0 <= px < WIDTH and 0 <= py < HEIGHT:
-                    screen.set_at((px, py), WHITE)
-
-        visible_face_count += 1
+            face_depths = calculate_face_depths(rotated_vertices, face_indices, face_sizes)
+            draw_order = sort_faces(mesh, face_ids, face_depths, rotation)
+
+    # Шаг 5: Back Face Culling и освещение Ламберта сразу для всех видимых граней (цвета - в порядке отрисовки)
+    with profile_stage("culling"):
+        # Двусторонние грани не отсекаются: в объединённой сцене признак задан для каждой грани отдельно
+        if back_face_culling and not np.all(mesh.double_sided):
+            visible = are_faces_visible(face_normals, face_centers, np.array([0, 0, -camera_distance]))
+            visible |= mesh.face_double_sided(face_ids)
+            draw_order = draw_order[visible[draw_order]]
+    with profile_stage("lighting"):
+        model_order = draw_order if face_ids is None else face_ids[draw_order]
+        lighted_colors = lighting.shade(mesh.shaded_palette, mesh.color_indices[model_order], face_normals[draw_order])
+    # Видимые грани считаются в гранях исходной модели, а не в частях граней дерева BSP
+    visible_face_count = len(draw_order) if bsp is None else len(np.unique(bsp.source_faces[model_order]))
+
+    # Шаг 6: Заливка граней в буфер индексов: в каждом пикселе остаётся номер (ранг) последней
+    # нарисованной грани, поэтому перекрытие граней такое же, как при заливке прямо на экран
+    # Все заливки и контуры лежат внутри прямоугольника проекций вершин, дальше работаем только с ним
+    region = set_scene_rect(projected_np if len(draw_order) else None, width, height)
+    if region is None:
+        return visible_face_count
+    x_min, y_min, x_max, y_max = region
+
+    # Грани нулевой площади (без треугольников в триангуляции модели) не заливаются, их контуры рисуются как обычно;
+    # грань, видимая на экране ровно ребром, заливается pygame в линию своего цвета
+    # Большие модели заливаются по полосам экрана в нескольких процессах
+    with profile_stage("fill"):
+        fillable = mesh.fillable_faces if face_ids is None else mesh.fillable_faces[face_ids]
+        filled_ranks = np.flatnonzero(fillable[draw_order]) + 1
+        fill_order = draw_order[filled_ranks - 1]
+        if is_parallel_enabled(len(draw_order)):
+            fill_ranks, skipped = fill_faces_parallel(projected_np, face_indices[fill_order], face_sizes[fill_order],
+                                                      filled_ranks, width, height, region)
+        else:
+            index_surface = get_index_surface(width, height)
+            skipped = fill_faces(index_surface, projected_np[face_indices[fill_order]].tolist(),
+                                 face_sizes[fill_order].tolist(), filled_ranks.tolist())
+            fill_ranks = pygame.surfarray.pixels2d(index_surface)
+        if skipped:
+            report_skipped_faces(skipped)
+
+    # Шаг 7: Контуры через алгоритм Брезенхэма сразу для всех видимых граней
+    with profile_stage("outline"):
+        clipped = (face_indices, face_sizes, near_sides) if near_sides is not None else None
+        outline_rank = draw_outlines(mesh, draw_order, projected_np, region, face_ids, clipped)
+
+    # Шаг 8: Сборка кадра: контур грани виден, если после него не рисовалась грань, перекрывающая этот пиксель
+    with profile_stage("composite"):
+        fill_rank = fill_ranks[x_min:x_max, y_min:y_max]
+        outline_visible = outline_rank >= fill_rank
+        outline_visible &= outline_rank > 0
+        filled = fill_rank > 0
+        filled &= ~outline_visible
+
+        rank_colors = np.empty((len(draw_order) + 1, 3), dtype=np.uint8)
+        rank_colors[1:] = lighted_colors
+        screen_pixels = pygame.surfarray.pixels3d(screen)[x_min:x_max, y_min:y_max]
+        screen_pixels[filled] = rank_colors[fill_rank[filled]]
+        screen_pixels[outline_visible] = WHITE
+        del screen_pixels, fill_rank, fill_ranks
 
     return visible_face_count
 
-def are_points_collinear(points, tolerance=1e-5):
-    if len(points) < 3:
-        return False
-    p0, p1 = points[0], points[1]
-    for i in range(2, len(points)):
-        p2 = points[i]
-        area = abs((p1[0] - p0[0]) * (p2[1] - p0[1]) - (p2[0] - p0[0]) * (p1[1] - p0[1]))
-        if area > tolerance:
-             return False
-    return True
-
-def render_ui(screen, current_shape, camera_distance, rotation_mode, back_face_culling, visible_face_count, fov_value, ambient_value, buttons, fov_slider, ambient_slider, clock, faces):
-    # Создание шрифта
-    font = pygame.font.SysFont("Arial", 24)
-
-    # Отрисовка кнопок
-    for button in buttons:
-        button.draw(screen)
-
-    # Отрисовка ползунков
-    fov_slider.draw(screen)
-    ambient_slider.draw(screen)
-
-    # Отображение текущей фигуры
-    shape_text = f"Фигура: {current_shape.capitalize()}"
-    shape_surf = font.render(shape_text, True, WHITE)
-    screen.blit(shape_surf, (50, 250))
-
-    # Отображение расстояния камеры
-    distance_text = f"Дистанция камеры: {camera_distance:.1f}"
-    distance_surf = font.render(distance_text, True, WHITE)
-    screen.blit(distance_surf, (50, 300))
-
-    # Отображение режима вращения
-    mode_text = ""
-    if rotation_mode == "x":
-        mode_text = "Вращение: X Ось"
-    elif rotation_mode == "y":
-        mode_text = "Вращение: Y Ось"
-    elif rotation_mode == "z":
-        mode_text = "Вращение: Z Ось"
-    elif rotation_mode == "xy":
-        mode_text = "Вращение: X + Y Оси"
-    elif rotation_mode == "stop":
-        mode_text = "Вращение: Остановлено"
-    text_surf = font.render(mode_text, True, WHITE)
-    screen.blit(text_surf, (50, 350))
-
-    # Отображение статуса Back Face Culling
-    culling_status = "ON" if back_face_culling else "OFF"
-    culling_text = f"Back Face Culling: {culling_status}"
-    culling_surf = font.render(culling_text, True, WHITE)
-    screen.blit(culling_surf, (50, 400))
-
-    # Отображение счётчика видимых граней
-    visible_faces_text = f"Видимые грани: {visible_face_count}/{len(faces)}"
-    visible_faces_surf = font.render(visible_faces_text, True, WHITE)
-    screen.blit(visible_faces_surf, (50, 450))
-
-    # Отображение FPS
-    fps = clock.get_fps()
-    fps_text = f"FPS: {int(fps)}"
-    fps_surf = font.render(fps_text, True, WHITE)
-    screen.blit(fps_surf, (50, 500))
-
-    # Отображение текущего значения FOV
-    fov_text = f"FOV: {int(fov_value)}"
-    fov_surf = font.render(fov_text, True, WHITE)
-    screen.blit(fov_surf, (950, 525))
-
-    # Отображение текущей интенсивности света
-    ambient_text = f"Яркость: {ambient_value:.2f}"
-    ambient_surf = font.render(ambient_text, True, WHITE)
-    screen.blit(ambient_surf, (950, 575))
+# Функция для предупреждения о гранях, пропущенных при заливке (только при первом таком кадре, чтобы не засорять вывод)
+def report_skipped_faces(count):
+    global _skipped_faces_reported
+    if not _skipped_faces_reported:
+        print(f"Предупреждение: пропущено граней при заливке: {count} (дальше сообщение не повторяется)")
+        _skipped_faces_reported = True
+
+# Функция для порядка отрисовки граней (номера в наборе face_ids) по их глубинам face_depths
+# Между кадрами поворот меняется мало, поэтому порядок прошлого кадра почти отсортирован: он уточняется линейной
+# поразрядной сортировкой (см. coherent_painter_order). Полная сортировка - для новой модели или после резкого
+# поворота (больше RESORT_MAX_ANGLE радиан)
+def sort_faces(mesh, face_ids, face_depths, rotation):
+    global _previous_sort
+    previous_mesh, previous_rotation, previous_order = _previous_sort or (None, None, None)
+    if previous_mesh is not mesh or rotation_angle(previous_rotation, rotation) > RESORT_MAX_ANGLE:
+        draw_order = painter_order(face_depths)
+    elif face_ids is None and len(previous_order) == len(face_depths):
+        draw_order = coherent_painter_order(face_depths, previous_order)
+    else:
+        # Грани прошлого кадра, не попавшие в набор, отбрасываются, а новые грани набора добавляются в конец
+        set_positions = np.full(mesh.face_count, -1, dtype=np.int64)
+        set_positions[np.arange(len(face_depths)) if face_ids is None else face_ids] = np.arange(len(face_depths))
+        previous_order = set_positions[previous_order]
+        previous_order = previous_order[previous_order >= 0]
+        is_new = np.ones(len(face_depths), dtype=bool)
+        is_new[previous_order] = False
+        draw_order = coherent_painter_order(face_depths, np.concatenate([previous_order, np.flatnonzero(is_new)]))
+    _previous_sort = (mesh, rotation, draw_order if face_ids is None else face_ids[draw_order])
+    return draw_order
+
+# Функция для угла (в радианах) между поворотами, заданными матрицами (бесконечность, если первого поворота нет)
+def rotation_angle(previous_rotation, rotation):
+    if previous_rotation is None:
+        return np.inf
+    cosine = (np.trace(previous_rotation.T @ rotation) - 1) / 2
+    return float(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+# Функция для отбора граней, которые могут попасть в кадр
+# Иерархия ограничивающих сфер модели отбрасывает целые группы граней вне пирамиды видимости,
+# грани целиком за ближней плоскостью NEAR_PLANE отбрасываются, а пересекающие её - отсекаются
+# Возвращает номера отобранных граней в модели (None - все грани), их индексы вершин и длины,
+# повёрнутые вершины, дополненные точками отсечения (дополнительные столбцы вершин в них интерполируются),
+# и маску сторон граней, идущих по ближней плоскости
+# (None, если ни одна грань не отсекалась)
+def select_view_faces(mesh, rotation, rotated_vertices, camera_distance, fov, width, height):
+    face_ids, crosses_near = mesh.bvh.query(rotation, camera_distance, fov, width, height, NEAR_PLANE)
+    face_indices = mesh.faces if face_ids is None else mesh.faces[face_ids]
+    face_sizes = mesh.face_sizes if face_ids is None else mesh.face_sizes[face_ids]
+    if not crosses_near:
+        return face_ids, face_indices, face_sizes, rotated_vertices, None
+
+    in_front = (camera_distance + rotated_vertices[:, 2] >= NEAR_PLANE)[face_indices]
+    kept = np.flatnonzero(in_front.any(axis=1))
+    face_ids = kept if face_ids is None else face_ids[kept]
+    face_indices, face_sizes = face_indices[kept], face_sizes[kept]
+    crossing = np.flatnonzero(~in_front[kept].all(axis=1))
+    if not len(crossing):
+        return face_ids, face_indices, face_sizes, rotated_vertices, None
+
+    new_vertices, clipped_faces, clipped_sizes, clipped_near_sides = clip_faces_near(
+        rotated_vertices, camera_distance + rotated_vertices[:, 2], face_indices[crossing], face_sizes[crossing], NEAR_PLANE)
+
+    # Отсечённая грань может стать длиннее исходной: массив граней расширяется повтором последней вершины
+    corner_count = max(face_indices.shape[1], clipped_faces.shape[1])
+    corners = np.minimum(np.arange(corner_count), face_sizes[:, None] - 1)
+    face_indices = np.take_along_axis(face_indices, corners, axis=1)
+    face_indices[crossing, :clipped_faces.shape[1]] = clipped_faces
+    face_indices[crossing, clipped_faces.shape[1]:] = clipped_faces[:, -1:]
+    face_sizes = face_sizes.copy()
+    face_sizes[crossing] = clipped_sizes
+    near_sides = np.zeros(face_indices.shape, dtype=bool)
+    near_sides[crossing, :clipped_faces.shape[1]] = clipped_near_sides
+    return face_ids, face_indices, face_sizes, np.concatenate([rotated_vertices, new_vertices]), near_sides
+
+# Функция для запоминания прямоугольника экрана, в котором нарисована сцена (по проекциям вершин)
+# Возвращает (x_min, y_min, x_max, y_max) или None, если сцена не попала на экран
+def set_scene_rect(projected_points, width, height):
+    global _scene_rect
+    _scene_rect = pygame.Rect(0, 0, 0, 0)
+    if projected_points is None or not len(projected_points):
+        return None
+    projected_points = projected_points[np.isfinite(projected_points).all(axis=1)]
+    if not len(projected_points):
+        return None
+    x_min, y_min = np.maximum(np.floor(projected_points.min(axis=0)).astype(int) - 1, 0)
+    x_max, y_max = np.minimum(np.ceil(projected_points.max(axis=0)).astype(int) + 2, (width, height))
+    if x_min >= x_max or y_min >= y_max:
+        return None
+    _scene_rect = pygame.Rect(x_min, y_min, x_max - x_min, y_max - y_min)
+    return x_min, y_min, x_max, y_max
+
+# Прямоугольник, в котором была нарисована сцена в последнем вызове render_scene
+def get_scene_rect():
+    return _scene_rect
+
+# Функция для расчёта контуров граней: для каждого пикселя области region = (x_min, y_min, x_max, y_max)
+# возвращает ранг последней грани, контур которой проходит через этот пиксель (0 - контура нет)
+# Каждое ребро модели растеризуется один раз в каждом направлении, в котором его обходят видимые грани
+# face_ids - номера граней draw_order в модели (None - совпадают), clipped = (грани, длины, стороны на ближней плоскости)
+# после отсечения ближней плоскостью: стороны отсечённых граней рисуются отдельно, кроме сторон по самой плоскости
+def draw_outlines(mesh, draw_order, projected_points, region, face_ids=None, clipped=None):
+    x_min, y_min, x_max, y_max = region
+    outline_rank = np.zeros((x_max - x_min, y_max - y_min), dtype=np.int64)
+    ranks = np.arange(1, len(draw_order) + 1)
+    model_order = draw_order if face_ids is None else face_ids[draw_order]
+
+    clip_start = clip_end = clip_rank = np.empty(0, dtype=np.int64)
+    if clipped is not None:
+        faces, face_sizes, near_sides = clipped
+        is_clipped = near_sides[draw_order].any(axis=1)
+        clipped_order = draw_order[is_clipped]
+        corners = np.arange(faces.shape[1])
+        sides = (corners < face_sizes[clipped_order, None]) & ~near_sides[clipped_order]
+        next_corner = np.where(corners + 1 < face_sizes[clipped_order, None], corners + 1, 0)
+        clip_start = faces[clipped_order][sides].astype(np.int64)
+        clip_end = np.take_along_axis(faces[clipped_order], next_corner, axis=1)[sides].astype(np.int64)
+        clip_rank = np.broadcast_to(ranks[is_clipped][:, None], sides.shape)[sides]
+        model_order, ranks = model_order[~is_clipped], ranks[~is_clipped]
+
+    # Ранг каждого направленного ребра - наибольший ранг видимой грани, которая его обходит
+    face_edges = mesh.face_edges[model_order]
+    has_edge = face_edges >= 0
+    directed_edges = 2 * face_edges[has_edge].astype(np.int64) + mesh.face_edges_reversed[model_order][has_edge]
+    ranks = np.broadcast_to(ranks[:, None], face_edges.shape)[has_edge]
+    edge_rank = np.zeros(2 * len(mesh.edges), dtype=np.int64)
+    np.maximum.at(edge_rank, directed_edges, ranks)
+
+    directed_edges = np.flatnonzero(edge_rank)
+    edges = mesh.edges[directed_edges // 2]
+    reversed_edges = (directed_edges % 2).astype(bool)
+    start = np.concatenate([np.where(reversed_edges, edges[:, 1], edges[:, 0]), clip_start])
+    end = np.concatenate([np.where(reversed_edges, edges[:, 0], edges[:, 1]), clip_end])
+    line_rank = np.concatenate([edge_rank[directed_edges], clip_rank])
+
+    # Рёбра с вершинами, ушедшими в бесконечность (вершина в плоскости камеры), не рисуются
+    finite = np.isfinite(projected_points).all(axis=1)
+    keep = finite[start] & finite[end]
+    start, end, line_rank = start[keep], end[keep], line_rank[keep]
+
+    # Координаты вершин отбрасываются до целых так же, как int() в исходном алгоритме
+    points = np.trunc(np.where(finite[:, None], projected_points, 0)).astype(np.int64)
+    xs, ys, line_ids = bresenham_lines(points[start, 0], points[start, 1], points[end, 0], points[end, 1])
+    inside = (xs >= x_min) & (xs < x_max) & (ys >= y_min) & (ys < y_max)
+    np.maximum.at(outline_rank, (xs[inside] - x_min, ys[inside] - y_min), line_rank[line_ids[inside]])
+    return outline_rank
+
+# Отрисовка через Z-буфер: грани не сортируются, видимость решается попиксельно
+# Грани растеризуются по готовой триангуляции модели (face_ids, face_indices, face_sizes, near_sides - см. select_view_faces)
+# lighting - таблица освещённости (LightingTable)
+# vertex_intensities - освещённость вершин для плавного затенения (None - каждая грань освещена одним цветом)
+def render_scene_zbuffer(screen, mesh, face_ids, face_indices, face_sizes, near_sides, rotated_vertices,
+                         projected_points, face_normals, face_centers, camera_distance, lighting, back_face_culling,
+                         vertex_intensities=None):
+    # Back Face Culling; грани за камерой или на её плоскости не растеризуются
+    with profile_stage("culling"):
+        depths = camera_distance + rotated_vertices[:, 2]
+        drawn = (depths[face_indices] > 0).all(axis=1)
+        if back_face_culling and not np.all(mesh.double_sided):
+            drawn &= are_faces_visible(face_normals, face_centers, np.array([0, 0, -camera_distance])) | \
+                     mesh.face_double_sided(face_ids)
+        drawn_faces = np.flatnonzero(drawn)
+
+    # Освещение Ламберта для всех граней сразу (при плавном затенении вершины уже освещены, грани сохраняют свой цвет)
+    with profile_stage("lighting"):
+        if vertex_intensities is None:
+            color_indices = mesh.color_indices if face_ids is None else mesh.color_indices[face_ids]
+            lighted_colors = lighting.shade(mesh.shaded_palette, color_indices, face_normals)
+        else:
+            lighted_colors = mesh.colors if face_ids is None else mesh.colors[face_ids]
+
+    width, height = screen.get_size()
+    region = set_scene_rect(projected_points[face_indices[drawn_faces]].reshape(-1, 2), width, height)
+
+    # Большие модели растеризуются по полосам экрана в нескольких процессах
+    with profile_stage("fill"):
+        triangles, triangle_faces = select_triangles(mesh, face_ids, drawn_faces, face_indices, face_sizes, near_sides)
+        intensities = vertex_intensities[triangles] if vertex_intensities is not None else None
+
+        if region is not None and is_parallel_enabled(len(drawn_faces)):
+            color_buffer, depth_buffer = rasterize_triangles_parallel(
+                projected_points[triangles], 1.0 / depths[triangles], lighted_colors[triangle_faces],
+                width, height, BLACK, (region[1], region[3]), intensities)
+        else:
+            color_buffer, depth_buffer = get_frame_buffers(width, height)
+            rasterize_triangles(color_buffer, depth_buffer, projected_points[triangles], 1.0 / depths[triangles],
+                                lighted_colors[triangle_faces], intensities=intensities)
+    with profile_stage("composite"):
+        present_frame_buffer(screen, color_buffer)
+
+    return len(drawn_faces)
+
+# Функция для отбора треугольников граней drawn_faces (номера в наборе select_view_faces) из триангуляции модели
+# Грани, отсечённые ближней плоскостью, состоят из вершин этого кадра и делятся веером
+# (отсечение выпуклой грани выпукло, невыпуклые грани у самой камеры могут залиться неточно)
+# Возвращает индексы вершин треугольников (T, 3) и номер грани набора для каждого треугольника
+def select_triangles(mesh, face_ids, drawn_faces, face_indices, face_sizes, near_sides):
+    clipped = near_sides[drawn_faces].any(axis=1) if near_sides is not None else np.zeros(len(drawn_faces), dtype=bool)
+    whole_faces = drawn_faces[~clipped]
+    set_positions = np.full(mesh.face_count, -1, dtype=np.int64)
+    set_positions[whole_faces if face_ids is None else face_ids[whole_faces]] = whole_faces
+    triangle_faces = set_positions[mesh.triangle_faces]
+    drawn = triangle_faces >= 0
+    triangles, triangle_faces = mesh.triangles[drawn], triangle_faces[drawn]
+
+    clipped_faces = drawn_faces[clipped]
+    if len(clipped_faces):
+        fan, fan_faces = triangulate_faces(face_indices[clipped_faces], face_sizes[clipped_faces])
+        triangles = np.concatenate([triangles, fan])
+        triangle_faces = np.concatenate([triangle_faces, clipped_faces[fan_faces]])
+    return triangles, triangle_faces
+
+def render_ui(screen, current_shape, camera_distance, rotation_mode, back_face_culling, visible_face_count, fov_value, ambient_value, buttons, fov_slider, ambient_slider, clock, faces,
+              render_mode="painter", loading_indicator=None, load_progress=None):
+    hud = get_hud(buttons, [fov_slider, ambient_slider])
+
+    # Отрисовка кнопок и ползунков (одной заранее собранной поверхностью)
+    if hud.overlay.update():
+        hud.mark_dirty(hud.overlay.rect)
+    hud.overlay.draw(screen)
+
+    # Надписи: ключ, позиция и текст; поверхность надписи обновляется, только если текст изменился
+    labels = [
+        # Режим отрисовки
+        ("render_mode", (50, 200), f"Отрисовка: {RENDER_MODE_NAMES.get(render_mode, render_mode)}"),
+        # Текущая фигура
+        ("shape", (50, 250), f"Фигура: {current_shape.capitalize()}"),
+        # Расстояние камеры
+        ("distance", (50, 300), f"Дистанция камеры: {camera_distance:.1f}"),
+        # Режим вращения
+        ("rotation", (50, 350), ROTATION_MODE_NAMES.get(rotation_mode, "")),
+        # Статус Back Face Culling
+        ("culling", (50, 400), f"Back Face Culling: {'ON' if back_face_culling else 'OFF'}"),
+        # Счётчик видимых граней
+        ("visible_faces", (50, 450), f"Видимые грани: {visible_face_count}/{len(faces)}"),
+        # FPS
+        ("fps", (50, 500), f"FPS: {int(clock.get_fps())}"),
+        # Текущее значение FOV
+        ("fov", (950, 525), f"FOV: {int(fov_value)}"),
+        # Текущая интенсивность света
+        ("ambient", (950, 575), f"Яркость: {ambient_value:.2f}"),
+    ]
+    for key, (x, y), text in labels:
+        label = hud.label(key, x, y)
+        previous_rect = label.rect
+        if label.set_text(text):
+            hud.mark_dirty(previous_rect)
+            hud.mark_dirty(label.rect)
+        label.draw(screen)
+
+    # Отображение прогресса фоновой загрузки модели
+    if loading_indicator is not None:
+        loading_state = loading_indicator.get_state(load_progress)
+        if loading_state != hud.loading_state:
+            hud.loading_state = loading_state
+            hud.mark_dirty(loading_indicator.get_area())
+        if load_progress is not None:
+            loading_indicator.draw(screen, load_progress)
+
+# Функция для получения слоя интерфейса (создаётся заново, если сменился набор кнопок и ползунков)
+def get_hud(buttons, sliders):
+    global _hud
+    widgets = list(buttons) + list(sliders)
+    if _hud is None or _hud.overlay.widgets != widgets:
+        _hud = Hud(widgets)
+    return _hud
+
+# Функция для получения прямоугольников интерфейса, изменившихся с прошлого вызова
+def pop_ui_dirty_rects():
+    return _hud.pop_dirty_rects() if _hud is not None else []
+
+# Функция для отрисовки оверлея профилировщика в правом верхнем углу экрана:
+# статистика по этапам кадра (среднее, 95-й перцентиль, максимум) и график времени последних кадров
+# Возвращает прямоугольник оверлея (его нужно вывести на экран вместе с остальными изменениями)
+def render_profiler_overlay(screen, font_size=16, line_height=18, padding=8):
+    stats = get_stage_stats()
+    graph_width, graph_height = PROFILE_GRAPH_SIZE
+    rows = [f"{'этап':<11}{'сред':>7}{'p95':>7}{'макс':>7}  мс"]
+    rows += [f"{name:<11}{values['mean']:>7.2f}{values['p95']:>7.2f}{values['max']:>7.2f}" for name, values in stats.items()]
+
+    width = graph_width + 2 * padding
+    height = len(rows) * line_height + graph_height + 3 * padding
+    rect = pygame.Rect(screen.get_width() - width - 10, 10, width, height)
+    panel = pygame.Surface(rect.size, pygame.SRCALPHA)
+    panel.fill((*BLACK, 180))
+    for row, text in enumerate(rows):
+        panel.blit(render_text(text, WHITE, font_size, "Courier New"), (padding, padding + row * line_height))
+
+    # График: столбец на кадр, цвет по бюджету 60 / 30 FPS, линия отмечает 16.7 мс
+    graph_top = rect.height - padding - graph_height
+    frame_times = get_stage_times().get("frame", np.empty(0))[-graph_width:]
+    for x, frame_ms in enumerate(frame_times, start=padding + graph_width - len(frame_times)):
+        bar = min(int(frame_ms / PROFILE_GRAPH_MAX_MS * graph_height), graph_height)
+        color = GREEN if frame_ms <= 1000 / 60 else YELLOW if frame_ms <= 1000 / 30 else RED
+        pygame.draw.line(panel, color, (x, graph_top + graph_height - 1), (x, graph_top + graph_height - bar))
+    budget_y = graph_top + graph_height - int(1000 / 60 / PROFILE_GRAPH_MAX_MS * graph_height)
+    pygame.draw.line(panel, WHITE, (padding, budget_y), (padding + graph_width - 1, budget_y))
+
+    screen.blit(panel, rect.topleft)
+    return rect
 
 # Функция для отрисовки и обработки окна выбора фигуры
 def render_shape_selection_window(screen, event, selection_window):
@@ -0,0 +1,85 @@
+import numpy as np
+from math_utils import lambert_intensities
+from parameters import LIGHTING_NORMAL_BINS, LIGHTING_LEVELS
+
+# Освещение через таблицы: освещённость зависит только от направления нормали, поэтому она заранее считается
+# для сетки направлений (октаэдрическая развёртка сферы bins x bins) и квантуется до LIGHTING_LEVELS уровней
+# Таблица пересчитывается только при смене источников света или окружающего освещения; в кадре нормали лишь
+# переводятся в номера ячеек, и цена кадра не зависит от числа источников света
+
+# Последняя построенная таблица и направления источников света, для которых она построена
+_table = None
+_table_key = None
+
+# Класс таблицы освещённости: уровень освещённости (0..levels - 1) для каждой ячейки направлений нормали
+# Рассеянный свет ячеек хранится отдельно, поэтому смена окружающего света (ползунок) почти ничего не стоит
+class LightingTable:
+    def __init__(self, light_directions, ambient, bins=LIGHTING_NORMAL_BINS, levels=LIGHTING_LEVELS):
+        self.bins = bins
+        self.levels = levels
+        self.diffuse = lambert_intensities(octahedral_decode(np.arange(bins * bins), bins), light_directions, 0.0)
+        self.set_ambient(ambient)
+
+    def set_ambient(self, ambient):
+        self.ambient = ambient
+        intensities = np.minimum(1.0, ambient + self.diffuse)
+        self.bin_levels = np.rint(intensities * (self.levels - 1)).astype(np.uint16 if self.levels > 256 else np.uint8)
+
+    # Уровни освещённости для нормалей (N, 3)
+    def levels_of(self, normals):
+        return self.bin_levels[octahedral_encode(normals, self.bins)]
+
+    # Освещённость (от 0 до 1) для нормалей (N, 3), например для вершин при плавном затенении
+    def intensities(self, normals):
+        return self.levels_of(normals) / np.float32(self.levels - 1)
+
+    # Освещённые цвета граней: palette_colors - (P, levels, 3) палитра модели с уровнями освещённости
+    # (см. Mesh.shaded_palette), color_indices - (F,) номера цветов граней в палитре
+    def shade(self, palette_colors, color_indices, normals):
+        cells = color_indices * self.levels + self.levels_of(normals)
+        return np.take(palette_colors.reshape(-1, 3), cells, axis=0)
+
+# Функция для получения таблицы освещённости для источников света light_directions ((3,) или (L, 3))
+# и окружающего света ambient; таблица строится заново, только если изменились источники света
+def get_lighting_table(light_directions, ambient):
+    global _table, _table_key
+    key = np.asarray(light_directions, dtype=np.float64).tobytes()
+    if key != _table_key:
+        _table = LightingTable(light_directions, ambient)
+        _table_key = key
+    elif ambient != _table.ambient:
+        _table.set_ambient(ambient)
+    return _table
+
+# Функция для расчёта цветов палитры при всех уровнях освещённости: (P, levels, 3) uint8
+# Уровень k соответствует освещённости k / (levels - 1): цвет умножается на неё и отбрасывается до целого
+def shade_palette(palette, levels=LIGHTING_LEVELS):
+    intensity = np.arange(levels) / (levels - 1)
+    return (np.asarray(palette, dtype=np.float64)[:, None, :] * intensity[None, :, None]).astype(np.uint8)
+
+# Функция для перевода направлений (N, 3) в номера ячеек октаэдрической развёртки bins x bins
+# Направление делится на сумму модулей координат; верхняя половина сферы (z >= 0) попадает в ромб |u| + |v| <= 1,
+# нижняя отражается в углы квадрата вне него. Расчёт ведётся в float32 сразу в масштабе ячеек
+def octahedral_encode(normals, bins):
+    x, y, z = np.asarray(normals, dtype=np.float32).T.copy()
+    abs_x, abs_y = np.abs(x), np.abs(y)
+    # Половина стороны квадрата в ячейках (с запасом, чтобы u = 1 не выходило за последнюю ячейку)
+    half = np.float32(bins / 2 * (1 - 1e-6))
+    scale = half / (abs_x + abs_y + np.abs(z))
+    lower = z < 0
+    u = np.where(lower, np.copysign(half - abs_y * scale, x), x * scale)
+    v = np.where(lower, np.copysign(half - abs_x * scale, y), y * scale)
+    u += half
+    v += half
+    return u.astype(np.int32) * bins + v.astype(np.int32)
+
+# Функция для получения единичных направлений центров ячеек октаэдрической развёртки
+def octahedral_decode(cells, bins):
+    u = (cells // bins + 0.5) / bins * 2 - 1
+    v = (cells % bins + 0.5) / bins * 2 - 1
+    z = 1 - np.abs(u) - np.abs(v)
+    lower = z < 0
+    x = np.where(lower, (1 - np.abs(v)) * np.where(u >= 0, 1.0, -1.0), u)
+    y = np.where(lower, (1 - np.abs(u)) * np.where(v >= 0, 1.0, -1.0), v)
+    directions = np.stack([x, y, z], axis=1)
+    return directions / np.linalg.norm(directions, axis=1)[:, None]
@@ -0,0 +1,170 @@
+import numpy as np
+from mesh import Mesh
+from parameters import WIDTH, HEIGHT, LOD_PIXELS_PER_FACE, LOD_MIN_FACES
+
+# Уровень детализации считается полезным, только если он уменьшает число граней хотя бы на четверть
+LOD_MIN_REDUCTION = 0.75
+
+# Класс цепочки уровней детализации модели (от самого подробного к самому грубому)
+class LodChain:
+    def __init__(self, levels):
+        self.levels = list(levels)
+        vertices = self.levels[0].vertices
+        # Радиус описанной сферы относительно начала координат (вокруг него модель вращается)
+        self.radius = float(np.sqrt((vertices.astype(np.float64) ** 2).sum(axis=1).max())) if len(vertices) else 0.0
+
+    # Цепочка для произвольной модели: грубые уровни строятся упрощением сетки
+    # Каждый следующий уровень получается из предыдущего на вдвое более крупной сетке
+    @classmethod
+    def from_mesh(cls, mesh, min_faces=LOD_MIN_FACES):
+        levels = [mesh]
+        if mesh.face_count <= min_faces:
+            return cls(levels)
+
+        grid_size = 1 << int(np.log2(np.sqrt(mesh.face_count)))
+        low, cell_size, cells = _grid_cells(mesh, grid_size)
+        quadrics = vertex_quadrics(mesh)
+        current = mesh
+        while grid_size >= 2 and levels[-1].face_count > min_faces:
+            simplified, cells, quadrics = _cluster_vertices(current, cells, quadrics, low, cell_size)
+            if simplified is None:
+                break
+            current = simplified
+            if simplified.face_count <= levels[-1].face_count * LOD_MIN_REDUCTION:
+                levels.append(simplified)
+            grid_size //= 2
+            cells //= 2
+            cell_size *= 2
+        return cls(levels)
+
+    # Цепочка для параметрической фигуры: грубые уровни строятся тем же генератором с меньшим разрешением
+    # resolution - разрешение самого подробного уровня, min_resolution - нижняя граница по каждому параметру
+    # mesh - уже построенный самый подробный уровень (если есть)
+    @classmethod
+    def from_generator(cls, generator, resolution, min_resolution, mesh=None, min_faces=LOD_MIN_FACES):
+        levels = [mesh if mesh is not None else generator(*resolution)]
+        while levels[-1].face_count > min_faces:
+            resolution = tuple(max(value // 2, lowest) for value, lowest in zip(resolution, min_resolution))
+            mesh = generator(*resolution)
+            if mesh.face_count > levels[-1].face_count * LOD_MIN_REDUCTION:
+                break
+            levels.append(mesh)
+        return cls(levels)
+
+    # Выбор уровня по размеру проекции модели на экране
+    # Берётся самый подробный уровень, в котором на одну грань приходится не меньше LOD_PIXELS_PER_FACE пикселей
+    def select(self, camera_distance, fov, screen_area=WIDTH * HEIGHT):
+        near = camera_distance - self.radius
+        if near <= 0:
+            return self.levels[0]
+        projected_radius = fov * self.radius / near
+        face_budget = min(np.pi * projected_radius ** 2, screen_area) / LOD_PIXELS_PER_FACE
+        for level in self.levels:
+            if level.face_count <= face_budget:
+                return level
+        return self.levels[-1]
+
+# Функция для упрощения модели кластеризацией вершин по сетке grid_size^3 (Lindstrom, 2000)
+# Вершины одной ячейки сливаются в точку, минимизирующую квадратичную ошибку до плоскостей их граней
+# Возвращает новую модель или None, если после упрощения не осталось граней
+def simplify_mesh(mesh, grid_size):
+    low, cell_size, cells = _grid_cells(mesh, grid_size)
+    return _cluster_vertices(mesh, cells, vertex_quadrics(mesh), low, cell_size)[0]
+
+# Функция для расчёта квадрик вершин (V, 10): сумма квадрик плоскостей прилегающих граней с весом по площади
+# Хранятся 10 независимых элементов симметричной матрицы 4x4 в порядке _QUADRIC_INDICES
+def vertex_quadrics(mesh):
+    vertices = mesh.vertices.astype(np.float64)
+    faces, face_sizes = mesh.faces, mesh.face_sizes
+
+    # Плоскость каждой грани по формуле Ньюэлла: длина вектора равна удвоенной площади грани
+    face_vertices = vertices[faces]
+    plane_normals = np.cross(face_vertices, np.roll(face_vertices, -1, axis=1)).sum(axis=1)
+    doubled_area = np.linalg.norm(plane_normals, axis=1)
+    valid = doubled_area > 0
+    plane_normals[valid] /= doubled_area[valid, None]
+    plane = np.empty((len(faces), 4))
+    plane[:, :3] = plane_normals
+    plane[:, 3] = -(plane_normals * face_vertices[:, 0]).sum(axis=1)
+    face_quadrics = np.stack([doubled_area * plane[:, i] * plane[:, j] for i, j in _QUADRIC_INDICES], axis=1)
+
+    # Квадрика грани добавляется каждой её вершине (дополняющие позиции идут с нулевым весом)
+    quadrics = np.zeros((len(vertices), len(_QUADRIC_INDICES)))
+    for corner in range(faces.shape[1]):
+        in_face = face_sizes > corner
+        for k in range(len(_QUADRIC_INDICES)):
+            quadrics[:, k] += np.bincount(faces[:, corner], face_quadrics[:, k] * in_face, minlength=len(vertices))
+    return quadrics
+
+# Порядок элементов (i, j) симметричной матрицы квадрики в упакованном виде
+_QUADRIC_INDICES = [(i, j) for i in range(4) for j in range(i, 4)]
+
+# Функция для разбиения вершин модели на ячейки сетки grid_size^3 по ограничивающему параллелепипеду
+def _grid_cells(mesh, grid_size):
+    low, high = mesh.bounds
+    low = low.astype(np.float64)
+    cell_size = max(float((high - low).max()) / grid_size, 1e-12)
+    cells = np.minimum(((mesh.vertices - low) / cell_size).astype(np.int64), grid_size - 1)
+    return low, cell_size, cells
+
+# Функция для слияния вершин, попавших в одну ячейку
+# cells - (V, 3) номера ячеек вершин, quadrics - (V, 10) квадрики вершин
+# Возвращает модель и номера ячеек и квадрики её вершин (для построения следующего уровня)
+def _cluster_vertices(mesh, cells, quadrics, low, cell_size):
+    vertices = mesh.vertices.astype(np.float64)
+    span = int(cells.max()) + 1
+    cell_keys = (cells[:, 0] * span + cells[:, 1]) * span + cells[:, 2]
+    cell_keys, first_vertex, clusters = np.unique(cell_keys, return_index=True, return_inverse=True)
+    clusters = clusters.reshape(-1)
+    cluster_count = len(cell_keys)
+
+    cluster_quadrics = np.stack([np.bincount(clusters, quadrics[:, k], minlength=cluster_count)
+                                 for k in range(len(_QUADRIC_INDICES))], axis=1)
+
+    # По умолчанию вершина кластера - среднее его вершин
+    counts = np.bincount(clusters, minlength=cluster_count)[:, None]
+    positions = np.stack([np.bincount(clusters, vertices[:, axis], minlength=cluster_count) for axis in range(3)], axis=1)
+    positions /= counts
+
+    # Там, где квадрика хорошо обусловлена, берётся точка минимума ошибки (если она не уходит далеко от ячейки)
+    # Система 3x3 решается явно через присоединённую матрицу
+    a, b, c, d, e, f, g, h, i, _ = cluster_quadrics.T
+    cofactors = np.stack([e * h - f * f, c * f - b * h, b * f - c * e,
+                          a * h - c * c, b * c - a * f, a * e - b * b], axis=1)
+    determinant = a * cofactors[:, 0] + b * cofactors[:, 1] + c * cofactors[:, 2]
+    trace = a + e + h
+    solvable = np.flatnonzero(determinant > 1e-6 * trace ** 3)
+    if len(solvable):
+        k00, k01, k02, k11, k12, k22 = cofactors[solvable].T
+        rhs = -cluster_quadrics[solvable][:, [3, 6, 8]]
+        optimal = np.stack([k00 * rhs[:, 0] + k01 * rhs[:, 1] + k02 * rhs[:, 2],
+                            k01 * rhs[:, 0] + k11 * rhs[:, 1] + k12 * rhs[:, 2],
+                            k02 * rhs[:, 0] + k12 * rhs[:, 1] + k22 * rhs[:, 2]], axis=1) / determinant[solvable, None]
+        cell_low = low + cells[first_vertex[solvable]] * cell_size
+        inside = ((optimal >= cell_low - cell_size) & (optimal <= cell_low + 2 * cell_size)).all(axis=1)
+        positions[solvable[inside]] = optimal[inside]
+
+    # Грани переводятся на вершины кластеров, повторяющиеся соседние вершины удаляются
+    new_faces, new_sizes = _collapse_faces(clusters[mesh.faces], mesh.face_sizes)
+    kept = new_sizes >= 3
+    if not kept.any():
+        return None, None, None
+    simplified = Mesh(positions, new_faces[kept], new_sizes[kept], mesh.colors[kept], mesh.face_double_sided(kept))
+    return simplified, cells[first_vertex], cluster_quadrics
+
+# Функция для удаления из граней подряд идущих одинаковых вершин (с учётом замыкания грани)
+# Оставшиеся вершины сдвигаются к началу строки, хвост дополняется последней вершиной
+def _collapse_faces(faces, face_sizes):
+    corners = np.arange(faces.shape[1])
+    in_face = corners < face_sizes[:, None]
+    previous_corner = np.where(corners > 0, corners - 1, face_sizes[:, None] - 1)
+    previous = np.take_along_axis(faces, previous_corner, axis=1)
+    keep = in_face & (faces != previous)
+
+    # Одна вершина, повторённая во всей грани, тоже считается вырожденной гранью
+    new_sizes = keep.sum(axis=1).astype(np.int32)
+    order = np.argsort(~keep, axis=1, kind="stable")
+    new_faces = np.take_along_axis(faces, order, axis=1)
+    last = np.take_along_axis(new_faces, np.maximum(new_sizes - 1, 0)[:, None], axis=1)
+    new_faces = np.where(corners < new_sizes[:, None], new_faces, last)
+    return new_faces.astype(np.int32), new_sizes
@@ -1,10 +1,15 @@
+import time
 import pygame
-import math
-from shapes import get_shapes
+from shapes import get_shape, get_shape_names, get_shape_lod
 from math_utils import *
-from ui import create_buttons, Slider, ShapeSelectionWindow
-from graphics import render_scene, render_ui, render_shape_selection_window
+from ui import create_buttons, Slider, ShapeSelectionWindow, LoadingIndicator
+from graphics import (render_scene, render_ui, render_shape_selection_window, get_scene_rect, pop_ui_dirty_rects,
+                      render_profiler_overlay)
 from obj_loader import *
+from scheduler import FrameScheduler
+from scene import Scene, get_scene_names, make_scene
+from profiler import (enable_profiling, is_profiling_enabled, reset_profiling, profile_stage, begin_frame, end_frame,
+                      export_csv, export_chrome_trace)
 
 # Инициализация Pygame
 pygame.init()
@@ -12,15 +17,23 @@ screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Визуальный движок по Python")
 
 # Получение фигур
-shapes = get_shapes()
-available_shapes = list(shapes.keys())
+# Модели строятся только при первом выборе фигуры, сцены из нескольких моделей выбираются наравне с фигурами
+available_shapes = get_shape_names() + get_scene_names()
+
+# Функция для смены текущей модели (сцена из одного узла)
+# Производные данные (нормали, центры граней) кэшируются внутри модели
+# lod - готовая цепочка уровней детализации (если не задана, строится для фигуры)
+def set_current_model(shape_name, mesh, lod=None):
+    set_current_scene(shape_name, Scene.single(mesh, lod if lod is not None else get_shape_lod(shape_name, mesh)))
+
+# Функция для смены текущей сцены
+def set_current_scene(scene_name, scene):
+    global current_shape, current_scene
+    current_shape = scene_name
+    current_scene = scene
 
 # Текущая фигура
-current_shape = "cube"
-vertices = shapes[current_shape]["vertices"]
-vertices_np = np.array(vertices)
-faces = shapes[current_shape]["faces"]
-face_colors = shapes[current_shape]["colors"]
+set_current_model("cube", get_shape("cube"))
 
 # Углы вращения
 angle_x = 0
@@ -36,6 +49,9 @@ camera_distance = 5.0
 # Back Face Culling
 back_face_culling = True
 
+# Режим отрисовки (алгоритм художника или Z-буфер)
+render_mode = RENDER_MODES[0]
+
 # Создание кнопок
 buttons = create_buttons()
 
@@ -44,10 +60,22 @@ buttons = create_buttons()
 fov_slider = Slider(950, 550, 200, 25, FOV_MIN, FOV_MAX, FOV_DEFAULT, GRAY, LIGHT_BLUE)
 ambient_slider = Slider(950, 605, 200, 25, AMBIENT_INTENSITY_MIN, AMBIENT_INTENSITY_MAX, AMBIENT_DEFAULT, GRAY, LIGHT_BLUE)
 
+# Фоновая загрузка .obj файла
+obj_load_job = None
+loading_indicator = LoadingIndicator(50, 550, 300, 35)
+
 # Флаг для отображения окна выбора
 show_selection_window = False
 selection_window_instance = None
 
+# Состояние сцены и занятая ею область экрана в прошлом кадре (для частичного обновления экрана)
+previous_scene_state = None
+previous_scene_rect = pygame.Rect(0, 0, 0, 0)
+full_update = True
+
+# Область оверлея профилировщика в прошлом кадре
+previous_profiler_rect = pygame.Rect(0, 0, 0, 0)
+
 # Функции обработки действий
 def global_set_rotation(mode):
     global rotation_mode
@@ -60,10 +88,25 @@ def open_shape_selection_window():
     # Устанавливаем флаг для отображения окна
     show_selection_window = True
 
+def start_obj_loading():
+    global obj_load_job
+    file_path = choose_obj_file()
+    if not file_path:
+        print("Ошибка: загрузка отменена или не удалась")
+        return
+    # Новая загрузка отменяет предыдущую, если она ещё не завершилась
+    if obj_load_job is not None:
+        obj_load_job.cancel()
+    obj_load_job = ObjLoadJob(file_path)
+
 def toggle_back_face_culling():
     global back_face_culling
     back_face_culling = not back_face_culling
 
+def switch_render_mode():
+    global render_mode
+    render_mode = RENDER_MODES[(RENDER_MODES.index(render_mode) + 1) % len(RENDER_MODES)]
+
 def global_zoom_in():
     global camera_distance
     camera_distance = zoom_in(camera_distance, MIN_DISTANCE, ZOOM_SPEED)
@@ -72,6 +115,24 @@ def global_zoom_out():
     global camera_distance
     camera_distance = zoom_out(camera_distance, MAX_DISTANCE, ZOOM_SPEED)
 
+# Включение и выключение профилировщика (F3): статистика собирается заново, экран перерисовывается целиком
+def toggle_profiling():
+    global full_update, previous_profiler_rect
+    enable_profiling(not is_profiling_enabled())
+    reset_profiling()
+    previous_profiler_rect = pygame.Rect(0, 0, 0, 0)
+    full_update = True
+
+# Сохранение собранной статистики кадров (F4) в CSV и в формате Chrome Trace
+def export_profile():
+    if not is_profiling_enabled():
+        print("Ошибка: профилировщик выключен (F3 - включить)")
+        return
+    file_name = time.strftime("profile_%Y%m%d_%H%M%S")
+    export_csv(file_name + ".csv")
+    export_chrome_trace(file_name + ".json")
+    print(f"Профиль сохранён: {file_name}.csv, {file_name}.json")
+
 def exit_code():
     global running
     running = False
@@ -87,17 +148,30 @@ button_actions = {
     6: toggle_back_face_culling,
     7: lambda: global_zoom_in(),
     8: lambda: global_zoom_out(),
-    9: exit_code
+    9: exit_code,
+    10: switch_render_mode
 }
 
+# Планировщик кадров: в простое цикл ждёт событий, а неизменившиеся кадры не перерисовываются
+scheduler = FrameScheduler()
+clock = scheduler.clock
+
 # Основной цикл
-clock = pygame.time.Clock()
 running = True
 while running:
-    for event in pygame.event.get():
+    # Окно выбора перекрывает весь экран, пока оно открыто (и в кадре после закрытия) экран обновляется целиком
+    selection_window_was_shown = show_selection_window
+
+    # Модель анимируется, только если включено вращение или перетаскивается ползунок
+    animating = (rotation_mode != "stop" and not show_selection_window) or fov_slider.dragging or ambient_slider.dragging
+    for event in scheduler.get_events(animating, obj_load_job is not None):
         if event.type == pygame.QUIT:
             running = False
 
+        # Окно было перекрыто или восстановлено - содержимое экрана нужно вывести заново
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            full_update = True
+
         # Обработка событий для окна выбора, если оно открыто
         if show_selection_window and selection_window_instance:
             result = render_shape_selection_window(screen, event, selection_window_instance)
@@ -105,30 +179,25 @@ while running:
                 show_selection_window = False
                 if result == "load_obj":
 
-                    load_obj_file()
-                    loaded_model = get_loaded_model()
-                    if loaded_model:
-                        vertices = loaded_model["vertices"]
-                        vertices_np = np.array(vertices)
-                        faces = loaded_model["faces"]
-                        face_colors = loaded_model["colors"]
-                        current_shape = "loaded_model"
-                    else:
-                        print("Ошибка: загрузка отменена или не удалась")
+                    # Файл разбирается в фоновом потоке, текущая фигура продолжает отрисовываться
+                    start_obj_loading()
                     selection_window_instance = None
 
+                elif result in get_scene_names():
+
+                    set_current_scene(result, make_scene(result))
+
                 elif result:
 
-                    current_shape = result
-                    vertices = shapes[current_shape]["vertices"]
-                    vertices_np = np.array(vertices)
-                    faces = shapes[current_shape]["faces"]
-                    face_colors = shapes[current_shape]["colors"]
+                    set_current_model(result, get_shape(result))
 
                     if current_shape != "loaded_model":
                         reset_loaded_model()
         else:
             if event.type == pygame.MOUSEBUTTONDOWN:
+                if obj_load_job is not None and loading_indicator.check_cancel(event.pos):
+                    obj_load_job.cancel()
+
                 for i, button in enumerate(buttons):
                     if button.check_click(event.pos):
                         for btn in buttons:
@@ -148,8 +217,20 @@ while running:
             elif event.type == pygame.MOUSEMOTION:
                 fov_slider.handle_event(event)
                 ambient_slider.handle_event(event)
-
-    screen.fill(BLACK)
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F3:
+                    toggle_profiling()
+                elif event.key == pygame.K_F4:
+                    export_profile()
+
+    # Подмена модели после завершения фоновой загрузки (все массивы меняются разом)
+    if obj_load_job is not None and obj_load_job.is_done():
+        # Отменённая загрузка не подменяет модель, даже если отмена пришла после разбора файла
+        if obj_load_job.result is not None and not obj_load_job.is_cancelled():
+            set_current_model("loaded_model", obj_load_job.result, obj_load_job.lod)
+        elif not obj_load_job.is_cancelled():
+            print("Ошибка: загрузка не удалась")
+        obj_load_job = None
 
     # Обновление углов вращения
     if not show_selection_window:
@@ -163,45 +244,74 @@ while running:
             angle_x += 0.01
             angle_y += 0.008
 
-        # Значения для матрицы поворота
-        cos_x, sin_x = math.cos(angle_x), math.sin(angle_x)
-        cos_y, sin_y = math.cos(angle_y), math.sin(angle_y)
-        cos_z, sin_z = math.cos(angle_z), math.sin(angle_z)
+    # Модели сцены с уровнями детализации по их размеру на экране, объединённые в одну модель
+    frame_mesh = current_scene.batch(camera_distance, fov_slider.get_value())
+
+    # Состояние кадра: всё, от чего зависят сцена и интерфейс; если оно не изменилось, кадр не рисуется
+    scene_state = (current_shape, id(frame_mesh), angle_x, angle_y, angle_z, camera_distance,
+                   fov_slider.get_value(), ambient_slider.get_value(), back_face_culling, render_mode)
+    load_progress = obj_load_job.progress if obj_load_job else None
+    frame_state = (scene_state, rotation_mode, tuple(button.is_active for button in buttons),
+                   loading_indicator.get_state(load_progress), int(clock.get_fps()))
+    if full_update or show_selection_window or selection_window_was_shown:
+        scheduler.invalidate()
+    if not scheduler.needs_redraw(frame_state):
+        scheduler.tick(animating)
+        continue
+
+    begin_frame()
+    screen.fill(BLACK)
 
+    if not show_selection_window:
         # Матрица поворота
-        Ry = np.array([[cos_y, 0, sin_y],
-                       [0, 1, 0],
-                       [-sin_y, 0, cos_y]])
-        Rx = np.array([[1, 0, 0],
-                       [0, cos_x, -sin_x],
-                       [0, sin_x, cos_x]])
-        Rz = np.array([[cos_z, -sin_z, 0],
-                       [sin_z, cos_z, 0],
-                       [0, 0, 1]])
-        R = Rz @ Rx @ Ry
-
-        # Список для повернутых вершин
-        rotated_vertices = vertices_np @ R.T
+        R = rotation_matrix(angle_x, angle_y, angle_z)
 
         # Рендеринг сцены
-        visible_face_count = render_scene(screen, current_shape, rotated_vertices, faces, face_colors,
-                    camera_distance, fov_slider.get_value(), ambient_slider.get_value(), LIGHT_DIRECTION, back_face_culling)
+        visible_face_count = render_scene(screen, frame_mesh, R,
+                    camera_distance, fov_slider.get_value(), ambient_slider.get_value(), LIGHT_DIRECTION, back_face_culling,
+                    render_mode)
+
+    # Область сцены помечается изменившейся, только если изменилось что-то, от чего зависит картинка
+    dirty_rects = []
+    scene_rect = get_scene_rect()
+    if scene_state != previous_scene_state or scene_rect != previous_scene_rect:
+        dirty_rects += [previous_scene_rect, scene_rect]
+    previous_scene_state = scene_state
+    previous_scene_rect = scene_rect
 
     # Рендеринг UI
-    if not show_selection_window:
-        render_ui(screen, current_shape, camera_distance, rotation_mode, back_face_culling, visible_face_count,
-                  fov_slider.get_value(), ambient_slider.get_value(), buttons, fov_slider, ambient_slider, clock, faces)
-
-    # Эта часть отвечает только за отрисовку, если окно открыто
-    if show_selection_window and selection_window_instance:
-        # Перерисовываем основной UI перед отрисовкой окна выбора
-        render_ui(screen, current_shape, camera_distance, rotation_mode, back_face_culling, visible_face_count,
-                  fov_slider.get_value(), ambient_slider.get_value(), buttons, fov_slider, ambient_slider, clock, faces)
+    with profile_stage("ui"):
+        if not show_selection_window:
+            render_ui(screen, current_shape, camera_distance, rotation_mode, back_face_culling, visible_face_count,
+                      fov_slider.get_value(), ambient_slider.get_value(), buttons, fov_slider, ambient_slider, clock, frame_mesh.faces,
+                      render_mode, loading_indicator, load_progress)
 
-        selection_window_instance.draw(screen)
-
-    # Обновление экрана
-    pygame.display.flip()
-    clock.tick(240)
+        # Эта часть отвечает только за отрисовку, если окно открыто
+        if show_selection_window and selection_window_instance:
+            # Перерисовываем основной UI перед отрисовкой окна выбора
+            render_ui(screen, current_shape, camera_distance, rotation_mode, back_face_culling, visible_face_count,
+                      fov_slider.get_value(), ambient_slider.get_value(), buttons, fov_slider, ambient_slider, clock, frame_mesh.faces,
+                      render_mode, loading_indicator, load_progress)
+
+            selection_window_instance.draw(screen)
+
+    # Оверлей профилировщика (статистика прошлых кадров) обновляется в каждом нарисованном кадре
+    if is_profiling_enabled() and not show_selection_window:
+        profiler_rect = render_profiler_overlay(screen)
+        dirty_rects += [previous_profiler_rect, profiler_rect]
+        previous_profiler_rect = profiler_rect
+
+    # Обновление экрана: целиком только при необходимости, иначе лишь изменившиеся прямоугольники
+    dirty_rects += pop_ui_dirty_rects()
+    with profile_stage("present"):
+        if full_update or show_selection_window or selection_window_was_shown:
+            pygame.display.flip()
+            full_update = False
+        else:
+            dirty_rects = [rect for rect in dirty_rects if rect.width > 0 and rect.height > 0]
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
+    end_frame()
+    scheduler.tick(animating)
 
 pygame.quit()
\ No newline at end of file
@@ -1,4 +1,5 @@
 import numpy as np
+from parameters import WIDTH, HEIGHT
 
 # Алгоритм Брезенхэма для рисования линий
 def bresenham_algorithm(x0, y0, x1, y1):
@@ -28,6 +29,32 @@ def bresenham_algorithm(x0, y0, x1, y1):
             error += 2 * dx
     return points
 
+# Векторизованный алгоритм Брезенхэма для множества отрезков сразу
+# Даёт те же точки, что и bresenham_algorithm для каждого отрезка: шаг по второй оси
+# после k шагов по основной равен floor((2 * d_minor * k + d_major) / (2 * d_major))
+# Возвращает координаты всех точек и номер отрезка для каждой точки
+def bresenham_lines(x0, y0, x1, y1):
+    x0, y0, x1, y1 = (np.asarray(a, dtype=np.int64) for a in (x0, y0, x1, y1))
+    dx = np.abs(x1 - x0)
+    dy = np.abs(y1 - y0)
+    sx = np.where(x0 < x1, 1, -1)
+    sy = np.where(y0 < y1, 1, -1)
+
+    x_major = dx > dy
+    major = np.where(x_major, dx, dy)
+    minor = np.where(x_major, dy, dx)
+
+    lengths = major + 1
+    line_ids = np.repeat(np.arange(len(x0)), lengths)
+    steps = np.arange(len(line_ids)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    major = major[line_ids]
+    minor_steps = (2 * minor[line_ids] * steps + major) // np.maximum(2 * major, 1)
+    x_major = x_major[line_ids]
+    xs = x0[line_ids] + sx[line_ids] * np.where(x_major, steps, minor_steps)
+    ys = y0[line_ids] + sy[line_ids] * np.where(x_major, minor_steps, steps)
+    return xs, ys, line_ids
+
 # Функция для вычисления нормали к грани
 def calculate_face_normal(face_vertices):
     v1 = np.array(face_vertices[1]) - np.array(face_vertices[0])
@@ -62,6 +89,258 @@ def is_face_visible(face_normal, face_center, camera_position):
 
     return np.dot(face_normal, to_camera) > 0.0
 
+# Функция для построения матрицы поворота R = Rz @ Rx @ Ry
+def rotation_matrix(angle_x, angle_y, angle_z):
+    cos_x, sin_x = np.cos(angle_x), np.sin(angle_x)
+    cos_y, sin_y = np.cos(angle_y), np.sin(angle_y)
+    cos_z, sin_z = np.cos(angle_z), np.sin(angle_z)
+
+    Ry = np.array([[cos_y, 0, sin_y],
+                   [0, 1, 0],
+                   [-sin_y, 0, cos_y]])
+    Rx = np.array([[1, 0, 0],
+                   [0, cos_x, -sin_x],
+                   [0, sin_x, cos_x]])
+    Rz = np.array([[cos_z, -sin_z, 0],
+                   [sin_z, cos_z, 0],
+                   [0, 0, 1]])
+    return Rz @ Rx @ Ry
+
+# Функция для перспективной проекции всех вершин за одну операцию
+# width, height - размер экрана, центр которого совпадает с осью камеры
+# Вершины на плоскости камеры и за ней не проецируются (их координаты - NaN)
+def project_vertices(vertices, camera_distance, fov, width=WIDTH, height=HEIGHT):
+    vertices = np.asarray(vertices, dtype=np.float64)
+    depths = camera_distance + vertices[:, 2]
+    factor = np.divide(fov, depths, out=np.full(len(vertices), np.nan), where=depths > 0)
+    projected = np.empty((len(vertices), 2), dtype=np.float64)
+    projected[:, 0] = vertices[:, 0] * factor + width // 2
+    projected[:, 1] = vertices[:, 1] * factor + height // 2
+    return projected
+
+# Функция для упаковки граней в прямоугольный массив индексов
+# Короткие грани дополняются своей последней вершиной, реальная длина хранится в face_sizes
+def pad_faces(faces):
+    face_sizes = np.fromiter((len(face) for face in faces), dtype=np.int32, count=len(faces))
+    max_size = int(face_sizes.max()) if len(faces) else 3
+    if len(faces) and face_sizes.min() == max_size:
+        return np.asarray(faces, dtype=np.int32).reshape(len(faces), max_size), face_sizes
+    face_indices = np.empty((len(faces), max_size), dtype=np.int32)
+    for i, face in enumerate(faces):
+        face_indices[i, :len(face)] = face
+        face_indices[i, len(face):] = face[-1]
+    return face_indices, face_sizes
+
+# Функция для вычисления средней Z-координаты всех граней
+def calculate_face_depths(vertices, face_indices, face_sizes):
+    z = np.asarray(vertices)[:, 2][face_indices]
+    mask = np.arange(face_indices.shape[1]) < face_sizes[:, None]
+    return np.where(mask, z, 0.0).sum(axis=1) / face_sizes
+
+# Функция для порядка отрисовки граней (алгоритм художника): от дальних граней к ближним
+# (глубина - расстояние вдоль оси камеры, больше - дальше), порядок равных граней сохраняется
+def painter_order(face_depths):
+    return np.argsort(-face_depths, kind="stable")
+
+# Функция для порядка отрисовки граней с учётом порядка предыдущего кадра previous_order (перестановка граней)
+# Глубины квантуются до 16 бит и сортируются устойчивой поразрядной сортировкой (линейное время) в порядке
+# предыдущего кадра: грани, глубины которых различаются меньше шага квантования, сохраняют прежний взаимный порядок
+def coherent_painter_order(face_depths, previous_order):
+    depths = face_depths[previous_order]
+    if not len(depths):
+        return previous_order
+    low = depths.min()
+    span = depths.max() - low
+    if not span > 0:
+        return previous_order
+    # Ключ - удалённость от самой дальней грани, поэтому возрастание ключей - порядок от дальних граней к ближним
+    keys = ((low + span - depths) * (np.iinfo(np.uint16).max / span)).astype(np.uint16)
+    return previous_order[np.argsort(keys, kind="stable")]
+
+# Функция для вычисления нормалей сразу всех граней (по первым трём вершинам, как calculate_face_normal)
+def calculate_face_normals(vertices, face_indices):
+    vertices = np.asarray(vertices, dtype=np.float64)
+    v0 = vertices[face_indices[:, 0]]
+    normals = np.cross(vertices[face_indices[:, 1]] - v0, vertices[face_indices[:, 2]] - v0)
+    norms = np.linalg.norm(normals, axis=1)
+
+    degenerate = norms == 0
+    normals[degenerate] = (0.0, 0.0, 1.0)
+    norms[degenerate] = 1.0
+    return normals / norms[:, None]
+
+# Функция для вычисления нормалей вершин (для плавного затенения)
+# Нормаль вершины - сумма векторов площади прилегающих граней, поэтому вклад грани пропорционален её площади
+def calculate_vertex_normals(vertices, face_indices, face_sizes):
+    vertices = np.asarray(vertices, dtype=np.float64)
+    v0 = vertices[face_indices[:, 0]]
+
+    # Вектор площади грани - сумма векторных произведений треугольников веера из первой вершины
+    # (треугольники на дополняющих позициях вырождены и ничего не добавляют)
+    face_vectors = np.zeros((len(face_indices), 3))
+    for k in range(1, face_indices.shape[1] - 1):
+        face_vectors += np.cross(vertices[face_indices[:, k]] - v0, vertices[face_indices[:, k + 1]] - v0)
+
+    corners = np.arange(face_indices.shape[1]) < face_sizes[:, None]
+    corner_vertices = face_indices[corners]
+    corner_vectors = np.repeat(face_vectors, face_sizes, axis=0)
+    normals = np.stack([np.bincount(corner_vertices, corner_vectors[:, axis], minlength=len(vertices))
+                        for axis in range(3)], axis=1)
+    norms = np.linalg.norm(normals, axis=1)
+
+    degenerate = norms == 0
+    normals[degenerate] = (0.0, 0.0, 1.0)
+    norms[degenerate] = 1.0
+    return normals / norms[:, None]
+
+# Функция для вычисления центров всех граней
+def calculate_face_centers(vertices, face_indices, face_sizes):
+    face_vertices = np.asarray(vertices, dtype=np.float64)[face_indices]
+    mask = np.arange(face_indices.shape[1]) < face_sizes[:, None]
+    return np.where(mask[:, :, None], face_vertices, 0.0).sum(axis=1) / face_sizes[:, None]
+
+# Функция для проверки видимости всех граней (Back Face Culling)
+def are_faces_visible(face_normals, face_centers, camera_position):
+    to_camera = camera_position - face_centers
+    return np.einsum("ij,ij->i", face_normals, to_camera) > 0.0
+
+# Функция для расчёта освещённости по Ламберту сразу для всех нормалей (граней или вершин)
+# light_dir - направление на источник света (3,) или направления нескольких источников (L, 3), их вклады складываются
+def lambert_intensities(normals, light_dir, ambient):
+    normals = normals / np.linalg.norm(normals, axis=1)[:, None]
+    light_dir = np.atleast_2d(light_dir)
+    light_dir = light_dir / np.linalg.norm(light_dir, axis=1)[:, None]
+
+    diffuse = np.maximum(0.0, normals @ light_dir.T).sum(axis=1)
+    return np.minimum(1.0, ambient + diffuse)
+
+# Функция для отсечения граней ближней плоскостью камеры (алгоритм Сазерленда - Ходжмена для одной плоскости)
+# depths - (V,) расстояния вершин до камеры вдоль оси взгляда, остаётся часть граней с depths >= near
+# Возвращает новые вершины (N, D) в точках пересечения сторон с плоскостью (их номера начинаются с len(vertices);
+# все D столбцов вершин интерполируются линейно),
+# отсечённые грани (F, M), их длины и маску сторон (F, M), идущих по самой плоскости отсечения
+def clip_faces_near(vertices, depths, faces, face_sizes, near):
+    face_count, corner_count = faces.shape
+    corners = np.arange(corner_count)
+    valid = corners < face_sizes[:, None]
+    start = faces
+    end = np.take_along_axis(faces, np.where(corners + 1 < face_sizes[:, None], corners + 1, 0), axis=1)
+    start_in = depths[start] >= near
+    crossing = valid & (start_in != (depths[end] >= near))
+
+    # Точки пересечения сторон с плоскостью
+    crossing_start, crossing_end = start[crossing], end[crossing]
+    t = (near - depths[crossing_start]) / (depths[crossing_end] - depths[crossing_start])
+    new_vertices = vertices[crossing_start] + t[:, None] * (vertices[crossing_end] - vertices[crossing_start])
+    new_ids = np.full(faces.shape, -1, dtype=np.int64)
+    new_ids[crossing] = len(vertices) + np.arange(len(new_vertices))
+
+    # Для каждой стороны: её начальная вершина, если она перед плоскостью, затем точка пересечения, если есть
+    slots = np.stack([np.where(valid & start_in, start, -1), new_ids], axis=2).reshape(face_count, 2 * corner_count)
+    keep = slots >= 0
+    clipped_sizes = keep.sum(axis=1).astype(np.int32)
+    order = np.argsort(~keep, axis=1, kind="stable")[:, :max(int(clipped_sizes.max(initial=0)), 1)]
+    clipped = np.take_along_axis(slots, order, axis=1)
+    clipped_corners = np.arange(clipped.shape[1])
+    last = np.take_along_axis(clipped, np.maximum(clipped_sizes - 1, 0)[:, None], axis=1)
+    clipped = np.where(clipped_corners < clipped_sizes[:, None], clipped, last)
+
+    # Сторона между двумя точками пересечения проходит по плоскости отсечения
+    is_new = clipped >= len(vertices)
+    next_corner = np.where(clipped_corners + 1 < clipped_sizes[:, None], clipped_corners + 1, 0)
+    near_sides = is_new & np.take_along_axis(is_new, next_corner, axis=1) & (clipped_corners < clipped_sizes[:, None])
+    return new_vertices, clipped.astype(np.int32), clipped_sizes, near_sides
+
+# Функция для разбиения граней на треугольники веером из первой вершины
+# Возвращает индексы вершин треугольников (T, 3) и номер исходной грани для каждого треугольника
+def triangulate_faces(face_indices, face_sizes):
+    triangles = []
+    triangle_faces = []
+    face_numbers = np.arange(len(face_indices))
+    for k in range(1, face_indices.shape[1] - 1):
+        has_triangle = face_sizes > k + 1
+        triangles.append(np.stack([face_indices[has_triangle, 0],
+                                   face_indices[has_triangle, k],
+                                   face_indices[has_triangle, k + 1]], axis=1))
+        triangle_faces.append(face_numbers[has_triangle])
+    if not triangles:
+        return np.empty((0, 3), dtype=np.int32), np.empty(0, dtype=np.int64)
+    return np.concatenate(triangles), np.concatenate(triangle_faces)
+
+# Функция для триангуляции граней модели (выполняется один раз для модели, см. Mesh.triangles)
+# Выпуклые грани делятся веером из первой вершины, невыпуклые - отсечением ушей,
+# треугольники нулевой площади (в том числе все треугольники вырожденных граней) отбрасываются
+# Возвращает индексы вершин треугольников (T, 3) int32 и номер грани для каждого треугольника (T,) int32
+def triangulate_polygons(vertices, face_indices, face_sizes):
+    vertices = np.asarray(vertices, dtype=np.float64)
+    corners = np.arange(face_indices.shape[1])
+    valid = corners < face_sizes[:, None]
+    next_corner = np.where(corners + 1 < face_sizes[:, None], corners + 1, 0)
+    previous_corner = np.where(corners > 0, corners - 1, face_sizes[:, None] - 1)
+    points = vertices[face_indices]
+    next_points = np.take_along_axis(points, next_corner[:, :, None], axis=1)
+    previous_points = np.take_along_axis(points, previous_corner[:, :, None], axis=1)
+
+    # Нормаль грани по формуле Ньюэлла (верна и для невыпуклых граней) и повороты в вершинах относительно неё:
+    # в выпуклой грани все повороты в одну сторону
+    normals = np.where(valid[:, :, None], np.cross(points, next_points), 0.0).sum(axis=1)
+    turns = np.einsum("fkj,fj->fk", np.cross(points - previous_points, next_points - points), normals)
+    edge_lengths = np.where(valid, ((next_points - points) ** 2).sum(axis=2), 0.0).max(axis=1)
+    tolerance = 1e-9 * np.linalg.norm(normals, axis=1) * edge_lengths
+    concave = ((turns < -tolerance[:, None]) & valid).any(axis=1)
+
+    convex_faces = np.flatnonzero(~concave)
+    triangles, triangle_faces = triangulate_faces(face_indices[convex_faces], face_sizes[convex_faces])
+    triangles, triangle_faces = [triangles], [convex_faces[triangle_faces]]
+    for face in np.flatnonzero(concave):
+        # Грань проецируется на координатную плоскость, наиболее близкую к её плоскости
+        axis = int(np.argmax(np.abs(normals[face])))
+        plane_points = np.delete(points[face, :face_sizes[face]], axis, axis=1)
+        if normals[face, axis] < 0:
+            plane_points = plane_points[:, ::-1]
+        ears = ear_clipping(plane_points)
+        triangles.append(face_indices[face, :face_sizes[face]][np.array(ears, dtype=np.int64).reshape(-1, 3)])
+        triangle_faces.append(np.full(len(ears), face))
+    triangles = np.concatenate(triangles).astype(np.int32)
+    triangle_faces = np.concatenate(triangle_faces).astype(np.int32)
+
+    # Вырожденные треугольники: площадь ничтожно мала по сравнению с квадратом самой длинной стороны
+    v0, v1, v2 = vertices[triangles[:, 0]], vertices[triangles[:, 1]], vertices[triangles[:, 2]]
+    areas = np.linalg.norm(np.cross(v1 - v0, v2 - v0), axis=1)
+    longest = np.maximum(np.maximum(((v1 - v0) ** 2).sum(axis=1), ((v2 - v1) ** 2).sum(axis=1)), ((v0 - v2) ** 2).sum(axis=1))
+    kept = areas > 1e-12 * longest
+    return triangles[kept], triangle_faces[kept]
+
+# Функция для триангуляции простого многоугольника отсечением ушей (O(n^2), для одной грани)
+# points - (n, 2) вершины, обход против часовой стрелки; возвращает тройки номеров вершин в порядке обхода
+# Если ухо не находится (самопересекающийся многоугольник), остаток делится веером
+def ear_clipping(points):
+    points = [tuple(point) for point in points.tolist()]
+    remaining = list(range(len(points)))
+    triangles = []
+    while len(remaining) > 3:
+        count = len(remaining)
+        for i in range(count):
+            a, b, c = remaining[i - 1], remaining[i], remaining[(i + 1) % count]
+            # Ухо - выпуклая вершина, в треугольнике которой нет других вершин
+            if _cross_2d(points[a], points[b], points[c]) <= 0:
+                continue
+            if any(_in_triangle(points[p], points[a], points[b], points[c]) for p in remaining if p not in (a, b, c)):
+                continue
+            triangles.append((a, b, c))
+            del remaining[i]
+            break
+        else:
+            break
+    triangles += [(remaining[0], remaining[k], remaining[k + 1]) for k in range(1, len(remaining) - 1)]
+    return triangles
+
+def _cross_2d(a, b, c):
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+def _in_triangle(p, a, b, c):
+    return _cross_2d(a, b, p) >= 0 and _cross_2d(b, c, p) >= 0 and _cross_2d(c, a, p) >= 0
+
 # Функция для приближения камеры
 def zoom_in(camera_distance, min_distance, zoom_speed):
     return max(min_distance, camera_distance - zoom_speed)
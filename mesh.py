@@ -0,0 +1,218 @@
+import numpy as np
+from math_utils import (pad_faces, calculate_face_normals, calculate_vertex_normals, calculate_face_centers,
+                        triangulate_polygons)
+from bvh import FaceBvh
+from bsp import FaceBsp
+from lighting import shade_palette
+from parameters import BSP_MAX_FACES
+
+# Класс полигональной модели в виде набора компактных массивов
+# vertices - (V, 3) float32, faces - (F, K) int32 (короткие грани дополнены своей последней вершиной),
+# face_sizes - (F,) int32 реальные длины граней, colors - (F, 3) uint8
+# double_sided - грани видны с обеих сторон (открытые поверхности вроде ленты Мёбиуса), их нельзя отсекать по нормали;
+# общий признак всех граней (bool) или маска (F,) bool для моделей, собранных из разных частей
+# hidden_sides - (F, K) bool стороны граней без контура (например, линии разреза граней деревом BSP), None - нет таких
+class Mesh:
+    __slots__ = ("vertices", "faces", "face_sizes", "colors", "double_sided", "hidden_sides", "_bsp",
+                 "_face_normals", "_vertex_normals", "_face_centers", "_edges", "_face_edges", "_face_edges_reversed", "_bounds", "_bvh",
+                 "_triangles", "_triangle_faces", "_fillable_faces", "_palette", "_color_indices", "_shaded_palette")
+
+    def __init__(self, vertices, faces, face_sizes, colors, double_sided=False, hidden_sides=None):
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, 3)
+        self.faces = np.ascontiguousarray(faces, dtype=np.int32)
+        self.face_sizes = np.ascontiguousarray(face_sizes, dtype=np.int32)
+        self.colors = np.ascontiguousarray(colors, dtype=np.uint8).reshape(-1, 3)
+        self.double_sided = double_sided if np.ndim(double_sided) == 0 else np.ascontiguousarray(double_sided, dtype=bool)
+        self.hidden_sides = hidden_sides
+        self.invalidate()
+
+    # Создание модели из списков вершин, граней произвольной длины и цветов
+    @classmethod
+    def from_lists(cls, vertices, faces, colors, double_sided=False):
+        face_indices, face_sizes = pad_faces(faces)
+        return cls(vertices, face_indices, face_sizes, colors, double_sided)
+
+    # Сброс кэшированных производных данных (вызывается при любом изменении геометрии)
+    def invalidate(self):
+        self._face_normals = None
+        self._vertex_normals = None
+        self._face_centers = None
+        self._edges = None
+        self._face_edges = None
+        self._face_edges_reversed = None
+        self._bounds = None
+        self._bvh = None
+        self._bsp = None
+        self._triangles = None
+        self._triangle_faces = None
+        self._fillable_faces = None
+        self._palette = None
+        self._color_indices = None
+        self._shaded_palette = None
+
+    # Замена вершин при тех же гранях (например, после аффинного преобразования модели):
+    # рёбра и триангуляция граней от такой замены не меняются и остаются в кэше
+    def set_vertices(self, vertices):
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, 3)
+        self._face_normals = None
+        self._vertex_normals = None
+        self._face_centers = None
+        self._bounds = None
+        self._bvh = None
+        self._bsp = None
+
+    # Признак двусторонности граней indices (None - всех граней): общий признак модели возвращается как есть
+    def face_double_sided(self, indices=None):
+        if np.ndim(self.double_sided) == 0 or indices is None:
+            return self.double_sided
+        return self.double_sided[indices]
+
+    @property
+    def face_count(self):
+        return len(self.faces)
+
+    @property
+    def vertex_count(self):
+        return len(self.vertices)
+
+    # Нормали граней в системе координат объекта
+    @property
+    def face_normals(self):
+        if self._face_normals is None:
+            self._face_normals = calculate_face_normals(self.vertices, self.faces).astype(np.float32)
+        return self._face_normals
+
+    # Нормали вершин (взвешенные по площади граней) в системе координат объекта
+    @property
+    def vertex_normals(self):
+        if self._vertex_normals is None:
+            self._vertex_normals = calculate_vertex_normals(self.vertices, self.faces, self.face_sizes).astype(np.float32)
+        return self._vertex_normals
+
+    # Центры граней в системе координат объекта
+    @property
+    def face_centers(self):
+        if self._face_centers is None:
+            self._face_centers = calculate_face_centers(self.vertices, self.faces, self.face_sizes).astype(np.float32)
+        return self._face_centers
+
+    # Уникальные рёбра модели (E, 2), каждое ребро хранится один раз с меньшим индексом первым
+    @property
+    def edges(self):
+        if self._edges is None:
+            self._build_edges()
+        return self._edges
+
+    # Номер уникального ребра для каждой стороны грани (F, K), -1 для дополняющих позиций
+    # Сторона k идёт от вершины k к вершине k + 1 (последняя - к первой)
+    @property
+    def face_edges(self):
+        if self._face_edges is None:
+            self._build_edges()
+        return self._face_edges
+
+    # True, если сторона грани проходит ребро от большего индекса к меньшему
+    @property
+    def face_edges_reversed(self):
+        if self._face_edges_reversed is None:
+            self._build_edges()
+        return self._face_edges_reversed
+
+    def _build_edges(self):
+        corners = np.arange(self.faces.shape[1])
+        valid = corners < self.face_sizes[:, None]
+        if self.hidden_sides is not None:
+            valid &= ~self.hidden_sides
+        next_corner = np.where(corners + 1 < self.face_sizes[:, None], corners + 1, 0)
+        start = self.faces
+        end = np.take_along_axis(self.faces, next_corner, axis=1)
+
+        # Ребро кодируется одним числом low * V + high, чтобы найти уникальные рёбра одной сортировкой
+        vertex_count = max(self.vertex_count, 1)
+        low = np.minimum(start, end)[valid].astype(np.int64)
+        high = np.maximum(start, end)[valid].astype(np.int64)
+        keys, inverse = np.unique(low * vertex_count + high, return_inverse=True)
+
+        self._edges = np.stack([keys // vertex_count, keys % vertex_count], axis=1).astype(np.int32)
+        self._face_edges = np.full(self.faces.shape, -1, dtype=np.int32)
+        self._face_edges[valid] = inverse.reshape(-1)
+        self._face_edges_reversed = start > end
+
+    # Треугольники граней (T, 3): выпуклые грани делятся веером, невыпуклые - отсечением ушей,
+    # вырожденные треугольники отброшены; строятся один раз для модели
+    @property
+    def triangles(self):
+        if self._triangles is None:
+            self._triangles, self._triangle_faces = triangulate_polygons(self.vertices, self.faces, self.face_sizes)
+        return self._triangles
+
+    # Номер грани для каждого треугольника (T,)
+    @property
+    def triangle_faces(self):
+        if self._triangle_faces is None:
+            self._triangles, self._triangle_faces = triangulate_polygons(self.vertices, self.faces, self.face_sizes)
+        return self._triangle_faces
+
+    # Грани ненулевой площади (F,) bool - у них остался хотя бы один треугольник; вырожденные грани
+    # не заливаются, а только обводятся контуром. Аффинное преобразование вершин площадь не обнуляет
+    @property
+    def fillable_faces(self):
+        if self._fillable_faces is None:
+            self._fillable_faces = np.bincount(self.triangle_faces, minlength=self.face_count) > 0
+        return self._fillable_faces
+
+    # Различные цвета граней (P, 3)
+    @property
+    def palette(self):
+        if self._palette is None:
+            self._build_palette()
+        return self._palette
+
+    # Номер цвета каждой грани в палитре (F,)
+    @property
+    def color_indices(self):
+        if self._color_indices is None:
+            self._build_palette()
+        return self._color_indices
+
+    # Цвета палитры при всех уровнях освещённости (P, LIGHTING_LEVELS, 3), см. lighting.py
+    @property
+    def shaded_palette(self):
+        if self._shaded_palette is None:
+            self._shaded_palette = shade_palette(self.palette)
+        return self._shaded_palette
+
+    def _build_palette(self):
+        palette, color_indices = np.unique(self.colors, axis=0, return_inverse=True)
+        self._palette = palette
+        self._color_indices = color_indices.reshape(-1).astype(np.int32)
+
+    # Ограничивающий прямоугольный параллелепипед: (минимальный угол, максимальный угол)
+    @property
+    def bounds(self):
+        if self._bounds is None:
+            if len(self.vertices):
+                self._bounds = (self.vertices.min(axis=0), self.vertices.max(axis=0))
+            else:
+                self._bounds = (np.zeros(3, dtype=np.float32), np.zeros(3, dtype=np.float32))
+        return self._bounds
+
+    # Иерархия ограничивающих сфер над гранями (для отсечения по пирамиде видимости)
+    @property
+    def bvh(self):
+        if self._bvh is None:
+            self._bvh = FaceBvh.from_mesh(self)
+        return self._bvh
+
+    # Дерево BSP для порядка отрисовки алгоритмом художника; строится один раз для модели
+    # None - модель больше BSP_MAX_FACES граней (для неё грани сортируются по глубине в каждом кадре)
+    @property
+    def bsp(self):
+        if self._bsp is None and self.face_count <= BSP_MAX_FACES:
+            self._bsp = FaceBsp.from_mesh(self)
+        return self._bsp
+
+    # Объём памяти, занимаемый основными массивами модели
+    @property
+    def nbytes(self):
+        return self.vertices.nbytes + self.faces.nbytes + self.face_sizes.nbytes + self.colors.nbytes
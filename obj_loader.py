@@ -1,17 +1,84 @@
+import os
+import threading
 import tkinter as tk
 
+import numpy as np
 from tkinter import filedialog
+from mesh import Mesh
+from lod import LodChain
 from parameters import *
 
+# Суффикс файла-кэша, который сохраняется рядом с .obj файлом
+OBJ_CACHE_SUFFIX = ".cache.npz"
+
+# Доля полосы прогресса загрузки, отведённая разбору файла (остальное - уровни детализации и данные для отрисовки)
+OBJ_PARSE_PROGRESS = 0.7
+
+# Размер блока при потоковом чтении файла (между блоками обновляется прогресс и проверяется отмена)
+OBJ_READ_BLOCK_SIZE = 1024 * 1024
+
+# Коды символов, которые нужны парсеру
+_NEWLINE = ord("\n")
+_SLASH = ord("/")
+_IS_WHITESPACE = np.zeros(256, dtype=bool)
+_IS_WHITESPACE[[ord(" "), ord("\t"), ord("\r"), ord("\n"), ord("\v"), ord("\f")]] = True
+_IS_SEPARATOR = np.zeros(256, dtype=bool)
+_IS_SEPARATOR[[ord(" "), ord("\t")]] = True
+
 loaded_obj_model = None
 
-def load_obj_file():
-    vertices = []
-    faces = []
+# Исключение, которым прерывается загрузка после нажатия "Отмена"
+class ObjLoadCancelled(Exception):
+    pass
 
+# Класс для загрузки .obj файла в фоновом потоке, чтобы не останавливать цикл отрисовки
+class ObjLoadJob:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.progress = 0.0
+        self.result = None
+        self.lod = None
+        # Статистика загрузки (размер файла, пиковая память, объём итоговых массивов), см. parse_obj_file
+        self.load_stats = None
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
 
-    global loaded_obj_model
+    def _run(self):
+        # Разбор файла занимает первую часть полосы прогресса, построение производных данных - остальную
+        result, self.load_stats = parse_obj_file(self.file_path, cancel_event=self.cancel_event, return_stats=True,
+                                                 progress=lambda value: self._set_progress(OBJ_PARSE_PROGRESS * value))
+        if result is None or self.is_cancelled():
+            return
+        # Упрощённые уровни детализации, иерархии граней для отсечения, триангуляция граней и деревья BSP
+        # строятся здесь же, чтобы не задерживать кадры после загрузки; между этапами проверяется отмена
+        lod = LodChain.from_mesh(result)
+        stages = [(level, name) for level in lod.levels for name in ("bvh", "triangles", "bsp")]
+        for done, (level, name) in enumerate(stages):
+            if self.is_cancelled():
+                return
+            self._set_progress(OBJ_PARSE_PROGRESS + (1 - OBJ_PARSE_PROGRESS) * done / len(stages))
+            getattr(level, name)
+        if self.is_cancelled():
+            return
+        self._set_progress(1.0)
+        self.lod = lod
+        self.result = result
+
+    def _set_progress(self, value):
+        self.progress = value
+
+    def cancel(self):
+        self.cancel_event.set()
 
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def is_done(self):
+        return not self.thread.is_alive()
+
+# Функция для выбора .obj файла через диалоговое окно
+def choose_obj_file():
     root = tk.Tk()
     root.withdraw()
 
@@ -25,49 +92,328 @@ def load_obj_file():
     if not file_path:
         print("Файл не выбран")
         return None
+    return file_path
+
+def load_obj_file():
+    global loaded_obj_model
+
+    file_path = choose_obj_file()
+    if not file_path:
+        return None
 
+    loaded_obj_model = parse_obj_file(file_path)
+    return loaded_obj_model
+
+# Функция для загрузки модели из .obj файла (с использованием бинарного кэша)
+# progress - функция, получающая долю выполненной работы от 0 до 1
+# cancel_event - threading.Event, установка которого прерывает загрузку
+# return_stats=True - вернуть пару (модель, статистика загрузки): статистика stream_obj_file с признаком
+# from_cache; при загрузке из кэша пиковая память не измеряется (None), при ошибке статистика - None
+def parse_obj_file(file_path, use_cache=True, progress=None, cancel_event=None, return_stats=False):
+    model, load_stats = _load_obj_model(file_path, use_cache, progress, cancel_event)
+    return (model, load_stats) if return_stats else model
+
+def _load_obj_model(file_path, use_cache, progress, cancel_event):
     try:
-        with open(file_path, 'r') as file:
-            for line in file:
-                parts = line.split()
-                if not parts:
-                    continue
-
-                if parts[0] == 'v':
-                    vertices.append([float(parts[1]), float(parts[2]), float(parts[3])])
-                elif parts[0] == 'f':
-                    face = []
-                    for i in range(1, len(parts)):
-                        idx = int(parts[i].split('/')[0]) - 1
-                        face.append(idx)
-
-                    if len(face) >= 3:
-                        faces.append(face)
-                    else:
-                        print(f"Предупреждение: Некорректная грань {faces}, пропущена")
+        if use_cache:
+            cached = read_obj_cache(file_path)
+            if cached is not None:
+                vertices, faces, face_sizes = cached
+                _report_progress(progress, 1.0)
+                load_stats = {
+                    "file_size": os.path.getsize(file_path),
+                    "peak_memory": None,
+                    "result_memory": vertices.nbytes + faces.nbytes + face_sizes.nbytes,
+                    "from_cache": True,
+                }
+                return _make_model(vertices, faces, face_sizes), load_stats
+
+        vertices, faces, face_sizes, load_stats = stream_obj_file(file_path, progress, cancel_event)
+        load_stats["from_cache"] = False
 
     except FileNotFoundError:
         print(f"Ошибка: файл не найден: {file_path}")
-        return None
+        return None, None
+
+    except ObjLoadCancelled:
+        print("Загрузка файла отменена")
+        return None, None
 
     except Exception as e:
         print(f"Ошибка при загрузке файла: {e}")
-        return None
+        return None, None
 
-    if not vertices or not faces:
+    if not len(vertices) or not len(faces):
         print("Файл не содержит вершин или граней")
-        loaded_obj_model = None
-        return None
+        return None, None
+
+    if faces.min() < 0 or faces.max() >= len(vertices):
+        print("Ошибка при загрузке файла: индекс вершины грани вне диапазона")
+        return None, None
+
+    if use_cache:
+        write_obj_cache(file_path, vertices, faces, face_sizes)
+    _report_progress(progress, 1.0)
+
+    return _make_model(vertices, faces, face_sizes), load_stats
+
+# Функция для потокового чтения .obj файла блоками фиксированного размера
+# Каждый блок разбирается отдельно и дописывается в растущие массивы float32 / int32,
+# поэтому пиковое потребление памяти близко к размеру итоговых массивов
+# Пиковая память считается по собственным буферам загрузчика (ёмкость растущих массивов, текст блока
+# и результат его разбора), поэтому на неё не влияют выделения памяти в других потоках
+def stream_obj_file(file_path, progress=None, cancel_event=None, block_size=None):
+    block_size = block_size or OBJ_READ_BLOCK_SIZE
+    file_size = os.path.getsize(file_path)
+
+    vertices = GrowableArray(np.float32, 3)
+    faces = GrowableArray(np.int32, 3)
+    face_sizes = GrowableArray(np.int32)
+    peak_memory = 0
+    with open(file_path, 'rb') as file:
+        remainder = b""
+        bytes_read = 0
+        while True:
+            _check_cancelled(cancel_event)
+            block = file.read(block_size)
+            bytes_read += len(block)
+            if block:
+                # Неполная последняя строка блока переносится в следующий блок
+                cut = block.rfind(b"\n") + 1
+                if cut:
+                    data = remainder + block[:cut]
+                    remainder = block[cut:]
+                else:
+                    data, remainder = b"", remainder + block
+            else:
+                data, remainder = remainder, b""
+
+            if data:
+                block_vertices, block_faces, block_sizes = _parse_obj_block(data, vertices.size)
+                vertices.extend(block_vertices)
+                faces.extend(block_faces)
+                face_sizes.extend(block_sizes)
+                buffers_memory = vertices.data.nbytes + faces.data.nbytes + face_sizes.data.nbytes
+                block_memory = len(data) + block_vertices.nbytes + block_faces.nbytes + block_sizes.nbytes
+                peak_memory = max(peak_memory, buffers_memory + block_memory)
+                del data, block_vertices, block_faces, block_sizes
+            _report_progress(progress, 0.95 * bytes_read / max(file_size, 1))
+
+            if not block:
+                break
 
-    face_colors = [GRAY] * len(faces)
+    vertices = vertices.finish()
+    faces = faces.finish()
+    face_sizes = face_sizes.finish()
 
-    loaded_obj_model = {
-        "vertices": vertices,
-        "faces": faces,
-        "colors": face_colors,
+    load_stats = {
+        "file_size": file_size,
+        "peak_memory": peak_memory,
+        "result_memory": vertices.nbytes + faces.nbytes + face_sizes.nbytes,
     }
+    print(f"Пиковое потребление памяти при загрузке: {peak_memory / 2 ** 20:.1f} МБ "
+          f"(итоговые массивы: {load_stats['result_memory'] / 2 ** 20:.1f} МБ)")
+    return vertices, faces, face_sizes, load_stats
 
-    return loaded_obj_model
+def _report_progress(progress, value):
+    if progress is not None:
+        progress(value)
+
+def _check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise ObjLoadCancelled()
+
+def _make_model(vertices, faces, face_sizes):
+    return Mesh(vertices, faces, face_sizes, np.full((len(faces), 3), GRAY, dtype=np.uint8))
+
+# Класс растущего типизированного массива (амортизированное добавление строк без списков Python)
+class GrowableArray:
+    def __init__(self, dtype, width=None, capacity=1024):
+        self.width = width
+        self.size = 0
+        shape = (capacity,) if width is None else (capacity, width)
+        self.data = np.empty(shape, dtype=dtype)
+
+    def extend(self, rows):
+        if self.width is not None and rows.shape[1] > self.width:
+            # Более длинные записи: дополняем уже сохранённые последним столбцом
+            extra = np.repeat(self.data[:, -1:], rows.shape[1] - self.width, axis=1)
+            self.data = np.concatenate([self.data, extra], axis=1)
+            self.width = rows.shape[1]
+        elif self.width is not None and rows.shape[1] < self.width:
+            rows = np.concatenate([rows, np.repeat(rows[:, -1:], self.width - rows.shape[1], axis=1)], axis=1)
+
+        needed = self.size + len(rows)
+        if needed > len(self.data):
+            self.reserve(max(needed, len(self.data) * 5 // 4))
+        self.data[self.size:needed] = rows
+        self.size = needed
+
+    def reserve(self, capacity):
+        if capacity > len(self.data):
+            self.data.resize((capacity,) + self.data.shape[1:], refcheck=False)
+
+    # Возвращает итоговый массив; лишняя ёмкость освобождается без копирования
+    def finish(self):
+        self.data.resize((self.size,) + self.data.shape[1:], refcheck=False)
+        return self.data
+
+# Функция для разбора содержимого .obj файла целиком
+# Возвращает вершины (V, 3) float32, грани (F, K) int32, дополненные последней вершиной, и их длины (F,)
+def parse_obj_data(data):
+    return _parse_obj_block(data)
+
+# Функция для разбора блока .obj файла, состоящего из целых строк
+# vertex_offset - число вершин в предыдущих блоках файла
+# Индексы граней переводятся в отсчёт от 0; отрицательные индексы отсчитываются от последней вершины,
+# заданной до строки грани (с учётом предыдущих блоков)
+def _parse_obj_block(data, vertex_offset=0):
+    buffer = np.frombuffer(data, dtype=np.uint8)
+
+    # Границы строк (конец строки - позиция символа перевода строки или конец файла)
+    line_ends = np.flatnonzero(buffer == _NEWLINE)
+    if not len(line_ends) or line_ends[-1] != len(buffer) - 1:
+        line_ends = np.append(line_ends, len(buffer))
+    line_starts = np.empty_like(line_ends)
+    line_starts[0] = 0
+    line_starts[1:] = line_ends[:-1] + 1
+    # Отступ в начале строки не считается: ключевое слово ищется с первого непробельного символа
+    word_starts = _skip_indent(buffer, line_starts, line_ends)
+
+    vertex_lines = _keyword_lines(buffer, word_starts, line_ends, b"v")
+    face_lines = _keyword_lines(buffer, word_starts, line_ends, b"f")
+    vertex_values, vertex_counts = _read_records(buffer, line_starts, line_ends, word_starts, vertex_lines, b"v",
+                                                 np.float64)
+    face_values, face_counts = _read_records(buffer, line_starts, line_ends, word_starts, face_lines, b"f", np.int64,
+                                             first_index_only=True)
+    # Число вершин, заданных до каждой строки грани
+    face_vertex_counts = vertex_offset + (np.cumsum(vertex_lines) - vertex_lines)[face_lines]
+
+    if (vertex_counts < 3).any():
+        raise ValueError("вершина задана меньше чем тремя координатами")
+    vertices = np.ascontiguousarray(_pad_records(vertex_values, vertex_counts, np.float32)[:, :3])
+
+    valid = face_counts >= 3
+    if not valid.all():
+        print(f"Предупреждение: пропущено некорректных граней: {int((~valid).sum())}")
+        face_values = face_values[np.repeat(valid, face_counts)]
+        face_counts = face_counts[valid]
+        face_vertex_counts = face_vertex_counts[valid]
+
+    # Индексы в .obj начинаются с 1, отрицательные - отсчитываются от конца уже заданных вершин
+    face_values = np.where(face_values > 0, face_values - 1, face_values + np.repeat(face_vertex_counts, face_counts))
+    faces = _pad_records(face_values, face_counts, np.int32)
+    return vertices, faces, face_counts.astype(np.int32)
+
+# Функция для пропуска пробелов и табуляций в начале строк: возвращает позиции первых непробельных символов
+# Сдвигаются только строки с отступом, по одному символу за проход (проходов столько, какой самый длинный отступ)
+def _skip_indent(buffer, line_starts, line_ends):
+    word_starts = line_starts.copy()
+    indented = np.flatnonzero(word_starts < line_ends)
+    indented = indented[_IS_SEPARATOR[buffer[word_starts[indented]]]]
+    while len(indented):
+        word_starts[indented] += 1
+        indented = indented[word_starts[indented] < line_ends[indented]]
+        indented = indented[_IS_SEPARATOR[buffer[word_starts[indented]]]]
+    return word_starts
+
+# Функция для выбора строк с заданным ключевым словом: строка подходит, если после отступа (word_starts - начала
+# строк без отступа, см. _skip_indent) идёт ключевое слово, а за ним пробел или табуляция. Возвращает маску строк
+def _keyword_lines(buffer, word_starts, line_ends, keyword):
+    word_length = len(keyword)
+    selected = line_ends - word_starts > word_length
+    selected[selected] = _IS_SEPARATOR[buffer[word_starts[selected] + word_length]]
+    for k, char in enumerate(keyword):
+        selected[selected] = buffer[word_starts[selected] + k] == char
+    return selected
+
+# Функция для разбора чисел в строках selected (маска строк с ключевым словом keyword, см. _keyword_lines)
+# first_index_only=True - из записей вида v/vt/vn берётся только первое число (индекс вершины)
+# Возвращает плоский массив значений и количество значений в каждой строке
+def _read_records(buffer, line_starts, line_ends, word_starts, selected, keyword, dtype, first_index_only=False):
+    word_length = len(keyword)
+    if not selected.any():
+        return np.empty(0, dtype=dtype), np.empty(0, dtype=np.int64)
+
+    # Копируем выбранные строки вместе с переводами строк, ключевое слово (после отступа) заменяем пробелами
+    line_lengths = line_ends - line_starts + 1
+    line_lengths[-1] = len(buffer) - line_starts[-1]
+    text = buffer[np.repeat(selected, line_lengths)]
+    if text[-1] != _NEWLINE:
+        text = np.append(text, np.uint8(_NEWLINE))
+    text_word_starts = np.cumsum(line_lengths[selected]) - line_lengths[selected] + (word_starts - line_starts)[selected]
+    for k in range(word_length):
+        text[text_word_starts + k] = ord(" ")
+
+    # Начала записей и их количество в каждой строке
+    is_space = _IS_WHITESPACE[text]
+    token_start = ~is_space
+    token_start[1:] &= is_space[:-1]
+    token_positions = np.flatnonzero(token_start)
+    counts = np.diff(np.searchsorted(token_positions, np.flatnonzero(text == _NEWLINE)), prepend=0)
+
+    if first_index_only:
+        slash = text == _SLASH
+        if slash.any():
+            # Разделители "/" превращаются в пробелы, а из всех чисел берутся только первые в каждой записи
+            separator = is_space | slash
+            number_start = ~separator
+            number_start[1:] &= separator[:-1]
+            text[slash] = ord(" ")
+            values = np.fromstring(text.tobytes(), dtype=dtype, sep=" ")
+            if len(values) != number_start.sum():
+                raise ValueError(f"некорректные числа в строках '{keyword.decode()}'")
+            return values[np.searchsorted(np.flatnonzero(number_start), token_positions)], counts
+
+    values = np.fromstring(text.tobytes(), dtype=dtype, sep=" ")
+    if len(values) != len(token_positions):
+        raise ValueError(f"некорректные числа в строках '{keyword.decode()}'")
+    return values, counts
+
+# Функция для упаковки записей разной длины в прямоугольный массив
+# Короткие записи дополняются своим последним значением
+def _pad_records(values, counts, dtype):
+    if not len(counts):
+        return np.empty((0, 3), dtype=dtype)
+    width = int(counts.max())
+    if counts.min() == width:
+        # Быстрый путь: все записи одной длины (например, только треугольники или только четырёхугольники)
+        return values.reshape(-1, width).astype(dtype)
+    offsets = np.cumsum(counts) - counts
+    columns = np.minimum(np.arange(width), counts[:, None] - 1)
+    return values[offsets[:, None] + columns].astype(dtype)
+
+# Путь к файлу кэша для .obj файла
+def get_obj_cache_path(file_path):
+    return file_path + OBJ_CACHE_SUFFIX
+
+# Функция для чтения кэша; кэш действителен, только если размер и время изменения .obj совпадают
+def read_obj_cache(file_path):
+    cache_path = get_obj_cache_path(file_path)
+    if not os.path.exists(cache_path):
+        return None
+    stat = os.stat(file_path)
+    try:
+        with np.load(cache_path) as cache:
+            if int(cache["source_size"]) != stat.st_size or int(cache["source_mtime_ns"]) != stat.st_mtime_ns:
+                return None
+            return cache["vertices"], cache["faces"], cache["face_sizes"]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Предупреждение: не удалось прочитать кэш {cache_path}: {e}")
+        return None
+
+# Функция для записи кэша рядом с .obj файлом (запись атомарная, через временный файл)
+def write_obj_cache(file_path, vertices, faces, face_sizes):
+    cache_path = get_obj_cache_path(file_path)
+    temp_path = cache_path + ".tmp"
+    stat = os.stat(file_path)
+    try:
+        with open(temp_path, 'wb') as file:
+            np.savez(file, vertices=vertices, faces=faces, face_sizes=face_sizes,
+                     source_size=stat.st_size, source_mtime_ns=stat.st_mtime_ns)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Предупреждение: не удалось сохранить кэш {cache_path}: {e}")
 
 def get_loaded_model():
     return loaded_obj_model
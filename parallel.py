@@ -0,0 +1,188 @@
+import os
+import atexit
+import signal
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+import pygame
+from rasterizer import fill_faces, rasterize_triangles
+from parameters import PARALLEL_WORKERS, PARALLEL_MIN_FACES, PARALLEL_TILES_PER_WORKER
+
+# Параллельная отрисовка больших моделей: экран делится на горизонтальные полосы,
+# каждая полоса рисуется отдельным процессом в общий (shared memory) буфер
+# Полоса рисуется теми же функциями и с теми же координатами, что и весь кадр (с отсечением по строкам),
+# поэтому результат совпадает с однопоточной отрисовкой попиксельно
+
+# Число процессов (0 - по числу ядер, 1 - параллельная отрисовка отключена)
+_worker_count = PARALLEL_WORKERS
+# Пул создаётся при первой отрисовке большой модели; если создать его не удалось, отрисовка остаётся однопоточной
+_pool = None
+_pool_failed = False
+# Общие массивы основного процесса: ключ -> SharedMemory
+_shared = {}
+# Общие массивы, подключённые в процессе-обработчике: ключ -> SharedMemory
+_attached = {}
+# Поверхности индексов процессов-обработчиков
+_tile_surfaces = {}
+
+def set_parallel_workers(count):
+    global _worker_count
+    if count != _worker_count:
+        shutdown_parallel()
+    _worker_count = count
+
+def get_parallel_workers():
+    return _worker_count or os.cpu_count() or 1
+
+# Параллельная отрисовка используется для моделей от PARALLEL_MIN_FACES граней
+# Процессы запускаются через fork: main.py не защищён от повторного выполнения при запуске через spawn
+def is_parallel_enabled(face_count):
+    return (face_count >= PARALLEL_MIN_FACES and get_parallel_workers() > 1
+            and "fork" in multiprocessing.get_all_start_methods() and _get_pool() is not None)
+
+def _get_pool():
+    global _pool, _pool_failed
+    if _pool is None and not _pool_failed:
+        try:
+            # Учёт общей памяти ведётся одним процессом для всех обработчиков (иначе каждый запустит свой)
+            resource_tracker.ensure_running()
+            _pool = multiprocessing.get_context("fork").Pool(get_parallel_workers(), initializer=_init_worker)
+        except OSError as error:
+            print(f"Предупреждение: не удалось запустить процессы отрисовки ({error}), отрисовка будет однопоточной")
+            _pool_failed = True
+    return _pool
+
+# Настройка процесса-обработчика: обработчики сигналов копируются из основного процесса при fork,
+# а SDL (pygame.init) перехватывает SIGTERM, и Pool.terminate ждал бы такой процесс бесконечно.
+# Ctrl+C обрабатывает основной процесс, обработчики его игнорируют
+def _init_worker():
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+# Функция для остановки процессов отрисовки и освобождения общей памяти
+def shutdown_parallel():
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+    for memory in _shared.values():
+        _release(memory)
+    _shared.clear()
+
+atexit.register(shutdown_parallel)
+
+def _release(memory):
+    try:
+        memory.close()
+    except BufferError:
+        # На буфер ещё ссылаются массивы (память освободится вместе с ними)
+        pass
+    memory.unlink()
+
+# Функция для получения общего массива основного процесса; память выделяется заново, только если её не хватает
+# Возвращает массив и описание (ключ, имя памяти, форма, тип) для подключения в процессе-обработчике
+def _shared_array(key, shape, dtype):
+    dtype = np.dtype(dtype)
+    size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+    memory = _shared.get(key)
+    if memory is None or memory.size < size:
+        if memory is not None:
+            _release(memory)
+        # Запас, чтобы не пересоздавать память при небольшом росте модели
+        memory = _shared[key] = shared_memory.SharedMemory(create=True, size=size + size // 4)
+    array = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+    return array, (key, memory.name, tuple(shape), dtype.str)
+
+def _share(key, values):
+    array, spec = _shared_array(key, values.shape, values.dtype)
+    array[...] = values
+    return spec
+
+# Функция для подключения общего массива по описанию в процессе-обработчике
+def _attach(spec):
+    key, name, shape, dtype = spec
+    memory = _attached.get(key)
+    if memory is None or memory.name != name:
+        if memory is not None:
+            memory.close()
+        memory = _attached[key] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=memory.buf)
+
+# Функция для разбиения строк [row_min, row_max) на полосы для процессов
+def split_rows(row_min, row_max, count):
+    bounds = np.linspace(row_min, row_max, min(count, row_max - row_min) + 1).astype(int)
+    return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+def _tile_count():
+    return get_parallel_workers() * PARALLEL_TILES_PER_WORKER
+
+# Функция для параллельной заливки граней в буфер индексов (аналог fill_faces для всего экрана)
+# projected_points - (V, 2) экранные координаты, faces и face_sizes - грани в порядке отрисовки, ranks - их ранги
+# region = (x_min, y_min, x_max, y_max) - область экрана, в которой лежат грани
+# Возвращает массив рангов (width, height) в раскладке pygame.surfarray.pixels2d, заполненный внутри region,
+# и число пропущенных граней (грань, задевающая несколько полос, считается в каждой из них)
+def fill_faces_parallel(projected_points, faces, face_sizes, ranks, width, height, region):
+    x_min, y_min, x_max, y_max = region
+    face_y = projected_points[faces, 1]
+    # Полоса получает только грани, которые могут её задеть; грани с неконечными или очень большими
+    # координатами (их рисует pygame после приведения к целым) отдаются всем полосам
+    wild = ~(np.abs(face_y) < 1e6).all(axis=1)
+    face_rows = np.empty((len(faces), 2), dtype=np.int64)
+    face_y = np.where(wild[:, None], 0, face_y)
+    face_rows[:, 0] = np.where(wild, y_min, np.floor(face_y.min(axis=1)) - 1)
+    face_rows[:, 1] = np.where(wild, y_max, np.ceil(face_y.max(axis=1)) + 1)
+
+    output, output_spec = _shared_array("fill_rank", (width, height), np.uint32)
+    specs = (_share("projected", projected_points), _share("faces", faces), _share("face_sizes", face_sizes),
+             _share("ranks", ranks), _share("face_rows", face_rows), output_spec)
+    tasks = [(specs, (width, height), (x_min, start, x_max, end)) for start, end in split_rows(y_min, y_max, _tile_count())]
+    skipped = sum(_get_pool().map(_fill_tile, tasks, chunksize=1))
+    return output, skipped
+
+def _fill_tile(task):
+    (projected_spec, faces_spec, sizes_spec, ranks_spec, rows_spec, output_spec), size, (x_min, start, x_max, end) = task
+    projected_points, faces = _attach(projected_spec), _attach(faces_spec)
+    face_rows, output = _attach(rows_spec), _attach(output_spec)
+    selected = np.flatnonzero((face_rows[:, 1] >= start) & (face_rows[:, 0] < end))
+
+    if size not in _tile_surfaces:
+        _tile_surfaces[size] = pygame.Surface(size, depth=32)
+    surface = _tile_surfaces[size]
+    tile = pygame.Rect(x_min, start, x_max - x_min, end - start)
+    surface.set_clip(tile)
+    surface.fill(0, tile)
+    skipped = fill_faces(surface, projected_points[faces[selected]].tolist(), _attach(sizes_spec)[selected].tolist(),
+                         _attach(ranks_spec)[selected].tolist())
+    output[x_min:x_max, start:end] = pygame.surfarray.pixels2d(surface)[x_min:x_max, start:end]
+    return skipped
+
+# Функция для параллельной растеризации треугольников с Z-буфером (аргументы как у rasterize_triangles)
+# rows - (первая, последняя + 1) строки, в которых лежат треугольники
+# Возвращает очищенные и заполненные буферы цвета (height, width, 3) и глубины (height, width)
+def rasterize_triangles_parallel(points, inv_depths, colors, width, height, background, rows, intensities=None):
+    color_buffer, color_spec = _shared_array("color_buffer", (height, width, 3), np.uint8)
+    depth_buffer, depth_spec = _shared_array("depth_buffer", (height, width), np.float32)
+    color_buffer[...] = background
+    depth_buffer.fill(0.0)
+
+    # Строки, которые может задеть треугольник (как в rasterize_triangles), - полоса получает только свои треугольники
+    triangle_rows = np.empty((len(points), 2), dtype=np.int64)
+    triangle_rows[:, 0] = np.ceil(points[:, :, 1].min(axis=1) - 0.5)
+    triangle_rows[:, 1] = np.floor(points[:, :, 1].max(axis=1) - 0.5)
+
+    specs = (_share("points", points), _share("inv_depths", inv_depths), _share("colors", colors),
+             _share("triangle_rows", triangle_rows), color_spec, depth_spec,
+             _share("intensities", intensities) if intensities is not None else None)
+    tasks = [(specs, band) for band in split_rows(*rows, _tile_count())]
+    _get_pool().map(_rasterize_tile, tasks, chunksize=1)
+    return color_buffer, depth_buffer
+
+def _rasterize_tile(task):
+    (points_spec, inv_depths_spec, colors_spec, rows_spec, color_spec, depth_spec, intensities_spec), (start, end) = task
+    triangle_rows = _attach(rows_spec)
+    selected = np.flatnonzero((triangle_rows[:, 1] >= start) & (triangle_rows[:, 0] < end))
+    intensities = _attach(intensities_spec)[selected] if intensities_spec is not None else None
+    rasterize_triangles(_attach(color_spec), _attach(depth_spec), _attach(points_spec)[selected],
+                        _attach(inv_depths_spec)[selected], _attach(colors_spec)[selected], (start, end), intensities)
@@ -14,6 +14,10 @@ ORANGE = (255, 165, 0)
 # Настройки окна
 WIDTH, HEIGHT = 1200, 800
 
+# Планировщик кадров: ограничение FPS при анимации и период опроса в простое во время фоновой работы (мс)
+TARGET_FPS = 240
+IDLE_POLL_MS = 100
+
 # Параметры камеры
 MIN_DISTANCE = 0.0
 MAX_DISTANCE = 10.0
@@ -29,5 +33,65 @@ AMBIENT_INTENSITY_MIN = 0.0
 AMBIENT_INTENSITY_MAX = 1.0
 AMBIENT_DEFAULT = 0.2
 
-# Направление света
-LIGHT_DIRECTION = np.array([0.0, 0.0, -1.0])
\ No newline at end of file
+# Направление света (для нескольких источников - массив направлений (L, 3))
+LIGHT_DIRECTION = np.array([0.0, 0.0, -1.0])
+
+# Таблица освещённости: число ячеек направлений нормали по каждой оси октаэдрической развёртки
+# и число уровней освещённости
+LIGHTING_NORMAL_BINS = 256
+LIGHTING_LEVELS = 256
+
+# Ближняя плоскость камеры: части граней ближе неё к камере отсекаются
+NEAR_PLANE = 0.05
+
+# Иерархия ограничивающих сфер: число граней в листе и запас (в пикселях) у краёв экрана при отсечении
+BVH_LEAF_SIZE = 64
+FRUSTUM_MARGIN = 2
+
+# Дерево BSP для алгоритма художника: наибольшее число граней модели, для которой оно строится,
+# число секущих плоскостей-кандидатов в узле, вес разрезанной грани при выборе плоскости
+# и число граней узла, по которым оценивается плоскость
+BSP_MAX_FACES = 2048
+BSP_CANDIDATES = 5
+BSP_SPLIT_COST = 8
+BSP_SAMPLE_SIZE = 256
+
+# Сортировка граней по глубине с учётом порядка предыдущего кадра: угол поворота модели между кадрами (радианы),
+# начиная с которого грани сортируются заново
+RESORT_MAX_ANGLE = 0.1
+
+# Уровни детализации: минимальная площадь проекции (в пикселях) на одну грань
+# и число граней, меньше которого модель не упрощается
+LOD_PIXELS_PER_FACE = 8
+LOD_MIN_FACES = 100
+
+# Число моделей фигур (с учётом разных разрешений), которые хранятся в кэше
+SHAPE_CACHE_SIZE = 32
+
+# Параллельная отрисовка: число процессов (0 - по числу ядер, 1 - отключена), минимальное число видимых граней,
+# начиная с которого она включается, и число полос экрана на один процесс (для равномерной загрузки)
+PARALLEL_WORKERS = 0
+PARALLEL_MIN_FACES = 100_000
+PARALLEL_TILES_PER_WORKER = 2
+
+# Профилирование: число последних кадров в статистике, размер графика времени кадра (пиксели)
+# и время кадра (мс), соответствующее полной высоте графика
+PROFILE_HISTORY = 240
+PROFILE_GRAPH_SIZE = (360, 80)
+PROFILE_GRAPH_MAX_MS = 50.0
+
+# Демонстрационная сцена из множества деталей: число деталей по каждой оси, шаг сетки и масштаб детали
+SCENE_GRID_SIZE = 6
+SCENE_GRID_SPACING = 0.6
+SCENE_PART_SCALE = 0.2
+
+# Экспорт кадров: максимальное число отрисованных кадров, ожидающих записи
+EXPORT_QUEUE_SIZE = 8
+
+# Режимы отрисовки
+RENDER_MODES = ["painter", "zbuffer", "smooth"]
+RENDER_MODE_NAMES = {
+    "painter": "Алгоритм художника",
+    "zbuffer": "Z-буфер",
+    "smooth": "Z-буфер, затенение по Гуро",
+}
\ No newline at end of file
@@ -0,0 +1,125 @@
+import csv
+import json
+import time
+from collections import deque
+
+import numpy as np
+from parameters import PROFILE_HISTORY
+
+# Профилировщик кадров: время этапов отрисовки собирается только после enable_profiling(True)
+# В выключенном состоянии profile_stage возвращает пустой контекстный менеджер и ничего не измеряет
+_enabled = False
+# Завершённые кадры: список (этап, начало в нс, длительность в нс), не больше PROFILE_HISTORY кадров
+_frames = deque(maxlen=PROFILE_HISTORY)
+_frame_numbers = deque(maxlen=PROFILE_HISTORY)
+_current_frame = None
+_frame_start = 0
+_frame_counter = 0
+# Этапы в порядке первого появления (для стабильного порядка строк в оверлее и отчётах)
+_stage_names = []
+
+# Класс замера одного этапа
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        if _current_frame is not None:
+            _current_frame.append((self.name, self.start, time.perf_counter_ns() - self.start))
+            if self.name not in _stage_names:
+                _stage_names.append(self.name)
+        return False
+
+# Пустой замер для выключенного профилировщика
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+def enable_profiling(enabled=True):
+    global _enabled, _current_frame
+    _enabled = enabled
+    if not enabled:
+        _current_frame = None
+
+def is_profiling_enabled():
+    return _enabled
+
+# Замер этапа: with profile_stage("projection"): ...
+def profile_stage(name):
+    return _Stage(name) if _enabled else _NULL_STAGE
+
+# Начало кадра: этапы до end_frame относятся к этому кадру (весь кадр записывается как этап "frame")
+def begin_frame():
+    global _current_frame, _frame_start
+    if _enabled:
+        _current_frame = []
+        _frame_start = time.perf_counter_ns()
+
+def end_frame():
+    global _current_frame, _frame_counter
+    if _current_frame is None:
+        return
+    _current_frame.append(("frame", _frame_start, time.perf_counter_ns() - _frame_start))
+    _frames.append(_current_frame)
+    _frame_numbers.append(_frame_counter)
+    _frame_counter += 1
+    _current_frame = None
+
+def reset_profiling():
+    global _frame_counter
+    _frames.clear()
+    _frame_numbers.clear()
+    _stage_names.clear()
+    _frame_counter = 0
+
+# Длительности (мс) каждого этапа по кадрам истории: {этап: массив (кадров,)}; если этапа не было в кадре - 0
+def get_stage_times():
+    times = {name: np.zeros(len(_frames)) for name in _stage_names + ["frame"]}
+    for index, frame in enumerate(_frames):
+        for name, _, duration in frame:
+            times[name][index] += duration / 1e6
+    return times
+
+# Статистика этапов за историю: среднее, медиана, 95-й перцентиль и максимум в миллисекундах
+def get_stage_stats():
+    if not _frames:
+        return {}
+    return {name: {"mean": float(values.mean()),
+                   "p50": float(np.percentile(values, 50)),
+                   "p95": float(np.percentile(values, 95)),
+                   "max": float(values.max())}
+            for name, values in get_stage_times().items()}
+
+# Экспорт истории в CSV: одна строка на замер этапа
+def export_csv(path):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["frame", "stage", "start_ms", "duration_ms"])
+        for frame_number, frame in zip(_frame_numbers, _frames):
+            frame_start = frame[-1][1]
+            for name, start, duration in frame:
+                writer.writerow([frame_number, name, f"{(start - frame_start) / 1e6:.4f}", f"{duration / 1e6:.4f}"])
+
+# Экспорт истории в формате Chrome Trace (открывается в chrome://tracing или Perfetto)
+def export_chrome_trace(path):
+    events = []
+    origin = _frames[0][-1][1] if _frames else 0
+    for frame_number, frame in zip(_frame_numbers, _frames):
+        for name, start, duration in frame:
+            events.append({"name": name, "cat": "render", "ph": "X", "pid": 0, "tid": 0,
+                           "ts": (start - origin) / 1e3, "dur": duration / 1e3, "args": {"frame": frame_number}})
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
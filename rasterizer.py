@@ -0,0 +1,174 @@
+import numpy as np
+import pygame
+from parameters import BLACK
+
+# Максимальное число проверяемых пикселей за один проход растеризатора (ограничивает расход памяти)
+RASTER_CHUNK_SAMPLES = 1 << 20
+
+# Кадровые буферы переиспользуются между кадрами, чтобы не выделять память каждый раз
+_frame_buffers = {}
+_index_surfaces = {}
+
+# Функция для получения очищенных буферов цвета (HEIGHT, WIDTH, 3) и глубины (HEIGHT, WIDTH)
+# В буфере глубины хранится 1 / w (w - расстояние до камеры), 0 означает бесконечно далеко
+def get_frame_buffers(width, height, background=BLACK):
+    key = (width, height)
+    if key not in _frame_buffers:
+        _frame_buffers[key] = (np.empty((height, width, 3), dtype=np.uint8),
+                               np.empty((height, width), dtype=np.float32))
+    color_buffer, depth_buffer = _frame_buffers[key]
+    if background[0] == background[1] == background[2]:
+        color_buffer.fill(background[0])
+    else:
+        for channel in range(3):
+            color_buffer[:, :, channel] = background[channel]
+    depth_buffer.fill(0.0)
+    return color_buffer, depth_buffer
+
+# Функция для получения очищенной 32-битной поверхности индексов (в пикселе хранится номер грани, 0 - пусто)
+def get_index_surface(width, height):
+    key = (width, height)
+    if key not in _index_surfaces:
+        _index_surfaces[key] = pygame.Surface((width, height), depth=32)
+    surface = _index_surfaces[key]
+    surface.fill(0)
+    return surface
+
+# Функция для заливки граней на поверхность индексов: пиксели грани получают её ранг
+# face_points - списки экранных точек граней (с дополнением до общей длины), face_sizes - число вершин граней
+# Грани рисуются по порядку, поэтому в пикселе остаётся ранг последней залившей его грани
+# Грани нулевой площади отбрасываются заранее (см. Mesh.fillable_faces)
+# Возвращает число пропущенных граней, которые pygame не смог нарисовать (например, с неконечными координатами)
+def fill_faces(surface, face_points, face_sizes, ranks):
+    skipped = 0
+    for rank, points, face_size in zip(ranks, face_points, face_sizes):
+        try:
+            pygame.draw.polygon(surface, rank, points[:face_size])
+        except TypeError:
+            skipped += 1
+    return skipped
+
+# Функция для растеризации треугольников с проверкой глубины
+# points - (T, 3, 2) экранные координаты, inv_depths - (T, 3) значения 1 / w, colors - (T, 3) uint8
+# rows - (первая, последняя + 1) строки буфера, которые можно изменять (по умолчанию - весь буфер)
+# intensities - (T, 3) освещённость вершин: если задана, цвет пикселя равен colors, умноженному на освещённость,
+# интерполированную по треугольнику с учётом перспективы (затенение по Гуро)
+def rasterize_triangles(color_buffer, depth_buffer, points, inv_depths, colors, rows=None, intensities=None):
+    height, width = depth_buffer.shape
+    if len(points) == 0:
+        return
+    row_min, row_max = rows if rows is not None else (0, height)
+
+    x = points[:, :, 0]
+    y = points[:, :, 1]
+
+    # Ограничивающие прямоугольники в пикселях (центр пикселя - в точке i + 0.5)
+    x_min = np.clip(np.ceil(x.min(axis=1) - 0.5), 0, width).astype(np.int64)
+    x_max = np.clip(np.floor(x.max(axis=1) - 0.5), -1, width - 1).astype(np.int64)
+    y_min = np.clip(np.ceil(y.min(axis=1) - 0.5), row_min, row_max).astype(np.int64)
+    y_max = np.clip(np.floor(y.max(axis=1) - 0.5), row_min - 1, row_max - 1).astype(np.int64)
+
+    # Удвоенная ориентированная площадь, вырожденные треугольники не рисуются
+    area = (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0])
+    candidates = np.flatnonzero((x_max >= x_min) & (y_max >= y_min) & (area != 0))
+    if len(candidates) == 0:
+        return
+
+    # Барицентрические координаты и 1 / w - аффинные функции экранных координат:
+    # b0 = a0 * x + c0 * y + d0, b1 = a1 * x + c1 * y + d1, depth = ad * x + cd * y + dd
+    x0, x1, x2 = x[candidates, 0], x[candidates, 1], x[candidates, 2]
+    y0, y1, y2 = y[candidates, 0], y[candidates, 1], y[candidates, 2]
+    inv_area = 1.0 / area[candidates]
+    z0, z1, z2 = inv_depths[candidates, 0], inv_depths[candidates, 1], inv_depths[candidates, 2]
+
+    coefficients = np.empty((len(candidates), 9 if intensities is None else 12), dtype=np.float64)
+    coefficients[:, 0] = (y1 - y2) * inv_area
+    coefficients[:, 1] = (x2 - x1) * inv_area
+    coefficients[:, 2] = (x1 * y2 - x2 * y1) * inv_area
+    coefficients[:, 3] = (y2 - y0) * inv_area
+    coefficients[:, 4] = (x0 - x2) * inv_area
+    coefficients[:, 5] = (x2 * y0 - x0 * y2) * inv_area
+    coefficients[:, 6:9] = _plane_coefficients(coefficients, z0, z1, z2)
+
+    # Освещённость, делённая на w, тоже аффинна на экране: освещённость пикселя - её отношение к 1 / w
+    if intensities is not None:
+        i0, i1, i2 = intensities[candidates, 0], intensities[candidates, 1], intensities[candidates, 2]
+        coefficients[:, 9:12] = _plane_coefficients(coefficients, i0 * z0, i1 * z1, i2 * z2)
+
+    # Треугольники делятся на проходы так, чтобы суммарная площадь их прямоугольников не превышала лимит
+    box_width = x_max[candidates] - x_min[candidates] + 1
+    box_height = y_max[candidates] - y_min[candidates] + 1
+    box_end = np.cumsum(box_width * box_height)
+
+    start = 0
+    while start < len(candidates):
+        limit = (box_end[start - 1] if start else 0) + RASTER_CHUNK_SAMPLES
+        end = max(start + 1, int(np.searchsorted(box_end, limit, side="right")))
+        chunk = slice(start, end)
+        start = end
+
+        _rasterize_chunk(color_buffer, depth_buffer, candidates[chunk], coefficients[chunk], colors,
+                         x_min[candidates[chunk]], y_min[candidates[chunk]], box_width[chunk], box_height[chunk])
+
+# Функция для коэффициентов (a, c, d) аффинной функции a * x + c * y + d, равной v0, v1, v2 в вершинах треугольника
+# (по коэффициентам барицентрических координат b0 и b1 в первых шести столбцах coefficients)
+def _plane_coefficients(coefficients, v0, v1, v2):
+    return np.stack([coefficients[:, 0] * (v0 - v2) + coefficients[:, 3] * (v1 - v2),
+                     coefficients[:, 1] * (v0 - v2) + coefficients[:, 4] * (v1 - v2),
+                     coefficients[:, 2] * (v0 - v2) + coefficients[:, 5] * (v1 - v2) + v2], axis=1)
+
+def _rasterize_chunk(color_buffer, depth_buffer, triangles, coefficients, colors, x_min, y_min, box_width, box_height):
+    width = depth_buffer.shape[1]
+
+    # Все пиксели ограничивающих прямоугольников прохода без выравнивания по размеру
+    box_area = box_width * box_height
+    owner = np.repeat(np.arange(len(triangles)), box_area)
+    local = np.arange(len(owner)) - np.repeat(np.cumsum(box_area) - box_area, box_area)
+    offset_y = local // box_width[owner]
+    px = x_min[owner] + (local - offset_y * box_width[owner])
+    py = y_min[owner] + offset_y
+
+    # Проверка попадания центра пикселя в треугольник
+    sample_x = px + 0.5
+    sample_y = py + 0.5
+    c = coefficients[owner]
+    b0 = c[:, 0] * sample_x + c[:, 1] * sample_y + c[:, 2]
+    b1 = c[:, 3] * sample_x + c[:, 4] * sample_y + c[:, 5]
+    inside = np.flatnonzero((b0 >= 0) & (b1 >= 0) & (b0 + b1 <= 1))
+    if len(inside) == 0:
+        return
+
+    c = c[inside]
+    sample_x, sample_y = sample_x[inside], sample_y[inside]
+    depth = (c[:, 6] * sample_x + c[:, 7] * sample_y + c[:, 8]).astype(np.float32)
+    pixels = py[inside] * width + px[inside]
+    owner = triangles[owner[inside]]
+
+    # Для каждого пикселя остаётся ближайший фрагмент прохода (при равной глубине - первый по порядку)
+    order = np.lexsort((-depth, pixels))
+    sorted_pixels = pixels[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_pixels[1:] != sorted_pixels[:-1]
+    nearest = order[first]
+
+    # Тест глубины с уже нарисованным
+    pixels = pixels[nearest]
+    depth = depth[nearest]
+    depth_flat = depth_buffer.reshape(-1)
+    closer = depth > depth_flat[pixels]
+    pixels = pixels[closer]
+    depth_flat[pixels] = depth[closer]
+    written = nearest[closer]
+    if c.shape[1] == 9:
+        color_buffer.reshape(-1, 3)[pixels] = colors[owner[written]]
+        return
+
+    # Затенение по Гуро: освещённость считается только для записанных пикселей
+    c = c[written]
+    intensity = (c[:, 9] * sample_x[written] + c[:, 10] * sample_y[written] + c[:, 11]) / depth[closer]
+    intensity = np.clip(intensity, 0.0, 1.0)
+    color_buffer.reshape(-1, 3)[pixels] = (colors[owner[written]] * intensity[:, None]).astype(np.uint8)
+
+# Функция для вывода буфера цвета на поверхность pygame
+def present_frame_buffer(screen, color_buffer):
+    pygame.surfarray.blit_array(screen, color_buffer.swapaxes(0, 1))
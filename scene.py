@@ -0,0 +1,179 @@
+import numpy as np
+from mesh import Mesh
+from math_utils import rotation_matrix
+from shapes import get_shape, get_shape_lod
+from parameters import SCENE_GRID_SIZE, SCENE_GRID_SPACING, SCENE_PART_SCALE
+
+# Граф сцены: узлы с собственным преобразованием относительно родителя и (необязательно) моделью
+# Экземпляры одной модели ссылаются на один объект Mesh, а для отрисовки все модели сцены
+# объединяются в одну модель, которая проходит отсечение, сортировку и растеризацию за один вызов render_scene
+
+# Класс узла сцены
+# matrix - (3, 3) поворот и масштаб, position - смещение относительно родителя
+# lod - цепочка уровней детализации модели (если задана, уровень выбирается для каждого экземпляра отдельно)
+class SceneNode:
+    def __init__(self, mesh=None, matrix=None, position=(0.0, 0.0, 0.0), lod=None, children=()):
+        self.mesh = mesh if mesh is not None or lod is None else lod.levels[0]
+        self.lod = lod
+        self.matrix = np.eye(3) if matrix is None else np.asarray(matrix, dtype=np.float64)
+        self.position = np.asarray(position, dtype=np.float64)
+        self.children = list(children)
+        # Номер версии преобразования: по нему сцена узнаёт, что вершины объединённой модели нужно пересчитать
+        self.version = 0
+
+    def set_transform(self, matrix=None, position=None):
+        if matrix is not None:
+            self.matrix = np.asarray(matrix, dtype=np.float64)
+        if position is not None:
+            self.position = np.asarray(position, dtype=np.float64)
+        self.version += 1
+
+    def add(self, node):
+        self.children.append(node)
+        return node
+
+    # Обход поддерева: (узел, матрица и смещение в мировой системе координат)
+    def walk(self, matrix=None, position=None):
+        world_matrix = self.matrix if matrix is None else matrix @ self.matrix
+        world_position = self.position if matrix is None else matrix @ self.position + position
+        yield self, world_matrix, world_position
+        for child in self.children:
+            yield from child.walk(world_matrix, world_position)
+
+    def nodes(self):
+        yield self
+        for child in self.children:
+            yield from child.nodes()
+
+# Класс сцены: корневой узел и кэш объединённой модели
+class Scene:
+    def __init__(self, root=None):
+        self.root = root if root is not None else SceneNode()
+        # Мировые преобразования узлов с моделями и ключ (узлы, версии), для которого они посчитаны
+        self._transforms = None
+        self._transforms_key = None
+        # Объединённая модель, её экземпляры (ключ состава) и версии преобразований, по которым посчитаны вершины
+        self._batch = None
+        self._batch_key = None
+        self._batch_meshes = None
+        self._batch_transforms_key = None
+
+    # Сцена из одной модели в начале координат
+    @classmethod
+    def single(cls, mesh, lod=None):
+        return cls(SceneNode(mesh, lod=lod))
+
+    def add(self, node):
+        return self.root.add(node)
+
+    # Функция для получения мировых преобразований узлов с моделями: [(узел, матрица, смещение, масштаб)]
+    # Пересчитываются, только если изменилось дерево или преобразование какого-либо узла
+    def _world_transforms(self):
+        key = tuple((id(node), node.version) for node in self.root.nodes())
+        if key != self._transforms_key:
+            self._transforms = [(node, matrix, position, float(np.linalg.norm(matrix, 2)))
+                                for node, matrix, position in self.root.walk() if node.mesh is not None]
+            self._transforms_key = key
+        return self._transforms, key
+
+    # Модель для отрисовки сцены камерой на расстоянии camera_distance
+    # Модели всех узлов объединяются в одну; она строится заново только при смене состава сцены
+    # или уровней детализации, а при изменении одних преобразований в ней пересчитываются вершины
+    def batch(self, camera_distance, fov):
+        transforms, transforms_key = self._world_transforms()
+        meshes = [_select_level(node, position, scale, camera_distance, fov) for node, _, position, scale in transforms]
+
+        # Одна модель без преобразования отрисовывается как есть (со всеми её кэшами)
+        if len(meshes) == 1 and np.array_equal(transforms[0][1], np.eye(3)) and not transforms[0][2].any():
+            return meshes[0]
+
+        key = tuple(id(mesh) for mesh in meshes)
+        if key != self._batch_key:
+            self._batch = merge_instances(meshes, [matrix for _, matrix, _, _ in transforms],
+                                          [position for _, _, position, _ in transforms])
+            # Ссылки на модели хранятся вместе с ключом, чтобы номера объектов в нём оставались действительными
+            self._batch_key = key
+            self._batch_meshes = meshes
+        elif transforms_key != self._batch_transforms_key:
+            self._batch.set_vertices(transform_instances(meshes, [matrix for _, matrix, _, _ in transforms],
+                                                         [position for _, _, position, _ in transforms]))
+        self._batch_transforms_key = transforms_key
+        return self._batch
+
+# Функция для выбора уровня детализации экземпляра
+# Экземпляр с масштабом scale на расстоянии d от камеры выглядит как исходная модель на расстоянии d / scale
+def _select_level(node, position, scale, camera_distance, fov):
+    if node.lod is None:
+        return node.mesh
+    distance = camera_distance - float(np.linalg.norm(position))
+    return node.lod.select(distance / max(scale, 1e-12), fov)
+
+# Функция для группировки экземпляров по моделям: [(модель, номера экземпляров)] в порядке первого появления
+def _group_instances(meshes):
+    groups = {}
+    for index, mesh in enumerate(meshes):
+        groups.setdefault(id(mesh), (mesh, []))[1].append(index)
+    return [(mesh, np.array(indices)) for mesh, indices in groups.values()]
+
+# Функция для расчёта вершин всех экземпляров (порядок - как в merge_instances)
+def transform_instances(meshes, matrices, positions):
+    matrices = np.asarray(matrices, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.float64)
+    parts = []
+    for mesh, indices in _group_instances(meshes):
+        # Все экземпляры модели преобразуются одной операцией: (n, 3, 3) x (V, 3) -> (n, V, 3)
+        vertices = np.einsum("nij,vj->nvi", matrices[indices], mesh.vertices) + positions[indices, None, :]
+        parts.append(vertices.reshape(-1, 3))
+    return np.concatenate(parts) if parts else np.zeros((0, 3))
+
+# Функция для объединения экземпляров моделей в одну модель
+# Экземпляры одной модели идут подряд, грани дополняются до общей ширины повтором последней вершины
+def merge_instances(meshes, matrices, positions):
+    groups = _group_instances(meshes)
+    corner_count = max((mesh.faces.shape[1] for mesh, _ in groups), default=3)
+    faces, face_sizes, colors, double_sided = [], [], [], []
+    offset = 0
+    for mesh, indices in groups:
+        group_faces = mesh.faces
+        if group_faces.shape[1] < corner_count:
+            padding = np.repeat(group_faces[:, -1:], corner_count - group_faces.shape[1], axis=1)
+            group_faces = np.concatenate([group_faces, padding], axis=1)
+        offsets = offset + np.arange(len(indices)) * mesh.vertex_count
+        faces.append((group_faces[None] + offsets[:, None, None]).reshape(-1, corner_count))
+        face_sizes.append(np.tile(mesh.face_sizes, len(indices)))
+        colors.append(np.tile(mesh.colors, (len(indices), 1)))
+        double_sided.append(np.tile(np.broadcast_to(mesh.double_sided, mesh.face_count), len(indices)))
+        offset += len(indices) * mesh.vertex_count
+
+    if not groups:
+        return Mesh(np.zeros((0, 3)), np.zeros((0, 3)), np.zeros(0), np.zeros((0, 3)))
+    # Двусторонность задаётся по граням: двусторонняя деталь не отключает отсечение граней остальных деталей
+    double_sided = np.concatenate(double_sided)
+    return Mesh(transform_instances(meshes, matrices, positions), np.concatenate(faces), np.concatenate(face_sizes),
+                np.concatenate(colors), double_sided if double_sided.any() else False)
+
+# Функция для построения демонстрационной сцены: куб grid_size^3 деталей из встроенных фигур
+# Детали одной фигуры - экземпляры одной модели (и одной цепочки уровней детализации)
+def make_parts_scene(grid_size=SCENE_GRID_SIZE, spacing=SCENE_GRID_SPACING, part_scale=SCENE_PART_SCALE):
+    part_names = ["cube", "sphere", "thor", "pyramid"]
+    lods = {name: get_shape_lod(name, get_shape(name)) for name in part_names}
+    # Повороты деталей случайны, но одинаковы при каждом запуске
+    random = np.random.default_rng(0)
+    scene = Scene()
+    center = (grid_size - 1) / 2
+    for index, cell in enumerate(np.ndindex(grid_size, grid_size, grid_size)):
+        matrix = rotation_matrix(*random.uniform(0, 2 * np.pi, 3)) * part_scale
+        position = (np.array(cell) - center) * spacing
+        scene.add(SceneNode(matrix=matrix, position=position, lod=lods[part_names[index % len(part_names)]]))
+    return scene
+
+# Сцены, которые можно выбрать наравне с фигурами
+SCENE_BUILDERS = {
+    "parts": make_parts_scene,
+}
+
+def get_scene_names():
+    return list(SCENE_BUILDERS)
+
+def make_scene(scene_name):
+    return SCENE_BUILDERS[scene_name]()
@@ -0,0 +1,42 @@
+import pygame
+from parameters import TARGET_FPS, IDLE_POLL_MS
+
+# Класс планировщика кадров: кадр рисуется только при изменении состояния сцены или интерфейса,
+# а в простое цикл ждёт событий вместо перерисовки одинаковых кадров
+class FrameScheduler:
+    def __init__(self, target_fps=TARGET_FPS, idle_poll_ms=IDLE_POLL_MS):
+        self.clock = pygame.time.Clock()
+        self.target_fps = target_fps
+        self.idle_poll_ms = idle_poll_ms
+        self.state = None
+        self.rendered_frames = 0
+        self.skipped_frames = 0
+
+    # Получение событий: при анимации - без ожидания, в простое - ожидание первого события
+    # Если идёт фоновая работа (загрузка модели), ожидание ограничено, чтобы обновлять её прогресс
+    def get_events(self, animating, background_work=False):
+        if animating:
+            return pygame.event.get()
+        event = pygame.event.wait(self.idle_poll_ms if background_work else 0)
+        events = pygame.event.get()
+        if event.type != pygame.NOEVENT:
+            events.insert(0, event)
+        return events
+
+    # Возвращает True, если состояние изменилось с прошлого нарисованного кадра и кадр нужно нарисовать
+    def needs_redraw(self, state):
+        if state == self.state:
+            self.skipped_frames += 1
+            return False
+        self.state = state
+        self.rendered_frames += 1
+        return True
+
+    # Принудительная перерисовка следующего кадра
+    def invalidate(self):
+        self.state = None
+
+    # Ограничение частоты кадров при анимации (в простое ожидание идёт в get_events)
+    def tick(self, animating):
+        if animating:
+            self.clock.tick(self.target_fps)
@@ -1,197 +1,252 @@
-import numpy as np
-from parameters import BLUE, RED, GREEN, YELLOW, ORANGE, LIGHT_BLUE
-import random
+from collections import OrderedDict
 
+import numpy as np
+from parameters import BLUE, RED, GREEN, YELLOW, ORANGE, LIGHT_BLUE, SHAPE_CACHE_SIZE
+from mesh import Mesh
+from lod import LodChain
+
+# Зерно для раскраски сферы: цвета перемешаны, но одинаково при каждом запуске
+SPHERE_COLOR_SEED = 0
+
+# Кэш построенных моделей: ключ - (имя фигуры, разрешение), вытесняются давно не использованные
+_shape_cache = OrderedDict()
+
+# Многогранники, заданные списками вершин и граней
+POLYHEDRA = {
+    "cube": {
+        "vertices": [
+            [-1, -1, -1],  # 0 - задний левый нижний
+            [1, -1, -1],  # 1 - задний правый нижний
+            [1, 1, -1],  # 2 - задний правый верхний
+            [-1, 1, -1],  # 3 - задний левый верхний
+            [-1, -1, 1],  # 4 - передний левый нижний
+            [1, -1, 1],  # 5 - передний правый нижний
+            [1, 1, 1],  # 6 - передний правый верхний
+            [-1, 1, 1]  # 7 - передний левый верхний
+        ],
+        "faces": [
+            [0, 3, 2, 1],  # задняя грань (против часовой стрелки)
+            [4, 5, 6, 7],  # передняя грань (против часовой стрелки)
+            [0, 1, 5, 4],  # нижняя грань (против часовой стрелки)
+            [3, 7, 6, 2],  # верхняя грань (против часовой стрелки)
+            [0, 4, 7, 3],  # левая грань (против часовой стрелки)
+            [1, 2, 6, 5]  # правая грань (против часовой стрелки)
+        ],
+        "colors": [
+            BLUE,  # задняя грань
+            RED,  # передняя грань
+            GREEN,  # нижняя грань
+            YELLOW,  # верхняя грань
+            (255, 100, 235),  # левая грань (пурпурный)
+            (0, 255, 255)  # правая грань (голубой)
+        ]
+    },
+    "pyramid": {
+        "vertices": [
+            [-1, -1, -1],  # 0 - основание левый нижний
+            [1, -1, -1],  # 1 - основание правый нижний
+            [1, 1, -1],  # 2 - основание правый верхний
+            [-1, 1, -1],  # 3 - основание левый верхний
+            [0, 0, 1]  # 4 - вершина
+        ],
+        "faces": [
+            [0, 1, 4],  # передняя грань
+            [1, 2, 4],  # правая грань
+            [2, 3, 4],  # задняя грань
+            [3, 0, 4],  # левая грань
+            [0, 3, 2, 1]  # основание (против часовой стрелки)
+        ],
+        "colors": [
+            RED,  # передняя грань
+            GREEN,  # правая грань
+            BLUE,  # задняя грань
+            YELLOW,  # левая грань
+            ORANGE  # основание
+        ]
+    },
+}
+
+# Функция для получения модели фигуры (строится при первом запросе и кэшируется)
+# resolution - параметры тесселяции генератора, None - разрешение по умолчанию
+def get_shape(shape_name, resolution=None):
+    generator, default_resolution, _ = SHAPE_GENERATORS[shape_name]
+    key = (shape_name, tuple(resolution) if resolution is not None else default_resolution)
+    if key in _shape_cache:
+        _shape_cache.move_to_end(key)
+        return _shape_cache[key]
+
+    mesh = generator(*key[1])
+    _shape_cache[key] = mesh
+    if len(_shape_cache) > SHAPE_CACHE_SIZE:
+        _shape_cache.popitem(last=False)
+    return mesh
+
+# Имена всех доступных фигур (без построения моделей)
+def get_shape_names():
+    return list(SHAPE_GENERATORS)
+
+# Функция для построения всех фигур сразу
 def get_shapes():
-    shapes = {
-        "cube": {
-            "vertices": [
-                [-1, -1, -1],  # 0 - задний левый нижний
-                [1, -1, -1],  # 1 - задний правый нижний
-                [1, 1, -1],  # 2 - задний правый верхний
-                [-1, 1, -1],  # 3 - задний левый верхний
-                [-1, -1, 1],  # 4 - передний левый нижний
-                [1, -1, 1],  # 5 - передний правый нижний
-                [1, 1, 1],  # 6 - передний правый верхний
-                [-1, 1, 1]  # 7 - передний левый верхний
-            ],
-            "faces": [
-                [0, 3, 2, 1],  # задняя грань (против часовой стрелки)
-                [4, 5, 6, 7],  # передняя грань (против часовой стрелки)
-                [0, 1, 5, 4],  # нижняя грань (против часовой стрелки)
-                [3, 7, 6, 2],  # верхняя грань (против часовой стрелки)
-                [0, 4, 7, 3],  # левая грань (против часовой стрелки)
-                [1, 2, 6, 5]  # правая грань (против часовой стрелки)
-            ],
-            "colors": [
-                BLUE,  # задняя грань
-                RED,  # передняя грань
-                GREEN,  # нижняя грань
-                YELLOW,  # верхняя грань
-                (255, 100, 235),  # левая грань (пурпурный)
-                (0, 255, 255)  # правая грань (голубой)
-            ]
-        },
-        "pyramid": {
-            "vertices": [
-                [-1, -1, -1],  # 0 - основание левый нижний
-                [1, -1, -1],  # 1 - основание правый нижний
-                [1, 1, -1],  # 2 - основание правый верхний
-                [-1, 1, -1],  # 3 - основание левый верхний
-                [0, 0, 1]  # 4 - вершина
-            ],
-            "faces": [
-                [0, 1, 4],  # передняя грань
-                [1, 2, 4],  # правая грань
-                [2, 3, 4],  # задняя грань
-                [3, 0, 4],  # левая грань
-                [0, 3, 2, 1]  # основание (против часовой стрелки)
-            ],
-            "colors": [
-                RED,  # передняя грань
-                GREEN,  # правая грань
-                BLUE,  # задняя грань
-                YELLOW,  # левая грань
-                ORANGE  # основание
-            ]
-        },
-        "sphere": {
-            "vertices": [],
-            "faces": [],
-            "colors": []
-        },
-        "thor": {
-            "vertices": [],
-            "faces": [],
-            "colors": []
-        },
-        "mobius_strip": {
-            "vertices": [],
-            "faces": [],
-            "colors": []
-        }
-    }
-
-    # Параметризация сферы
+    return {name: get_shape(name) for name in SHAPE_GENERATORS}
+
+# Функция для построения цепочки уровней детализации фигуры
+# Параметрические фигуры на грубых уровнях генерируются заново с меньшим разрешением
+def get_shape_lod(shape_name, mesh):
+    if shape_name in SHAPE_GENERATORS:
+        _, resolution, min_resolution = SHAPE_GENERATORS[shape_name]
+        if resolution:
+            return LodChain.from_generator(lambda *level: get_shape(shape_name, level), resolution, min_resolution, mesh)
+    return LodChain([mesh])
+
+# Функция для построения многогранника из таблицы POLYHEDRA
+def make_polyhedron(name):
+    shape = POLYHEDRA[name]
+    return Mesh.from_lists(shape["vertices"], shape["faces"], shape["colors"])
+
+# Функция для сборки вершин сетки в массив (N, 3); координаты задаются массивами, совместимыми по broadcasting
+def _grid_vertices(x, y, z):
+    shape = np.broadcast_shapes(np.shape(x), np.shape(y), np.shape(z))
+    vertices = np.empty(shape + (3,), dtype=np.float32)
+    vertices[..., 0] = x
+    vertices[..., 1] = y
+    vertices[..., 2] = z
+    return vertices.reshape(-1, 3)
+
+# Функция для построения граней сетки четырёхугольников между строкой i и строкой next_i (из rows и next_rows)
+# Вершина (i, j) имеет номер i * row_length + j, последний столбец замыкается на первый
+def _grid_quads(rows, next_rows, row_length):
+    j = np.arange(row_length, dtype=np.int32)
+    next_j = (j + 1) % row_length
+    row_start = np.asarray(rows, dtype=np.int32)[:, None] * row_length
+    next_row_start = np.asarray(next_rows, dtype=np.int32)[:, None] * row_length
+
+    quads = np.empty((len(row_start), row_length, 4), dtype=np.int32)
+    quads[:, :, 0] = row_start + j
+    quads[:, :, 1] = row_start + next_j
+    quads[:, :, 2] = next_row_start + next_j
+    quads[:, :, 3] = next_row_start + j
+    return quads.reshape(-1, 4)
+
+# Функция для генерации сферы: num_theta точек по долготе, num_phi - по широте (включая полюса)
+def make_sphere(num_theta=15, num_phi=9):
     r_sphere = 1.0
-    num_theta = 15
-    num_phi = 9
 
     theta = np.linspace(0, 2 * np.pi, num_theta, endpoint=False)
-    phi = np.linspace(0, np.pi, num_phi)
-    phi_grid, theta_grid = np.meshgrid(phi, theta, indexing="ij")
+    phi = np.linspace(0, np.pi, num_phi)[:, None]
 
-    x = r_sphere * np.sin(phi_grid) * np.cos(theta_grid)
-    y = r_sphere * np.sin(phi_grid) * np.sin(theta_grid)
-    z = r_sphere * np.cos(phi_grid)
+    # Синусы и косинусы считаются по осям сетки, а не по каждой её точке
+    ring_radius = r_sphere * np.sin(phi)
+    x = ring_radius * np.cos(theta)
+    y = ring_radius * np.sin(theta)
+    z = r_sphere * np.cos(phi)
 
-    # Собираем вершины в список списков
-    vertices = np.stack([x, y, z], axis=-1).reshape(-1, 3)
-    shapes["sphere"]["vertices"] = vertices.tolist()
+    # Собираем вершины в один массив
+    vertices = _grid_vertices(x, y, z)
 
-    faces = []
-
-    # Северный полюс
-    for j in range(num_theta):
-        pole = 0
-        v1 = 1 * num_theta + j
-        v2 = 1 * num_theta + (j + 1) % num_theta
-        faces.append([pole, v2, v1])
+    j = np.arange(num_theta, dtype=np.int32)
+    next_j = (j + 1) % num_theta
 
     # Основная часть
-    for i in range(1, num_phi - 2):
-        for j in range(num_theta):
-            a = i * num_theta + j
-            b = i * num_theta + (j + 1) % num_theta
-            c = (i + 1) * num_theta + (j + 1) % num_theta
-            d = (i + 1) * num_theta + j
-            faces.append([a, b, c, d])
+    rows = np.arange(1, num_phi - 2)
+    middle = _grid_quads(rows, rows + 1, num_theta)
+
+    # Полюса - треугольники, дополненные до четырёх вершин повтором последней
+    faces = np.empty((len(middle) + 2 * num_theta, 4), dtype=np.int32)
+    face_sizes = np.full(len(faces), 4, dtype=np.int32)
+    faces[num_theta:-num_theta] = middle
+    face_sizes[:num_theta] = 3
+    face_sizes[-num_theta:] = 3
+
+    # Северный полюс
+    north = faces[:num_theta]
+    north[:, 0] = 0
+    north[:, 1] = num_theta + next_j
+    north[:, 2] = north[:, 3] = num_theta + j
 
     # Южный полюс
     south_pole = (num_phi - 1) * num_theta
-    for j in range(num_theta):
-        v1 = (num_phi - 2) * num_theta + j
-        v2 = (num_phi - 2) * num_theta + (j + 1) % num_theta
-        faces.append([v2, south_pole, v1])
-
-    shapes["sphere"]["faces"] = faces
+    last_row = (num_phi - 2) * num_theta
+    south = faces[-num_theta:]
+    south[:, 0] = last_row + next_j
+    south[:, 1] = south_pole
+    south[:, 2] = south[:, 3] = last_row + j
 
+    # 70% граней голубые, остальные зелёные, в перемешанном (но воспроизводимом) порядке
     col_blue = int(len(faces) * 0.7)
-    col_green = len(faces) - col_blue
-
-    colors_sphere = [LIGHT_BLUE] * col_blue + [GREEN] * col_green
-    random.shuffle(colors_sphere)
-    shapes["sphere"]["colors"] = colors_sphere
-
-
-    # Параметризация Тора
+    keys = np.random.default_rng(SPHERE_COLOR_SEED).random(len(faces))
+    colors_sphere = np.empty((len(faces), 3), dtype=np.uint8)
+    colors_sphere[:] = GREEN
+    colors_sphere[np.argpartition(keys, col_blue)[:col_blue]] = LIGHT_BLUE
+    return Mesh(vertices, faces, face_sizes, colors_sphere)
+
+# Функция для генерации тора: num_theta_tor точек вдоль большой окружности, num_phi_tor - вдоль малой
+def make_thor(num_theta_tor=20, num_phi_tor=10):
     R_thor = 1.2
     r_thor = 0.6
-    num_theta_tor = 20
-    num_phi_tor = 10
 
     theta = np.linspace(0, 2 * np.pi, num_theta_tor, endpoint=False)
-    phi = np.linspace(0, 2 * np.pi, num_phi_tor, endpoint=False)
-    phi_grid_t, theta_grid_t = np.meshgrid(phi, theta, indexing="ij")
-
-    x_t = (R_thor + r_thor * np.cos(phi_grid_t)) * np.cos(theta_grid_t)
-    y_t = (R_thor + r_thor * np.cos(phi_grid_t)) * np.sin(theta_grid_t)
-    z_t = r_thor * np.sin(phi_grid_t)
+    phi = np.linspace(0, 2 * np.pi, num_phi_tor, endpoint=False)[:, None]
 
-    vertices_thor = np.stack([x_t, y_t, z_t], axis=-1).reshape(-1, 3)
-    shapes["thor"]["vertices"] = vertices_thor.tolist()
+    ring_radius = R_thor + r_thor * np.cos(phi)
+    x_t = ring_radius * np.cos(theta)
+    y_t = ring_radius * np.sin(theta)
+    z_t = r_thor * np.sin(phi)
 
-    faces_thor = []
-    for i in range(num_phi_tor):
-        for j in range(num_theta_tor):
-            a = i * num_theta_tor + j
-            b = i * num_theta_tor + (j + 1) % num_theta_tor
-            c = ((i + 1) % num_phi_tor) * num_theta_tor + (j + 1) % num_theta_tor
-            d = ((i + 1) % num_phi_tor) * num_theta_tor + j
-            faces_thor.append([a, b, c, d])
+    vertices_thor = _grid_vertices(x_t, y_t, z_t)
 
-    shapes["thor"]["faces"] = faces_thor
-    shapes["thor"]["colors"] = [ORANGE] * len(faces_thor)
+    rows = np.arange(num_phi_tor)
+    faces_thor = _grid_quads(rows, (rows + 1) % num_phi_tor, num_theta_tor)
+    return Mesh(vertices_thor, faces_thor, np.full(len(faces_thor), 4, dtype=np.int32),
+                np.full((len(faces_thor), 3), ORANGE, dtype=np.uint8))
 
-    # Параметризация ленты Мёбиуса
+# Функция для генерации ленты Мёбиуса: num_u точек по длине ленты, num_v - по ширине
+def make_mobius_strip(num_u=30, num_v=10):
     R_mobius = 1.5  # Радиус ленты
     w_mobius = 0.6  # Половина ширины ленты
-    num_u = 30  # Количество точек по длине ленты
-    num_v = 10  # Количество точек по ширине ленты
 
     # Параметры u и v
-    u = np.linspace(0, 2 * np.pi, num_u, endpoint=False)
+    # u меняется вдоль строк сетки, v - вдоль столбцов
+    u = np.linspace(0, 2 * np.pi, num_u, endpoint=False)[:, None]
     v = np.linspace(-w_mobius, w_mobius, num_v)
 
-    # Создание сетки параметров
-    u_grid, v_grid = np.meshgrid(u, v, indexing="ij")
-
     # Вычисление координат по параметрическому уравнению
-    cos_u_half = np.cos(u_grid / 2)
-    sin_u_half = np.sin(u_grid / 2)
-    cos_u = np.cos(u_grid)
-    sin_u = np.sin(u_grid)
+    cos_u_half = np.cos(u / 2)
+    sin_u_half = np.sin(u / 2)
+    cos_u = np.cos(u)
+    sin_u = np.sin(u)
 
-    x_m = (R_mobius + (v_grid / 2) * cos_u_half) * cos_u
-    y_m = (R_mobius + (v_grid / 2) * cos_u_half) * sin_u
-    z_m = (v_grid / 2) * sin_u_half
+    ring_radius = R_mobius + (v / 2) * cos_u_half
+    x_m = ring_radius * cos_u
+    y_m = ring_radius * sin_u
+    z_m = (v / 2) * sin_u_half
 
     # Собираем вершины
-    vertices_mobius = np.stack([x_m, y_m, z_m], axis=-1).reshape(-1, 3)
-    shapes["mobius_strip"]["vertices"] = vertices_mobius.tolist()
-
-    # Генерация граней
-    faces_mobius = []
-    for i in range(num_v - 1):
-        for j in range(num_u):
-            a = i * num_u + j
-            b = i * num_u + (j + 1) % num_u
-            c = (i + 1) * num_u + (j + 1) % num_u
-            d = (i + 1) * num_u + j
-            faces_mobius.append([a, b, c, d])
-    shapes["mobius_strip"]["faces"] = faces_mobius
-
-    # Цвета для ленты Мёбиуса
-    shapes["mobius_strip"]["colors"] = [YELLOW] * len(faces_mobius)
-
-    return shapes
\ No newline at end of file
+    vertices_mobius = _grid_vertices(x_m, y_m, z_m)
+
+    # Генерация граней: вершина (i, j) - i-я точка вдоль ленты и j-я поперёк, её номер i * num_v + j
+    # Четырёхугольники соединяют соседние точки вдоль и поперёк ленты; после полного оборота лента
+    # перевёрнута (v меняет знак), поэтому последняя полоса замыкается на первую в обратном порядке по v
+    i = np.arange(num_u, dtype=np.int32)[:, None]
+    j = np.arange(num_v - 1, dtype=np.int32)[None, :]
+    next_i = (i + 1) % num_u
+    seam = next_i == 0
+    faces_mobius = np.empty((num_u, num_v - 1, 4), dtype=np.int32)
+    faces_mobius[:, :, 0] = i * num_v + j
+    faces_mobius[:, :, 1] = i * num_v + j + 1
+    faces_mobius[:, :, 2] = next_i * num_v + np.where(seam, num_v - 2 - j, j + 1)
+    faces_mobius[:, :, 3] = next_i * num_v + np.where(seam, num_v - 1 - j, j)
+    faces_mobius = faces_mobius.reshape(-1, 4)
+
+    # Цвета для ленты Мёбиуса; лента односторонняя, поэтому её грани видны с обеих сторон
+    return Mesh(vertices_mobius, faces_mobius, np.full(len(faces_mobius), 4, dtype=np.int32),
+                np.full((len(faces_mobius), 3), YELLOW, dtype=np.uint8), double_sided=True)
+
+# Реестр фигур: генератор, разрешение по умолчанию и минимальное разрешение для грубых уровней
+# Модели строятся только при первом запросе через get_shape
+SHAPE_GENERATORS = {
+    "cube": (lambda: make_polyhedron("cube"), (), ()),
+    "pyramid": (lambda: make_polyhedron("pyramid"), (), ()),
+    "sphere": (make_sphere, (15, 9), (6, 4)),
+    "thor": (make_thor, (20, 10), (6, 4)),
+    "mobius_strip": (make_mobius_strip, (30, 10), (8, 2)),
+}
\ No newline at end of file
@@ -0,0 +1,43 @@
+import os
+import sys
+
+# Отрисовка без окна: pygame рисует в поверхность фиктивного видеодрайвера
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+# Модули движка лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+import pytest
+
+import graphics
+from parameters import FOV_DEFAULT, WHITE
+
+TEST_SCREEN_SIZE = (400, 300)
+TEST_LIGHT_DIRECTION = np.array([0.3, -0.5, -1.0])
+
+
+@pytest.fixture
+def screen():
+    pygame.init()
+    yield pygame.display.set_mode(TEST_SCREEN_SIZE)
+    pygame.quit()
+
+
+# Функция для отрисовки модели в режиме render_mode и получения пикселей экрана (W, H, 3)
+def render_pixels(screen, mesh, rotation, camera_distance, render_mode, back_face_culling=False, fov=FOV_DEFAULT):
+    screen.fill((0, 0, 0))
+    graphics.render_scene(screen, mesh, rotation, camera_distance, fov, 0.3, TEST_LIGHT_DIRECTION,
+                          back_face_culling, render_mode)
+    return pygame.surfarray.array3d(screen)
+
+
+# Функция для доли залитых пикселей, в которых алгоритм художника разошёлся с Z-буфером
+# Контуры граней (белые) есть только у алгоритма художника, поэтому они не сравниваются
+def painter_mismatch(screen, mesh, rotation, camera_distance, back_face_culling=False):
+    painter = render_pixels(screen, mesh, rotation, camera_distance, "painter", back_face_culling)
+    zbuffer = render_pixels(screen, mesh, rotation, camera_distance, "zbuffer", back_face_culling)
+    filled = zbuffer.any(axis=2) & ~(painter == WHITE).all(axis=2)
+    assert filled.sum() > 0
+    return ((painter != zbuffer).any(axis=2) & filled).sum() / filled.sum()
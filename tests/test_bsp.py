@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from conftest import painter_mismatch
+from math_utils import rotation_matrix
+from shapes import get_shape
+from test_graphics import PAINTER_MISMATCH_MAX
+
+BSP_SHAPES = ["cube", "pyramid", "sphere", "thor", "mobius_strip"]
+ROTATIONS = [(0.4, 0.7, 0.1), (2.0, -0.3, 1.2), (-1.1, 2.6, 0.4), (0.0, np.pi / 2, 0.0)]
+
+
+# Площади граней (F,) по формуле Ньюэлла (грани плоские, дополняющие вершины ничего не добавляют)
+def face_areas(mesh):
+    corners = mesh.vertices[mesh.faces].astype(np.float64)
+    return np.linalg.norm(np.cross(corners, np.roll(corners, -1, axis=1)).sum(axis=1), axis=1) / 2
+
+
+# Части граней покрывают исходные грани целиком: каждая грань представлена, площади частей в сумме равны площади грани
+# (четырёхугольники ленты Мёбиуса неплоские, для них площадь по формуле Ньюэлла не складывается из частей)
+@pytest.mark.parametrize("shape", [shape for shape in BSP_SHAPES if shape != "mobius_strip"])
+def test_bsp_fragments_cover_faces(shape):
+    mesh = get_shape(shape)
+    bsp = mesh.bsp
+    assert np.array_equal(np.unique(bsp.source_faces), np.arange(mesh.face_count))
+    fragment_areas = np.bincount(bsp.source_faces, face_areas(bsp.mesh), minlength=mesh.face_count)
+    assert np.allclose(fragment_areas, face_areas(mesh), rtol=1e-4, atol=1e-6)
+
+
+# Порядок обхода - перестановка частей, а для набора face_ids - перестановка номеров набора
+def test_bsp_order_is_permutation():
+    bsp = get_shape("thor").bsp
+    fragment_count = bsp.mesh.face_count
+    eye = np.array([0.3, -4.0, 2.0])
+    assert np.array_equal(np.sort(bsp.order(eye)), np.arange(fragment_count))
+    face_ids = np.arange(0, fragment_count, 3)
+    assert np.array_equal(np.sort(bsp.order(eye, face_ids)), np.arange(len(face_ids)))
+
+
+# Обход дерева BSP рисует невыпуклые модели (тор, лента Мёбиуса) так же, как Z-буфер, с любой стороны
+@pytest.mark.parametrize("shape", BSP_SHAPES)
+def test_bsp_painter_matches_zbuffer(screen, shape):
+    mesh = get_shape(shape)
+    assert mesh.bsp is not None
+    for angles in ROTATIONS:
+        assert painter_mismatch(screen, mesh, rotation_matrix(*angles), 3.0) < PAINTER_MISMATCH_MAX
@@ -0,0 +1,90 @@
+import numpy as np
+
+import graphics
+from conftest import painter_mismatch
+from math_utils import rotation_matrix, painter_order, calculate_face_depths, coherent_painter_order
+from mesh import Mesh
+from parameters import BSP_MAX_FACES
+from shapes import get_shape
+
+# Доля несовпадающих пикселей: расхождения с Z-буфером допустимы только на рёбрах и у пересекающихся граней,
+# обратный порядок отрисовки (ближние грани под дальними) расходится почти во всех пикселях
+PAINTER_MISMATCH_MAX = 0.1
+
+
+def test_painter_order_far_to_near():
+    depths = np.array([1.0, 5.0, 3.0, 5.0])
+    assert painter_order(depths).tolist() == [1, 3, 2, 0]
+
+
+# Модель больше BSP_MAX_FACES рисуется сортировкой граней по глубине, а не обходом дерева BSP
+def test_painter_sort_matches_zbuffer(screen):
+    mesh = get_shape("thor", (60, 40))
+    assert mesh.face_count > BSP_MAX_FACES and mesh.bsp is None
+    for angles in [(0.4, 0.7, 0.1), (2.0, -0.3, 1.2)]:
+        assert painter_mismatch(screen, mesh, rotation_matrix(*angles), 3.0) < PAINTER_MISMATCH_MAX
+
+
+# Глубины граней набора face_ids (все грани, если None) при повороте rotation
+def face_depths(mesh, rotation, face_ids=None):
+    faces = mesh.faces if face_ids is None else mesh.faces[face_ids]
+    sizes = mesh.face_sizes if face_ids is None else mesh.face_sizes[face_ids]
+    return 5.0 + calculate_face_depths(mesh.vertices @ rotation.T, faces, sizes)
+
+
+# Порядок от дальних граней к ближним с точностью до шага квантования глубин в 16 бит
+def assert_far_to_near(depths, draw_order):
+    assert np.array_equal(np.sort(draw_order), np.arange(len(depths)))
+    step = (depths.max() - depths.min()) / np.iinfo(np.uint16).max
+    assert (np.diff(depths[draw_order]) <= step).all()
+
+
+# Спай за уточнением порядка прошлого кадра: проверяется, что кадры после первого не сортируются заново
+def spy_coherent_sort(monkeypatch):
+    calls = []
+
+    def spy(face_depths, previous_order):
+        calls.append(len(previous_order))
+        return coherent_painter_order(face_depths, previous_order)
+
+    monkeypatch.setattr(graphics, "coherent_painter_order", spy)
+    monkeypatch.setattr(graphics, "_previous_sort", None)
+    return calls
+
+
+def test_coherent_sort_far_to_near(monkeypatch):
+    calls = spy_coherent_sort(monkeypatch)
+    mesh = get_shape("thor", (60, 40))
+    for frame in range(20):
+        rotation = rotation_matrix(0.3 + 0.02 * frame, 0.5 + 0.03 * frame, 0.0)
+        depths = face_depths(mesh, rotation)
+        assert_far_to_near(depths, graphics.sort_faces(mesh, None, depths, rotation))
+    assert len(calls) == 19
+
+
+# Набор граней меняется между кадрами (отсечение пирамидой видимости): грани, пропавшие из набора,
+# отбрасываются из порядка прошлого кадра, а новые добавляются к нему перед уточнением
+def test_coherent_sort_merges_new_faces(monkeypatch):
+    calls = spy_coherent_sort(monkeypatch)
+    mesh = get_shape("thor", (60, 40))
+    random = np.random.default_rng(0)
+    for frame in range(10):
+        rotation = rotation_matrix(0.3 + 0.02 * frame, 0.5, 0.1)
+        face_ids = np.sort(random.choice(mesh.face_count, mesh.face_count // 2, replace=False))
+        depths = face_depths(mesh, rotation, face_ids)
+        assert_far_to_near(depths, graphics.sort_faces(mesh, face_ids, depths, rotation))
+    assert calls == [mesh.face_count // 2] * 9
+
+
+# Грань нулевой площади (все вершины на одной прямой) не заливается, остальные грани заливаются
+def test_fillable_faces_skip_zero_area():
+    vertices = [(0, 0, 0), (1, 0, 0), (2, 0, 0), (0, 1, 0), (1, 1, 0)]
+    mesh = Mesh.from_lists(vertices, [(0, 1, 2), (0, 1, 4, 3), (0, 2, 4)], [(255, 0, 0)] * 3)
+    assert mesh.fillable_faces.tolist() == [False, True, True]
+
+
+def test_skipped_faces_reported_once(monkeypatch, capsys):
+    monkeypatch.setattr(graphics, "_skipped_faces_reported", False)
+    graphics.report_skipped_faces(3)
+    graphics.report_skipped_faces(5)
+    assert capsys.readouterr().out.count("Предупреждение") == 1
@@ -0,0 +1,21 @@
+import numpy as np
+
+from math_utils import bresenham_algorithm, bresenham_lines
+
+
+# Векторизованный алгоритм Брезенхэма даёт те же точки в том же порядке, что и построчный для каждого отрезка
+def test_bresenham_lines_matches_scalar():
+    random = np.random.default_rng(0)
+    segments = random.integers(-40, 40, size=(500, 4))
+    # Вырожденные, горизонтальные, вертикальные и диагональные отрезки во всех направлениях
+    segments[:8] = [(3, 3, 3, 3), (0, 0, 9, 0), (9, 0, 0, 0), (0, 0, 0, -9),
+                    (0, 0, 7, 7), (7, 7, 0, 0), (0, 0, -7, 7), (-5, 2, 5, -1)]
+    xs, ys, line_ids = bresenham_lines(*segments.T)
+    for line, (x0, y0, x1, y1) in enumerate(segments.tolist()):
+        points = np.column_stack([xs[line_ids == line], ys[line_ids == line]])
+        assert points.tolist() == bresenham_algorithm(x0, y0, x1, y1)
+
+
+def test_bresenham_lines_empty():
+    xs, ys, line_ids = bresenham_lines([], [], [], [])
+    assert len(xs) == len(ys) == len(line_ids) == 0
@@ -0,0 +1,99 @@
+import numpy as np
+
+from obj_loader import parse_obj_data, stream_obj_file
+
+
+# Построчный разбор .obj файла через split() (как в исходном загрузчике): эталон для векторизованного парсера
+# Отрицательные индексы отсчитываются от последней вершины, заданной до строки грани
+def reference_parse(text):
+    vertices, faces = [], []
+    for line in text.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == "v":
+            vertices.append([float(value) for value in parts[1:4]])
+        elif parts[0] == "f":
+            face = [int(part.split("/")[0]) for part in parts[1:]]
+            face = [index - 1 if index > 0 else len(vertices) + index for index in face]
+            if len(face) >= 3:
+                faces.append(face)
+    return vertices, faces
+
+
+# Результат парсера в виде списков: грани обрезаются до своих длин
+def parsed_lists(parsed):
+    vertices, faces, face_sizes = parsed
+    return vertices.tolist(), [face[:size] for face, size in zip(faces.tolist(), face_sizes.tolist())]
+
+
+# Случайный .obj файл: вершины, грани из 3-5 вершин с положительными, отрицательными и составными (v/vt/vn)
+# индексами, комментарии, строки текстурных координат и нормалей, отступы и пустые строки
+def random_obj_text(random, line_count=400):
+    lines, vertex_count = [], 0
+    for _ in range(line_count):
+        kind = random.choice(["v", "v", "f", "f", "vt", "vn", "#", ""])
+        indent = random.choice(["", "", " ", "\t", "  \t"])
+        if kind == "v" or (kind == "f" and vertex_count < 3):
+            lines.append(indent + "v " + " ".join(f"{value:.4f}" for value in random.uniform(-10, 10, 3)))
+            vertex_count += 1
+        elif kind == "f":
+            indices = random.integers(0, vertex_count, size=random.integers(3, 6))
+            records = []
+            for index in indices.tolist():
+                record = str(index + 1) if random.random() < 0.5 else str(index - vertex_count)
+                records.append(record + random.choice(["", "/1", "/1/2", "//3"]))
+            lines.append(indent + "f " + " ".join(records))
+        elif kind in ("vt", "vn"):
+            lines.append(f"{indent}{kind} 0.5 0.25 1")
+        elif kind == "#":
+            lines.append(indent + "# v 1 2 3")
+        else:
+            lines.append(indent)
+    return "\n".join(lines) + "\n"
+
+
+def assert_matches_reference(text):
+    vertices, faces = parsed_lists(parse_obj_data(text.encode()))
+    reference_vertices, reference_faces = reference_parse(text)
+    assert np.allclose(vertices, reference_vertices)
+    assert faces == reference_faces
+
+
+# Строки с отступом (пробелы и табуляции) разбираются как обычные: пропуск строки "v" сдвинул бы индексы вершин
+def test_indented_lines():
+    text = "  v 0 0 0\n\tv 1 0 0\n \t v 0 1 0\nv 1 1 0\n   \n\t\n  f 1 2 3\n\t f 1 2 4\n  # v 9 9 9\n vt 0 0\n   f 2 4 3"
+    assert_matches_reference(text)
+    assert parsed_lists(parse_obj_data(text.encode()))[1] == [[0, 1, 2], [0, 1, 3], [1, 3, 2]]
+
+
+# Отрицательные индексы - от последней вершины, заданной до строки грани, а не от конца файла
+def test_negative_indices():
+    text = "v 0 0 0\nv 1 0 0\nv 0 1 0\nf -3 -2 -1\nv 0 0 1\nv 1 0 1\nv 0 1 1\nf -3 -2 -1\nf 1 -5 3/1/1 -3//2\n"
+    assert_matches_reference(text)
+    assert parsed_lists(parse_obj_data(text.encode()))[1] == [[0, 1, 2], [3, 4, 5], [0, 1, 2, 3]]
+
+
+def test_crlf_and_texture_indices():
+    assert_matches_reference("v 0 0 0\r\n  v 1 0 0\r\n\tv 0 1 0\r\nvn 0 0 1\r\n f 1/1/1 2/2/1 3/3/1\r\n")
+
+
+def test_random_files_match_reference():
+    random = np.random.default_rng(0)
+    for _ in range(20):
+        assert_matches_reference(random_obj_text(random))
+
+
+# Потоковая загрузка маленькими блоками: строки разрезаются между блоками, отрицательные индексы
+# отсчитываются с учётом вершин предыдущих блоков
+def test_streamed_blocks_match_reference(tmp_path):
+    random = np.random.default_rng(1)
+    text = random_obj_text(random, 2000)
+    path = tmp_path / "model.obj"
+    path.write_text(text)
+    reference_vertices, reference_faces = reference_parse(text)
+    for block_size in (64, 1000, 1 << 20):
+        vertices, faces, face_sizes, load_stats = stream_obj_file(str(path), block_size=block_size)
+        assert np.allclose(vertices, reference_vertices)
+        assert parsed_lists((vertices, faces, face_sizes))[1] == reference_faces
+        assert load_stats["file_size"] == len(text)
@@ -0,0 +1,36 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import parallel
+from conftest import render_pixels
+from math_utils import rotation_matrix
+from parameters import PARALLEL_WORKERS
+from shapes import get_shape
+
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                                reason="параллельная отрисовка работает только через fork")
+
+
+# Число процессов отрисовки для любой модели (порог PARALLEL_MIN_FACES снят, 1 - без пула); после теста пул закрывается
+@pytest.fixture
+def parallel_workers(monkeypatch):
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_FACES", 0)
+    yield parallel.set_parallel_workers
+    parallel.set_parallel_workers(PARALLEL_WORKERS)
+    parallel.shutdown_parallel()
+
+
+# Полосы экрана, нарисованные в нескольких процессах, дают тот же кадр, что и отрисовка в одном процессе
+@pytest.mark.parametrize("render_mode", ["painter", "zbuffer", "smooth"])
+def test_parallel_matches_single_process(screen, parallel_workers, render_mode):
+    mesh = get_shape("thor", (60, 40))
+    for angles, camera_distance in [((0.4, 0.7, 0.1), 3.0), ((2.0, -0.3, 1.2), 1.5)]:
+        rotation = rotation_matrix(*angles)
+        parallel_workers(1)
+        assert not parallel.is_parallel_enabled(mesh.face_count)
+        single = render_pixels(screen, mesh, rotation, camera_distance, render_mode).copy()
+        parallel_workers(3)
+        assert parallel.is_parallel_enabled(mesh.face_count)
+        assert np.array_equal(render_pixels(screen, mesh, rotation, camera_distance, render_mode), single)
@@ -0,0 +1,37 @@
+import numpy as np
+
+import graphics
+from conftest import painter_mismatch, TEST_LIGHT_DIRECTION
+from math_utils import rotation_matrix
+from parameters import FOV_DEFAULT, BSP_MAX_FACES
+from scene import make_scene, merge_instances
+from shapes import get_shape
+from test_graphics import PAINTER_MISMATCH_MAX
+
+
+# Объединённая сцена деталей больше BSP_MAX_FACES: алгоритм художника сортирует её грани по глубине
+def test_parts_scene_painter_matches_zbuffer(screen):
+    camera_distance = 5.0
+    mesh = make_scene("parts").batch(camera_distance, FOV_DEFAULT)
+    assert mesh.face_count > BSP_MAX_FACES
+    for angles in [(0.4, 0.7, 0.1), (2.0, -0.3, 1.2)]:
+        rotation = rotation_matrix(*angles)
+        assert painter_mismatch(screen, mesh, rotation, camera_distance, back_face_culling=True) < PAINTER_MISMATCH_MAX
+
+
+# Двусторонняя деталь не отключает отсечение нелицевых граней остальных деталей объединённой модели
+def test_merge_keeps_per_face_double_sided():
+    mobius, cube = get_shape("mobius_strip"), get_shape("cube")
+    merged = merge_instances([mobius, cube, cube], [np.eye(3)] * 3, [(-1.5, 0, 0), (1.5, 0, 0), (0, 1.5, 0)])
+    assert merged.double_sided.tolist() == [True] * mobius.face_count + [False] * (2 * cube.face_count)
+    assert merge_instances([cube, cube], [np.eye(3)] * 2, [(0, 0, 0), (3, 0, 0)]).double_sided is False
+
+
+def test_merged_culling_per_face(screen):
+    mobius, cube = get_shape("mobius_strip"), get_shape("cube")
+    merged = merge_instances([mobius, cube], [np.eye(3)] * 2, [(-1.5, 0, 0), (1.5, 0, 0)])
+    for render_mode in ("painter", "zbuffer"):
+        counts = [graphics.render_scene(screen, merged, np.eye(3), 8.0, FOV_DEFAULT, 0.3, TEST_LIGHT_DIRECTION,
+                                        back_face_culling, render_mode) for back_face_culling in (False, True)]
+        # Все грани ленты Мёбиуса остаются, у куба - только две грани, повёрнутые к камере
+        assert counts == [mobius.face_count + cube.face_count, mobius.face_count + 2]
@@ -1,6 +1,31 @@
 import pygame
 from parameters import *
 
+# Максимальное число отрисованных строк в кэше текста
+TEXT_CACHE_SIZE = 256
+
+# Шрифты создаются один раз для каждого размера: SysFont при каждом вызове ищет файл шрифта в системе
+_fonts = {}
+# Кэш отрисованных строк (ключ - шрифт, текст и цвет)
+_text_surfaces = {}
+
+# Функция для получения шрифта из кэша
+def get_font(size=24, name="Arial"):
+    key = (name, size)
+    if key not in _fonts:
+        _fonts[key] = pygame.font.SysFont(name, size)
+    return _fonts[key]
+
+# Функция для отрисовки строки текста с кэшированием результата
+def render_text(text, color=WHITE, size=24, name="Arial"):
+    key = (name, size, text, tuple(color))
+    text_surf = _text_surfaces.get(key)
+    if text_surf is None:
+        if len(_text_surfaces) >= TEXT_CACHE_SIZE:
+            _text_surfaces.clear()
+        text_surf = _text_surfaces[key] = get_font(size, name).render(text, True, color)
+    return text_surf
+
 # Класс для кнопок
 class Button:
     def __init__(self, x, y, width, height, text, color, active_color, text_color=WHITE):
@@ -11,19 +36,24 @@ class Button:
         self.text_color = text_color
         self.is_active = False
 
-    def draw(self, surface):
+    # offset - сдвиг, с которым кнопка рисуется на промежуточную поверхность
+    def draw(self, surface, offset=(0, 0)):
+        rect = self.rect.move(offset)
         color = self.active_color if self.is_active else self.color
-        pygame.draw.rect(surface, color, self.rect)
-        pygame.draw.rect(surface, WHITE, self.rect, 2)
+        pygame.draw.rect(surface, color, rect)
+        pygame.draw.rect(surface, WHITE, rect, 2)
 
-        font = pygame.font.SysFont('Arial', 24)
-        text_surf = font.render(self.text, True, self.text_color)
-        text_rect = text_surf.get_rect(center=self.rect.center)
+        text_surf = render_text(self.text, self.text_color)
+        text_rect = text_surf.get_rect(center=rect.center)
         surface.blit(text_surf, text_rect)
 
     def check_click(self, pos):
         return self.rect.collidepoint(pos)
 
+    # Состояние, от которого зависит внешний вид кнопки
+    def get_state(self):
+        return self.is_active
+
 
 # Класс для ползунка
 class Slider:
@@ -38,12 +68,13 @@ class Slider:
         self.handle_height = height
         self.dragging = False
 
-    def draw(self, surface):
-        pygame.draw.rect(surface, self.color, self.rect)
+    def draw(self, surface, offset=(0, 0)):
+        rect = self.rect.move(offset)
+        pygame.draw.rect(surface, self.color, rect)
         # Рассчитываем позицию ползунка
-        handle_x = self.rect.x + (self.value - self.min_val) / (self.max_val - self.min_val) * (
-                self.rect.width - self.handle_width)
-        handle_rect = pygame.Rect(handle_x, self.rect.y, self.handle_width, self.handle_height)
+        handle_x = rect.x + (self.value - self.min_val) / (self.max_val - self.min_val) * (
+                rect.width - self.handle_width)
+        handle_rect = pygame.Rect(handle_x, rect.y, self.handle_width, self.handle_height)
         pygame.draw.rect(surface, self.handle_color, handle_rect)
 
     def handle_event(self, event):
@@ -62,6 +93,113 @@ class Slider:
     def get_value(self):
         return self.value
 
+    def get_state(self):
+        return self.value
+
+# Класс надписи интерфейса, которая перерисовывается только при изменении текста
+class HudLabel:
+    def __init__(self, x, y, color=WHITE, size=24):
+        self.pos = (x, y)
+        self.color = color
+        self.size = size
+        self.text = None
+        self.surface = None
+        self.rect = pygame.Rect(x, y, 0, 0)
+
+    # Возвращает True, если текст изменился и надпись была отрисована заново
+    def set_text(self, text):
+        if text == self.text:
+            return False
+        self.text = text
+        self.surface = get_font(self.size).render(text, True, self.color)
+        self.rect = self.surface.get_rect(topleft=self.pos)
+        return True
+
+    def draw(self, surface):
+        if self.surface is not None:
+            surface.blit(self.surface, self.pos)
+
+# Класс слоя статичных элементов (кнопки, ползунки), заранее собранных в одну поверхность
+# Слой пересобирается только при изменении состояния одного из элементов
+class WidgetOverlay:
+    def __init__(self, widgets):
+        self.widgets = list(widgets)
+        self.rect = self.widgets[0].rect.unionall([widget.rect for widget in self.widgets[1:]])
+        self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.state = None
+
+    # Возвращает True, если слой был пересобран
+    def update(self):
+        state = tuple(widget.get_state() for widget in self.widgets)
+        if state == self.state:
+            return False
+        self.state = state
+        self.surface.fill((0, 0, 0, 0))
+        offset = (-self.rect.x, -self.rect.y)
+        for widget in self.widgets:
+            widget.draw(self.surface, offset)
+        return True
+
+    def draw(self, surface):
+        surface.blit(self.surface, self.rect)
+
+# Класс сохраняемого между кадрами слоя интерфейса: слой элементов управления и надписи
+# Также накапливает прямоугольники, изменившиеся с прошлого кадра, для частичного обновления экрана
+class Hud:
+    def __init__(self, widgets):
+        self.overlay = WidgetOverlay(widgets)
+        self.labels = {}
+        self.loading_state = None
+        self.dirty_rects = []
+
+    def mark_dirty(self, rect):
+        if rect.width > 0 and rect.height > 0:
+            self.dirty_rects.append(pygame.Rect(rect))
+
+    # Получение изменившихся прямоугольников с очисткой списка
+    def pop_dirty_rects(self):
+        dirty_rects = self.dirty_rects
+        self.dirty_rects = []
+        return dirty_rects
+
+    # Получение надписи по ключу (создаётся при первом обращении)
+    def label(self, key, x, y):
+        if key not in self.labels:
+            self.labels[key] = HudLabel(x, y)
+        return self.labels[key]
+
+# Класс индикатора фоновой загрузки с кнопкой отмены
+class LoadingIndicator:
+    def __init__(self, x, y, width, height):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.cancel_button = Button(x + width + 10, y, 100, height, "Cancel", RED, DARK_GRAY, BLACK)
+
+    def draw(self, surface, progress):
+        progress = max(0.0, min(1.0, progress))
+
+        pygame.draw.rect(surface, DARK_GRAY, self.rect)
+        fill_rect = pygame.Rect(self.rect.x, self.rect.y, int(self.rect.width * progress), self.rect.height)
+        pygame.draw.rect(surface, LIGHT_BLUE, fill_rect)
+        pygame.draw.rect(surface, WHITE, self.rect, 2)
+
+        text_surf = render_text(f"Загрузка: {int(progress * 100)}%")
+        surface.blit(text_surf, text_surf.get_rect(center=self.rect.center))
+        self.cancel_button.draw(surface)
+
+    def check_cancel(self, pos):
+        return self.cancel_button.check_click(pos)
+
+    # Область, которую занимает индикатор вместе с кнопкой отмены
+    def get_area(self):
+        return self.rect.union(self.cancel_button.rect)
+
+    # Состояние, от которого зависит внешний вид индикатора (None - индикатор скрыт)
+    def get_state(self, progress):
+        if progress is None:
+            return None
+        progress = max(0.0, min(1.0, progress))
+        return int(self.rect.width * progress), int(progress * 100)
+
 # Создание кнопок
 def create_buttons():
     return [
@@ -74,7 +212,8 @@ def create_buttons():
         Button(780, 700, 150, 40, "Toggle Culling", (100, 100, 200), DARK_GRAY),  # i=6
         Button(940, 700, 50, 40, "+", LIGHT_BLUE, DARK_GRAY, BLACK),  # i=7
         Button(1000, 700, 50, 40, "-", LIGHT_BLUE, DARK_GRAY, BLACK),  # i=8
-        Button(1060, 700, 100, 40, "Exit", RED, DARK_GRAY, BLACK)
+        Button(1060, 700, 100, 40, "Exit", RED, DARK_GRAY, BLACK),  # i=9
+        Button(50, 650, 150, 40, "Render Mode", (100, 100, 200), DARK_GRAY)  # i=10
     ]
 
 # Класс меню выбора фигуры
@@ -86,8 +225,8 @@ class ShapeSelectionWindow:
         self.y = (HEIGHT - self.height) // 2
         self.available_shapes = available_shapes
         self.current_selection = current_shape
-        self.font = pygame.font.SysFont("Arial", 20)
-        self.small_font = pygame.font.SysFont("Arial", 18)
+        self.font = get_font(20)
+        self.small_font = get_font(18)
         self.scroll_offset = 0 # Для прокрутки списка
         self.max_visible_items = 10 # Максимальное количество видимых элементов в списке
 